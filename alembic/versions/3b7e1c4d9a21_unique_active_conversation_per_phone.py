@@ -0,0 +1,44 @@
+"""Unique active conversation per phone
+
+Revision ID: 3b7e1c4d9a21
+Revises: 8f8ed6d96d23
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e1c4d9a21'
+down_revision: Union[str, Sequence[str], None] = '8f8ed6d96d23'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fecha conversas ativas duplicadas (mantém a mais recente por telefone)
+    op.execute("""
+        UPDATE conversations SET status = 'closed'
+        WHERE status = 'active'
+          AND id NOT IN (
+              SELECT max(id) FROM conversations
+              WHERE status = 'active'
+              GROUP BY phone
+          )
+    """)
+    op.create_index(
+        'uq_conversation_phone_active',
+        'conversations',
+        ['phone'],
+        unique=True,
+        postgresql_where=sa.text("status = 'active'")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_conversation_phone_active', table_name='conversations')
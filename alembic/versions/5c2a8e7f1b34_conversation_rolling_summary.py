@@ -0,0 +1,32 @@
+"""Conversation rolling summary
+
+Revision ID: 5c2a8e7f1b34
+Revises: 3b7e1c4d9a21
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2a8e7f1b34'
+down_revision: Union[str, Sequence[str], None] = '3b7e1c4d9a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('conversations', sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('conversations', sa.Column('summary_message_id', sa.Integer(), nullable=True))
+    op.add_column('conversations', sa.Column('summary_updated_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('conversations', 'summary_updated_at')
+    op.drop_column('conversations', 'summary_message_id')
+    op.drop_column('conversations', 'summary')
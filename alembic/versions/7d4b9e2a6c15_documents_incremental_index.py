@@ -0,0 +1,34 @@
+"""Documents source and content hash for incremental indexing
+
+Revision ID: 7d4b9e2a6c15
+Revises: 5c2a8e7f1b34
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d4b9e2a6c15'
+down_revision: Union[str, Sequence[str], None] = '5c2a8e7f1b34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('documents', sa.Column('source', sa.String(length=255), nullable=True))
+    op.add_column('documents', sa.Column('source_version', sa.String(length=64), nullable=True))
+    op.add_column('documents', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_documents_source'), 'documents', ['source'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_documents_source'), table_name='documents')
+    op.drop_column('documents', 'content_hash')
+    op.drop_column('documents', 'source_version')
+    op.drop_column('documents', 'source')
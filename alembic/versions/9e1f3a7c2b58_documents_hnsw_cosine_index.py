@@ -0,0 +1,36 @@
+"""Documents HNSW cosine index
+
+Revision ID: 9e1f3a7c2b58
+Revises: 7d4b9e2a6c15
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e1f3a7c2b58'
+down_revision: Union[str, Sequence[str], None] = '7d4b9e2a6c15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # O ivfflat foi criado com a tabela vazia (centróides sem dados) e usava L2
+    op.drop_index('idx_embedding', table_name='documents', postgresql_using='ivfflat')
+    op.create_index(
+        'idx_documents_embedding_hnsw', 'documents', ['embedding'], unique=False,
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'embedding': 'vector_cosine_ops'}
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_documents_embedding_hnsw', table_name='documents', postgresql_using='hnsw')
+    op.create_index('idx_embedding', 'documents', ['embedding'], unique=False, postgresql_using='ivfflat')
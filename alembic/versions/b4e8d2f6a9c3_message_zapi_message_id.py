@@ -0,0 +1,30 @@
+"""Message Z-API message id for idempotent redeliveries
+
+Revision ID: b4e8d2f6a9c3
+Revises: 9e1f3a7c2b58
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e8d2f6a9c3'
+down_revision: Union[str, Sequence[str], None] = '9e1f3a7c2b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('messages', sa.Column('zapi_message_id', sa.String(length=100), nullable=True))
+    op.create_unique_constraint('uq_messages_zapi_message_id', 'messages', ['zapi_message_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_messages_zapi_message_id', 'messages', type_='unique')
+    op.drop_column('messages', 'zapi_message_id')
@@ -1,8 +1,13 @@
-import requests
+import httpx
 from app.config import settings
+from app.core import deadline
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
 from loguru import logger
 from typing import Optional
-import time
+
+
+class ZAPISendError(Exception):
+    """O Z-API não confirmou o envio da mensagem"""
 
 
 class ZAPIClient:
@@ -16,22 +21,32 @@ class ZAPIClient:
         self.base_url = f"https://api.z-api.io/instances/{self.instance}/token/{self.token}"
         self.max_retries = 2
         self.retry_delay = 2
+        self.breaker = CircuitBreaker("zapi")
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={
+                "Client-Token": self.client_token,
+                "Content-Type": "application/json"
+            },
+            timeout=10
+        )
+    
+    async def close(self):
+        """Fecha o pool de conexões HTTP"""
+        await self.client.aclose()
     
-    def _make_request(self, endpoint: str, method: str = "POST", data: dict = None) -> Optional[dict]:
+    async def _make_request(self, endpoint: str, method: str = "POST", data: dict = None) -> Optional[dict]:
         """Faz requisição para Z-API com retry"""
         
-        url = f"{self.base_url}/{endpoint}"
-        headers = {
-            "Client-Token": self.client_token,
-            "Content-Type": "application/json"
-        }
-        
         for attempt in range(self.max_retries + 1):
             try:
-                if method == "POST":
-                    response = requests.post(url, json=data, headers=headers, timeout=10)
-                elif method == "GET":
-                    response = requests.get(url, headers=headers, timeout=10)
+                # Timeout limitado pelo prazo do turno (se houver)
+                async with self.breaker.call() as call:
+                    if method == "POST":
+                        response = await self.client.post(endpoint, json=data, timeout=deadline.timeout(10))
+                    elif method == "GET":
+                        response = await self.client.get(endpoint, timeout=deadline.timeout(10))
+                    call.failed = response.status_code >= 500
                 
                 # Log da requisição
                 logger.info(f"📤 Z-API {method} {endpoint}: Status {response.status_code}")
@@ -40,32 +55,34 @@ class ZAPIClient:
                     return response.json()
                 elif response.status_code == 429:  # Rate limit
                     logger.warning(f"⚠️  Rate limit Z-API. Tentativa {attempt + 1}/{self.max_retries + 1}")
-                    time.sleep(self.retry_delay * 2)
-                    continue
+                    if await deadline.backoff(self.retry_delay * 2):
+                        continue
+                    return None
                 else:
                     logger.error(f"❌ Erro Z-API: {response.status_code} - {response.text}")
-                    if attempt < self.max_retries:
-                        time.sleep(self.retry_delay)
+                    if attempt < self.max_retries and await deadline.backoff(self.retry_delay):
                         continue
                     return None
                     
-            except requests.exceptions.Timeout:
+            except CircuitOpenError:
+                logger.warning(f"🔌 Z-API indisponível (circuito aberto) - {method} {endpoint} não enviado")
+                return None
+            
+            except httpx.TimeoutException:
                 logger.warning(f"⚠️  Timeout Z-API. Tentativa {attempt + 1}/{self.max_retries + 1}")
-                if attempt < self.max_retries:
-                    time.sleep(self.retry_delay)
+                if attempt < self.max_retries and await deadline.backoff(self.retry_delay):
                     continue
                 return None
                 
             except Exception as e:
                 logger.error(f"❌ Erro ao chamar Z-API: {e}")
-                if attempt < self.max_retries:
-                    time.sleep(self.retry_delay)
+                if attempt < self.max_retries and await deadline.backoff(self.retry_delay):
                     continue
                 return None
         
         return None
     
-    def send_text(self, phone: str, message: str) -> bool:
+    async def send_text(self, phone: str, message: str) -> bool:
         """
         Envia mensagem de texto
         
@@ -84,7 +101,7 @@ class ZAPIClient:
         
         logger.info(f"📱 Enviando mensagem para {phone}")
         
-        result = self._make_request("send-text", data=data)
+        result = await self._make_request("send-text", data=data)
         
         if result:
             logger.info(f"✅ Mensagem enviada para {phone}")
@@ -93,7 +110,7 @@ class ZAPIClient:
             logger.error(f"❌ Falha ao enviar mensagem para {phone}")
             return False
     
-    def send_image(self, phone: str, image_url: str, caption: Optional[str] = None) -> bool:
+    async def send_image(self, phone: str, image_url: str, caption: Optional[str] = None) -> bool:
         """
         Envia imagem com caption opcional
         
@@ -116,7 +133,7 @@ class ZAPIClient:
         
         logger.info(f"📷 Enviando imagem para {phone}")
         
-        result = self._make_request("send-image", data=data)
+        result = await self._make_request("send-image", data=data)
         
         if result:
             logger.info(f"✅ Imagem enviada para {phone}")
@@ -125,7 +142,7 @@ class ZAPIClient:
             logger.error(f"❌ Falha ao enviar imagem para {phone}")
             return False
     
-    def get_instance_status(self) -> Optional[dict]:
+    async def get_instance_status(self) -> Optional[dict]:
         """
         Verifica status da instância Z-API
         
@@ -135,7 +152,7 @@ class ZAPIClient:
         
         logger.info("🔍 Verificando status da instância...")
         
-        result = self._make_request("status", method="GET")
+        result = await self._make_request("status", method="GET")
         
         if result:
             connected = result.get("connected", False)
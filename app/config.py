@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 
 class Settings(BaseSettings):
@@ -10,12 +10,115 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str
+    ASYNC_DATABASE_URL: Optional[str] = None  # Padrão: DATABASE_URL com driver asyncpg
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 40
     
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_MAX_CONNECTIONS: int = 50
+    
+    # Fila de ingestão (Redis Streams)
+    INGEST_STREAM: str = "whatsapp:inbound"
+    INGEST_GROUP: str = "message-processors"
+    INGEST_STREAM_MAXLEN: int = 100000
+    INGEST_LANES: int = 16  # Partições do stream (ordem garantida por telefone)
+    INGEST_LEASE_TTL_MS: int = 30000
+    INGEST_REBALANCE_INTERVAL: int = 5  # segundos
+    INGEST_CONCURRENCY: int = 100  # Mensagens em paralelo por consumidor
+    INGEST_BLOCK_MS: int = 5000
+    INGEST_CLAIM_IDLE_MS: int = 60000  # Pendência órfã após 60s sem ACK
+    INGEST_CLAIM_INTERVAL: int = 15  # segundos
+    INGEST_MAX_DELIVERIES: int = 5  # Depois disso vai para dead letter
+    
+    # Deduplicação de mensagens recebidas
+    DEDUP_TTL: int = 12  # segundos (hash phone + texto e última enviada)
+    DEDUP_ID_TTL: int = 3600  # segundos (messageId do Z-API)
+    
+    # Cache do estado quente das conversas
+    STATE_CACHE_TTL: int = 3600  # segundos
+    
+    # Buffer de histórico recente
+    HISTORY_BUFFER_SIZE: int = 20  # mensagens por conversa
+    HISTORY_LRU_SIZE: int = 5000  # conversas no LRU do processo
+    HISTORY_TTL: int = 86400  # segundos
+    
+    # Resumo incremental das conversas (worker Celery)
+    SUMMARY_EVERY_TURNS: int = 4  # Turnos entre atualizações do resumo (0 desativa)
+    SUMMARY_KEEP_MESSAGES: int = 6  # Mensagens recentes que ficam fora do resumo
+    SUMMARY_MAX_TOKENS: int = 300  # Tamanho máximo do resumo
+    
+    # Classificador de intenção local
+    INTENT_MIN_SCORE: float = 0.3  # Similaridade mínima do modelo vetorizado
+    OPT_OUT_REPLY: str = "Tudo bem! Não vamos mais te enviar mensagens. Se mudar de ideia, é só chamar aqui. 👋"  # Vazio = não responde
+    
+    # Prazo por mensagem (RAG, OpenAI, CRM e envio)
+    MESSAGE_DEADLINE: float = 25.0  # segundos do início do turno até a resposta
+    DEADLINE_SEND_RESERVE: float = 4.0  # Parte do prazo reservada para o envio
+    RAG_TIMEOUT: float = 3.0  # Embedding/busca RAG acima disso é pulada
+    FALLBACK_REPLY: str = "Tive um probleminha para responder agora 😕 Pode me mandar sua mensagem de novo em instantes?"  # Não promete atendimento humano
+    
+    # Circuit breakers por upstream (estado compartilhado no Redis)
+    CIRCUIT_WINDOW: int = 60  # segundos da janela de contagem
+    CIRCUIT_MIN_CALLS: int = 10  # Chamadas na janela antes de poder abrir
+    CIRCUIT_ERROR_RATE: float = 0.5  # Fração de falhas que abre o circuito
+    CIRCUIT_SLOW_RATE: float = 0.8  # Fração de chamadas lentas que abre o circuito
+    CIRCUIT_OPEN_SECONDS: int = 30  # Tempo aberto antes da chamada de teste (half-open)
+    CIRCUIT_SLOW_DEFAULT: float = 10.0  # segundos para considerar uma chamada lenta
+    CIRCUIT_SLOW_SECONDS: Dict[str, float] = {"openai": 15.0, "zapi": 5.0, "datacrazy": 5.0}
+    
+    # Coalescência de rajadas (0 desativa)
+    COALESCE_WINDOW_MS: int = 1500  # Silêncio necessário para fechar o turno
+    COALESCE_MAX_WINDOW_MS: int = 6000  # Espera máxima desde a primeira mensagem
     
     # OpenAI
     OPENAI_API_KEY: str
+    OPENAI_RPM_LIMIT: int = 500  # Requisições/minuto por modelo (todos os processos)
+    OPENAI_TPM_LIMIT: int = 200000  # Tokens/minuto por modelo (todos os processos)
+    OPENAI_MODEL_LIMITS: Dict[str, Tuple[int, int]] = {}  # Ex: {"gpt-4o": [500, 30000]}
+    OPENAI_MAX_CONCURRENCY: int = 50  # Chamadas simultâneas por processo
+    OPENAI_LIMITER_MAX_WAIT: float = 5.0  # segundos entre tentativas de reserva
+    PROMPT_TOKEN_BUDGET: int = 4000  # Tokens de prompt por chamada (sem a resposta)
+    PROMPT_TOKEN_BUDGETS: Dict[str, int] = {}  # Por modelo, sobrescreve o padrão
+    PROMPT_RAG_SHARE: float = 0.6  # Fração do orçamento livre reservada ao RAG
+    RAG_TOP_K: int = 4  # Passagens buscadas (o orçamento decide quantas entram)
+    RAG_HNSW_EF_SEARCH: int = 40  # Candidatos do índice HNSW por busca (scripts/bench_vector_search.py)
+    RAG_LOCAL_INDEX: bool = False  # Busca no snapshot em memória (bases pequenas) em vez do pgvector
+    RAG_LOCAL_INDEX_PATH: str = "data/rag_index"  # Snapshot gravado pelo scripts/load_rag.py
+    RAG_LOCAL_INDEX_REFRESH: int = 10  # segundos entre verificações de nova versão
+    # Tiers de modelo por turno (ModelRouter)
+    MODEL_FAST: str = "gpt-4o-mini"  # Tier padrão
+    MODEL_FAST_TEMPERATURE: float = 0.8
+    MODEL_STRONG: str = "gpt-4o"  # Fechamento/objeção, prompts grandes e saídas inválidas
+    MODEL_STRONG_TEMPERATURE: float = 0.7
+    MODEL_STRONG_INTENTS: List[str] = ["objecao", "fechamento"]
+    MODEL_STRONG_STAGES: List[str] = ["fechamento"]
+    MODEL_FAST_MAX_PROMPT_TOKENS: int = 3000  # Acima disso o turno vai para o tier forte
+    # USD por 1M tokens: entrada, entrada em cache, saída
+    MODEL_PRICES: Dict[str, Tuple[float, float, float]] = {
+        "gpt-4o-mini": (0.15, 0.075, 0.60),
+        "gpt-4o": (2.50, 1.25, 10.00)
+    }
+    STREAM_RESPONSES: bool = True  # Envia a resposta em balões enquanto é gerada
+    STREAM_MIN_CHUNK_CHARS: int = 40  # Tamanho mínimo de um balão
+    
+    # Cache semântico de respostas
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95  # Similaridade de cosseno mínima
+    SEMANTIC_CACHE_TTL: int = 86400  # segundos
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 500  # por estágio/intenção (LRU)
+    SEMANTIC_CACHE_REFRESH: int = 30  # segundos entre recargas do índice local
+    SEMANTIC_CACHE_MIN_CHARS: int = 20  # Mensagens menores dependem do contexto
+    
+    # Cache de embeddings das mensagens (LRU do processo + Redis)
+    EMBEDDING_CACHE_LRU_SIZE: int = 5000  # embeddings no LRU do processo (~6 KB cada)
+    EMBEDDING_CACHE_TTL: int = 604800  # segundos (7 dias)
+    EMBEDDING_CACHE_MAX_CHARS: int = 500  # Mensagens maiores raramente se repetem
+    
+    # Ingestão da base RAG (scripts/load_rag.py)
+    RAG_EMBED_BATCH_SIZE: int = 256  # Chunks por requisição de embeddings
+    RAG_EMBED_CONCURRENCY: int = 4  # Requisições de embeddings simultâneas
+    RAG_INSERT_BATCH_SIZE: int = 2000  # Linhas por transação de INSERT
     
     # Z-API
     ZAPI_TOKEN: str
@@ -0,0 +1,219 @@
+"""
+Circuit Breaker
+Falha rápida quando um upstream (OpenAI, Z-API, DataCrazy) degrada
+
+Estados, compartilhados entre todos os processos via Redis:
+- closed: chamadas liberadas; falhas e latência contadas numa janela
+- open: taxa de erro ou de chamadas lentas passou do limite; chamadas
+  falham na hora (CircuitOpenError) por CIRCUIT_OPEN_SECONDS
+- half_open: uma chamada de teste por vez; sucesso fecha o circuito,
+  falha (ou lentidão) abre de novo
+
+Uso:
+    async with breaker.call() as call:
+        response = await client.post(...)
+        call.failed = response.status_code >= 500
+"""
+
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Tuple, Type
+from loguru import logger
+
+from app.config import settings
+from app.utils.redis_client import get_redis
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """O circuito do upstream está aberto: a chamada nem foi feita"""
+
+
+class Call:
+    """Resultado de uma chamada protegida (failed pode ser marcado pelo chamador)"""
+    
+    def __init__(self):
+        self.failed = False
+        self.started = time.monotonic()
+    
+    def restart(self):
+        """Reinicia a medição de latência (ex: depois de esperar o rate limiter)"""
+        self.started = time.monotonic()
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de um upstream com estado no Redis
+    
+    Cada chamada custa dois scripts Lua (liberação e registro); se o
+    Redis falhar, o circuito é tratado como fechado.
+    """
+    
+    # KEYS: hash do circuito | ARGV: ms aberto, ms de lease da chamada de teste
+    # Retorna {liberada (0/1), estado}
+    ALLOW_SCRIPT = """
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+    local state = redis.call('hget', KEYS[1], 'state') or 'closed'
+    
+    if state == 'closed' then
+        return {1, state}
+    end
+    
+    if state == 'open' then
+        local opened = tonumber(redis.call('hget', KEYS[1], 'opened_at')) or 0
+        if now - opened < tonumber(ARGV[1]) then
+            return {0, state}
+        end
+        state = 'half_open'
+        redis.call('hset', KEYS[1], 'state', state)
+    end
+    
+    -- half_open: uma chamada de teste por vez (lease expira se o processo cair)
+    local probe = tonumber(redis.call('hget', KEYS[1], 'probe_until')) or 0
+    if now < probe then
+        return {0, state}
+    end
+    redis.call('hset', KEYS[1], 'probe_until', now + tonumber(ARGV[2]))
+    return {1, state}
+    """
+    
+    # KEYS: hash do circuito
+    # ARGV: falhou (0/1), lenta (0/1), ms da janela, chamadas mínimas,
+    #       taxa de erro, taxa de lentidão
+    # Retorna {estado, mudou (0/1)}
+    RECORD_SCRIPT = """
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+    local state = redis.call('hget', KEYS[1], 'state') or 'closed'
+    local failed = tonumber(ARGV[1])
+    local slow = tonumber(ARGV[2])
+    
+    if state == 'open' then
+        return {state, 0}
+    end
+    
+    if state == 'half_open' then
+        if failed + slow > 0 then
+            redis.call('hset', KEYS[1], 'state', 'open', 'opened_at', now, 'probe_until', 0)
+            return {'open', 1}
+        end
+        redis.call('del', KEYS[1])
+        return {'closed', 1}
+    end
+    
+    local start = tonumber(redis.call('hget', KEYS[1], 'window_start')) or 0
+    if now - start >= tonumber(ARGV[3]) then
+        redis.call('hset', KEYS[1], 'window_start', now, 'calls', 0, 'failures', 0, 'slow', 0)
+    end
+    
+    local calls = redis.call('hincrby', KEYS[1], 'calls', 1)
+    local failures = redis.call('hincrby', KEYS[1], 'failures', failed)
+    local slow_calls = redis.call('hincrby', KEYS[1], 'slow', slow)
+    
+    if calls >= tonumber(ARGV[4])
+        and (failures / calls >= tonumber(ARGV[5]) or slow_calls / calls >= tonumber(ARGV[6])) then
+        redis.call('hset', KEYS[1], 'state', 'open', 'opened_at', now, 'probe_until', 0)
+        return {'open', 1}
+    end
+    return {state, 0}
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.redis = get_redis()
+        self.key = f"circuit:{name}"
+        self.slow_seconds = settings.CIRCUIT_SLOW_SECONDS.get(name, settings.CIRCUIT_SLOW_DEFAULT)
+        self._allow = self.redis.register_script(self.ALLOW_SCRIPT)
+        self._record = self.redis.register_script(self.RECORD_SCRIPT)
+    
+    async def allow(self) -> bool:
+        """True se a chamada pode ser feita (fechado ou chamada de teste do half-open)"""
+        try:
+            allowed, state = await self._allow(
+                keys=[self.key],
+                args=[settings.CIRCUIT_OPEN_SECONDS * 1000, int(self.slow_seconds * 2000)]
+            )
+        except Exception as e:
+            logger.error(f"❌ Erro ao consultar circuito {self.name}: {e}")
+            return True
+        
+        if allowed and state.decode() == HALF_OPEN:
+            logger.info(f"🧪 Circuito {self.name} em half-open: chamada de teste")
+        return bool(allowed)
+    
+    async def record(self, elapsed: float, failed: bool = False):
+        """Registra o resultado de uma chamada liberada (duração em segundos)"""
+        try:
+            state, changed = await self._record(
+                keys=[self.key],
+                args=[
+                    int(failed),
+                    int(elapsed > self.slow_seconds),
+                    settings.CIRCUIT_WINDOW * 1000,
+                    settings.CIRCUIT_MIN_CALLS,
+                    settings.CIRCUIT_ERROR_RATE,
+                    settings.CIRCUIT_SLOW_RATE
+                ]
+            )
+        except Exception as e:
+            logger.error(f"❌ Erro ao registrar chamada no circuito {self.name}: {e}")
+            return
+        
+        if changed:
+            if state.decode() == OPEN:
+                logger.warning(f"🔌 Circuito {self.name} aberto por {settings.CIRCUIT_OPEN_SECONDS}s")
+            else:
+                logger.info(f"✅ Circuito {self.name} fechado")
+    
+    @asynccontextmanager
+    async def call(self, failures: Tuple[Type[BaseException], ...] = (Exception,)) -> AsyncIterator[Call]:
+        """
+        Protege uma chamada ao upstream
+        
+        Args:
+            failures: Exceções que contam como falha do upstream (as demais,
+                ex: rate limit, contam como resposta; cancelamento não conta)
+        
+        Raises:
+            CircuitOpenError: se o circuito está aberto
+        """
+        if not await self.allow():
+            raise CircuitOpenError(f"Circuito {self.name} aberto")
+        
+        call = Call()
+        try:
+            yield call
+        except failures:
+            await self.record(time.monotonic() - call.started, failed=True)
+            raise
+        except Exception:
+            await self.record(time.monotonic() - call.started)
+            raise
+        await self.record(time.monotonic() - call.started, failed=call.failed)
+    
+    async def snapshot(self) -> Dict:
+        """Estado atual do circuito e contadores da janela"""
+        raw = await self.redis.hgetall(self.key)
+        values = {field.decode(): value.decode() for field, value in raw.items()}
+        state = values.get("state", CLOSED)
+        calls = int(values.get("calls", 0))
+        
+        snapshot = {
+            "state": state,
+            "calls": calls,
+            "failures": int(values.get("failures", 0)),
+            "slow": int(values.get("slow", 0)),
+            "slow_seconds": self.slow_seconds
+        }
+        
+        if state == OPEN:
+            seconds, micros = await self.redis.time()
+            now_ms = seconds * 1000 + micros // 1000
+            left_ms = int(values.get("opened_at", 0)) + settings.CIRCUIT_OPEN_SECONDS * 1000 - now_ms
+            snapshot["half_open_in"] = round(max(left_ms, 0) / 1000, 1)
+        return snapshot
@@ -0,0 +1,212 @@
+"""
+Classificador de Intenção
+Detecta a intenção da mensagem localmente (CPU), sem chamada ao LLM
+
+Duas etapas:
+1. Padrões pré-compilados de alta precisão (ex: "não quero mais", "bom dia")
+2. Modelo vetorizado pequeno: bag-of-words com hashing + centróides por
+   intenção (similaridade de cosseno), para frases que não batem com
+   nenhum padrão
+
+Opt-out encerra a conversa, então só vem de padrão explícito (nunca do
+modelo vetorizado).
+
+A intenção escolhe o prompt (PromptRouter) e o namespace do cache
+semântico. Custo típico: dezenas de microssegundos por mensagem.
+"""
+
+import re
+import unicodedata
+import zlib
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+from app.config import settings
+
+
+OBJECAO = "objecao"
+FECHAMENTO = "fechamento"
+DUVIDA = "duvida"
+SAUDACAO = "saudacao"
+OPT_OUT = "opt_out"
+
+# Opt-out encerra a conversa: só a mensagem inteira como recusa, com no
+# máximo palavras de cortesia em volta ("me tira da lista por favor"),
+# nunca um trecho dentro de outra frase ("me tirar da lista de espera")
+_OPT_OUT_START = r"^((por favor|pfv|pf|ok|olha|quero|pode|podem|voces podem)[\s,]+)*"
+_OPT_OUT_END = r"[\s!.,]*((por favor|pfv|pf|obrigad[oa]|valeu|tchau)[\s!.,]*)*$"
+
+# Ordem = prioridade quando mais de um padrão bate
+PATTERNS: Dict[str, List[str]] = {
+    OPT_OUT: [
+        _OPT_OUT_START + r"(pare|parem|parar|para) de (me )?(mandar|enviar|chamar)( (mensage\w*|msg|isso))?" + _OPT_OUT_END,
+        _OPT_OUT_START + r"nao (quero|tenho)( mais)? interesse" + _OPT_OUT_END,
+        _OPT_OUT_START + r"nao me interessa( mais)?" + _OPT_OUT_END,
+        _OPT_OUT_START + r"nao quero mais( receber( (mensage\w*|msg|nada))?| (mensage\w*|contato|nada|saber( disso)?))?" + _OPT_OUT_END,
+        _OPT_OUT_START + r"(me )?(sai|sair|remove|remova|remover|tira|tire|tirar|exclui|exclua|excluir)"
+        r"( o)?( meu (numero|contato))? da (sua )?lista( de (contatos|mensagens|transmissao))?" + _OPT_OUT_END,
+        _OPT_OUT_START + r"(me )?descadastr\w*( meu (numero|contato))?" + _OPT_OUT_END,
+        _OPT_OUT_START + r"nao (me )?(mande|mandem|envie|enviem|chame|chamem) mais( (mensage\w*|msg|nada))?" + _OPT_OUT_END,
+        _OPT_OUT_START + r"(sair|stop|parar|cancelar)" + _OPT_OUT_END,
+    ],
+    OBJECAO: [
+        # "caro" só como preço ("Caro atendente" não)
+        r"\b(muito|meio|bem|mt|mto|ta|esta|e|ficou|fica|achei|acho|tao) (caro|salgado|puxado)\b",
+        r"\b(caro|salgado|puxado) (demais|pra mim|para mim)\b",
+        r"^(caro|salgado|puxado)[\s!.,]*$",
+        r"\b(hoje|agora|esse mes|este mes) nao (da|posso|consigo|rola)\b",
+        r"\bnao (quero|vou|posso) (me )?(matricular|fazer a matricula|fechar|assinar)",
+        r"\bnao (tenho|tem|to com|estou com) (dinheiro|grana|condic|como pagar)",
+        r"\bnao (consigo|vou conseguir|da (pra|para)) pagar",
+        r"\b(sem|nao tenho|falta de?) tempo\b",
+        r"\b(vou|preciso|tenho que) (pensar|ver com|falar com|conversar com|consultar)",
+        r"\b(ead|distancia|online)\b.*\b(nao presta|nao e bom|e fraco|nao vale|desvaloriz)",
+        r"\b(tenho|to com|estou com) (medo|receio|duvida se)\b",
+        r"\bnao sei se (vou )?(consigo|dou conta|compensa|vale a pena)",
+        # Pergunta sobre desconto ("tem desconto?") é dúvida, não objeção
+        r"\b(mais barato|concorr|outra faculdade)",
+    ],
+    FECHAMENTO: [
+        r"(?<!nao )\b(quero|vou|bora|pode) (me )?(matricular|fazer a matricula|fechar|assinar|comecar)",
+        r"\bcomo (faco|faz) (para|pra|a) (me )?(matricul|inscrev|pagar|comecar)",
+        r"\b(manda|me manda|envia|me envia|passa)( o| a)? (link|boleto|pix|contrato|ficha)",
+        r"\b(fechado|fechou|vamos nessa|topo|aceito)\b",
+        r"\b(quais|que) (documentos|docs)\b",
+        r"\bonde (eu )?(pago|assino|me inscrevo)",
+    ],
+    SAUDACAO: [
+        r"^(oi+|ola|ole|opa|eai|e ai|hey|hello|bom dia|boa tarde|boa noite|tudo (bem|bom)|salve)"
+        r"([\s!?.,]+(tudo (bem|bom)|td bem|como vai|pessoal|amigo|amiga))?[\s!?.,]*$",
+    ],
+    DUVIDA: [
+        r"\?\s*$",
+        r"^(qual|quais|quanto|quantos|quantas|quando|como|onde|porque|por que|o que|tem|existe|posso)\b",
+        r"^(me )?(explica|fala|conta|diz)\b",
+        r"\b(queria|gostaria de|quero|preciso) (saber|entender|mais informac|informac)",
+    ],
+}
+
+# Frases de referência do modelo vetorizado (uma lista por intenção)
+EXAMPLES: Dict[str, List[str]] = {
+    OBJECAO: [
+        "está muito caro para mim",
+        "não tenho dinheiro agora",
+        "vou pensar e depois te falo",
+        "preciso conversar com meu marido antes",
+        "não tenho tempo para estudar",
+        "curso a distância não é valorizado no mercado",
+        "tenho medo de não conseguir acompanhar",
+        "em outra faculdade é mais barato",
+        "agora não é um bom momento",
+        "trabalho o dia todo e não sei se dou conta",
+    ],
+    FECHAMENTO: [
+        "quero me matricular",
+        "como faço a matrícula",
+        "pode mandar o link de pagamento",
+        "vamos fechar então",
+        "quais documentos preciso enviar",
+        "quero começar no próximo mês",
+        "me passa o pix",
+        "onde eu faço a inscrição",
+        "aceito a proposta",
+        "quero garantir minha vaga",
+    ],
+    DUVIDA: [
+        "quanto custa a mensalidade",
+        "quanto tempo dura o curso",
+        "o diploma é reconhecido pelo mec",
+        "quais cursos vocês têm",
+        "tem aula presencial",
+        "como funcionam as provas",
+        "qual a diferença entre licenciatura e bacharelado",
+        "precisa fazer vestibular",
+        "gostaria de saber sobre os cursos",
+        "queria informações sobre pedagogia",
+    ],
+    SAUDACAO: [
+        "oi tudo bem",
+        "olá boa tarde",
+        "bom dia",
+        "boa noite pessoal",
+        "opa e aí",
+    ],
+}
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sem acentos e com espaços simples"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.split())
+
+
+class IntentClassifier:
+    """
+    Classificador de intenção por padrões + centróides vetorizados
+    
+    Os padrões e a matriz de centróides são montados uma vez no
+    construtor; classify() só normaliza, testa as regex e faz um
+    produto matriz-vetor.
+    """
+    
+    def __init__(self, dim: int = 2048, min_score: float = None):
+        self.dim = dim
+        self.min_score = settings.INTENT_MIN_SCORE if min_score is None else min_score
+        self.patterns: List[Tuple[str, re.Pattern]] = [
+            (intent, re.compile("|".join(f"(?:{p})" for p in patterns)))
+            for intent, patterns in PATTERNS.items()
+        ]
+        self.labels = list(EXAMPLES)
+        centroids = np.stack([
+            np.mean([self._vectorize(normalize(example)) for example in EXAMPLES[intent]], axis=0)
+            for intent in self.labels
+        ])
+        self.centroids = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+    
+    def _features(self, text: str) -> List[str]:
+        """Palavras, bigramas de palavras e trigramas de caracteres"""
+        words = _TOKEN.findall(text)
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"<{word}>"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+    
+    def _vectorize(self, text: str) -> np.ndarray:
+        """Bag-of-words com hashing, normalizado (L2)"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            vector[zlib.crc32(feature.encode()) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        Intenção e confiança da mensagem
+        
+        Returns:
+            (intenção, score) - score 1.0 quando veio de um padrão;
+            (None, score) quando nada passa do limite mínimo
+        """
+        text = normalize(text)
+        if not text:
+            return None, 0.0
+        
+        for intent, pattern in self.patterns:
+            if pattern.search(text):
+                return intent, 1.0
+        
+        scores = self.centroids @ self._vectorize(text)
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        
+        if score < self.min_score:
+            return None, score
+        return self.labels[best], score
+    
+    def classify(self, text: str) -> Optional[str]:
+        """Intenção da mensagem (ou None se incerta)"""
+        return self.predict(text)[0]
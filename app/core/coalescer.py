@@ -0,0 +1,81 @@
+"""
+Coalescência de Mensagens
+Agrupa rajadas de mensagens do mesmo telefone em um único turno da IA
+"""
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, List
+from loguru import logger
+
+from app.config import settings
+
+
+class MessageCoalescer:
+    """
+    Debounce por telefone
+    
+    A primeira mensagem abre uma janela; cada nova mensagem do mesmo
+    telefone a estende por window_ms, até no máximo max_window_ms desde
+    a primeira. Quando a janela fecha, on_flush recebe todas as
+    mensagens acumuladas na ordem de chegada.
+    """
+    
+    def __init__(
+        self,
+        on_flush: Callable[[str, List[Any]], None],
+        window_ms: int = None,
+        max_window_ms: int = None
+    ):
+        self.on_flush = on_flush
+        self.window = (settings.COALESCE_WINDOW_MS if window_ms is None else window_ms) / 1000
+        self.max_window = (settings.COALESCE_MAX_WINDOW_MS if max_window_ms is None else max_window_ms) / 1000
+        self.buffers: Dict[str, List[Any]] = {}
+        self.first_at: Dict[str, float] = {}
+        self.last_at: Dict[str, float] = {}
+        self.timers: Dict[str, asyncio.Task] = {}
+    
+    def add(self, phone: str, item: Any):
+        """Adiciona mensagem à janela do telefone"""
+        if self.window <= 0:
+            self.on_flush(phone, [item])
+            return
+        
+        now = time.monotonic()
+        self.buffers.setdefault(phone, []).append(item)
+        self.first_at.setdefault(phone, now)
+        self.last_at[phone] = now
+        
+        if phone not in self.timers:
+            self.timers[phone] = asyncio.create_task(self._wait_quiet(phone))
+    
+    async def _wait_quiet(self, phone: str):
+        try:
+            while phone in self.buffers:
+                deadline = min(
+                    self.last_at[phone] + self.window,
+                    self.first_at[phone] + self.max_window
+                )
+                delay = deadline - time.monotonic()
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+        finally:
+            if self.timers.get(phone) is asyncio.current_task():
+                del self.timers[phone]
+            self._flush(phone)
+    
+    def _flush(self, phone: str):
+        items = self.buffers.pop(phone, [])
+        self.first_at.pop(phone, None)
+        self.last_at.pop(phone, None)
+        
+        if items:
+            if len(items) > 1:
+                logger.info(f"🧩 {len(items)} mensagens de {phone} agrupadas em um turno")
+            self.on_flush(phone, items)
+    
+    def flush_all(self):
+        """Fecha todas as janelas imediatamente (ex: desligamento do worker)"""
+        for phone in list(self.buffers):
+            self._flush(phone)
@@ -0,0 +1,163 @@
+"""
+Container de Serviços
+Clientes e serviços compartilhados por todo o processo
+
+Cada processo (API, worker de mensagens, worker Celery) constrói os
+clientes HTTP, o cliente OpenAI e os prompts uma única vez e os reutiliza
+em todas as mensagens. Sessões de banco continuam sendo por requisição.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from loguru import logger
+
+from app.channels.whatsapp.zapi import ZAPIClient
+from app.config import settings
+from app.core.classifier import IntentClassifier
+from app.core.history import HistoryBuffer
+from app.crm.datacrazy import DataCrazyClient
+from app.database import AsyncSessionLocal, async_engine
+from app.llm.model_router import ModelRouter
+from app.llm.openai_client import OpenAIClient
+from app.llm.prompt_builder import PromptBuilder
+from app.llm.response_generator import ResponseGenerator
+from app.llm.router import PromptRouter
+from app.llm.semantic_cache import SemanticResponseCache, content_version
+from app.rag.embedding_cache import EmbeddingCache
+from app.rag.local_index import LocalVectorIndex
+from app.rag.query import RAGQuery
+from app.rag.vectorstore import EMBEDDING_MODEL, VectorStore
+from app.utils.redis_client import close_redis
+
+
+class ServiceContainer:
+    """
+    Registro dos serviços do processo
+    
+    Os serviços são criados sob demanda na primeira vez que são usados;
+    startup() os cria antecipadamente e shutdown() fecha os pools.
+    """
+    
+    def __init__(self):
+        self._zapi: Optional[ZAPIClient] = None
+        self._datacrazy: Optional[DataCrazyClient] = None
+        self._openai: Optional[OpenAIClient] = None
+        self._vectorstore: Optional[VectorStore] = None
+        self._generator: Optional[ResponseGenerator] = None
+        self._history: Optional[HistoryBuffer] = None
+        self._classifier: Optional[IntentClassifier] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    @property
+    def zapi(self) -> ZAPIClient:
+        if self._zapi is None:
+            self._zapi = ZAPIClient()
+        return self._zapi
+    
+    @property
+    def datacrazy(self) -> DataCrazyClient:
+        if self._datacrazy is None:
+            self._datacrazy = DataCrazyClient()
+        return self._datacrazy
+    
+    @property
+    def openai(self) -> OpenAIClient:
+        if self._openai is None:
+            self._openai = OpenAIClient()
+        return self._openai
+    
+    @property
+    def vectorstore(self) -> VectorStore:
+        if self._vectorstore is None:
+            self._vectorstore = VectorStore(
+                embedding_cache=EmbeddingCache(EMBEDDING_MODEL),
+                local_index=LocalVectorIndex() if settings.RAG_LOCAL_INDEX else None
+            )
+        return self._vectorstore
+    
+    @property
+    def generator(self) -> ResponseGenerator:
+        if self._generator is None:
+            router = PromptRouter()
+            self._generator = ResponseGenerator(
+                openai_client=self.openai,
+                prompt_builder=PromptBuilder(router),
+                rag_query=RAGQuery(self.vectorstore),
+                semantic_cache=SemanticResponseCache(content_version(router.prompts_cache.values())),
+                model_router=ModelRouter()
+            )
+        return self._generator
+    
+    @property
+    def history(self) -> HistoryBuffer:
+        if self._history is None:
+            self._history = HistoryBuffer()
+        return self._history
+    
+    @property
+    def classifier(self) -> IntentClassifier:
+        if self._classifier is None:
+            self._classifier = IntentClassifier()
+        return self._classifier
+    
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        """Sessão de banco com escopo de uma requisição/mensagem"""
+        async with AsyncSessionLocal() as db:
+            yield db
+    
+    async def startup(self):
+        """Cria os serviços antes da primeira mensagem"""
+        self.zapi
+        self.datacrazy
+        self.generator
+        self.classifier
+        logger.info("✅ Serviços do processo inicializados")
+    
+    async def shutdown(self):
+        """Fecha pools HTTP, Redis e banco do processo"""
+        if self._zapi is not None:
+            await self._zapi.close()
+        if self._datacrazy is not None:
+            await self._datacrazy.close()
+        if self._openai is not None:
+            await self._openai.close()
+        if self._vectorstore is not None:
+            await self._vectorstore.client.close()
+        
+        self._zapi = self._datacrazy = self._openai = None
+        self._vectorstore = self._generator = None
+        self._history = None
+        
+        await close_redis()
+        await async_engine.dispose()
+        logger.info("👋 Serviços do processo finalizados")
+    
+    def start_loop(self):
+        """
+        Cria o event loop persistente de processos síncronos (Celery)
+        
+        Os clientes assíncronos ficam presos ao loop em que foram criados,
+        então tasks síncronas devem usar run() em vez de asyncio.run().
+        """
+        self.loop = asyncio.new_event_loop()
+        self.run(self.startup())
+    
+    def stop_loop(self):
+        """Finaliza os serviços e fecha o loop criado por start_loop()"""
+        if self.loop is None:
+            return
+        self.run(self.shutdown())
+        self.loop.close()
+        self.loop = None
+    
+    def run(self, coro):
+        """Executa uma corrotina no loop persistente do processo"""
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+        return self.loop.run_until_complete(coro)
+
+
+container = ServiceContainer()
@@ -0,0 +1,109 @@
+"""
+Prazo por Mensagem
+Orçamento de tempo de um turno, propagado por contextvar
+
+O worker abre o prazo ao começar o turno; RAG, OpenAI, CRM e Z-API
+consultam o tempo restante para limitar timeouts, desistir de novas
+tentativas e pular etapas quando o orçamento acabou. Tasks criadas
+dentro do turno herdam o prazo.
+
+Fora de um turno (Celery, scripts) não há prazo e tudo funciona como
+antes.
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Iterator, Optional, TypeVar
+from loguru import logger
+
+
+T = TypeVar("T")
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """O prazo do turno (ou do passo) acabou"""
+
+
+@contextmanager
+def scope(seconds: float) -> Iterator[None]:
+    """Abre um prazo de `seconds` (nunca maior que um prazo já aberto)"""
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(at, current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Segundos restantes do prazo (None se não houver prazo)"""
+    at = _deadline.get()
+    return None if at is None else max(at - time.monotonic(), 0.0)
+
+
+def expired() -> bool:
+    """True se há prazo e ele já acabou"""
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def timeout(default: float, floor: float = 1.0) -> float:
+    """
+    Timeout de uma chamada: o padrão limitado pelo tempo restante
+
+    floor garante que a chamada ainda tenha uma chance real (ex: enviar
+    a resposta com o tempo reservado para isso).
+    """
+    left = remaining()
+    return default if left is None else max(min(default, left), floor)
+
+
+async def backoff(delay: float) -> bool:
+    """
+    Espera antes de uma nova tentativa
+
+    Returns:
+        False (sem esperar) se o prazo não comporta a espera e mais uma tentativa
+    """
+    left = remaining()
+    if left is not None and left <= delay:
+        logger.warning(f"⏰ Prazo do turno não comporta nova tentativa ({left:.1f}s restantes)")
+        return False
+    await asyncio.sleep(delay)
+    return True
+
+
+async def within(awaitable: Awaitable[T], reserve: float = 0.0, limit: Optional[float] = None) -> T:
+    """
+    Executa o passo dentro do prazo, cancelando-o se estourar
+
+    Args:
+        awaitable: Passo a executar
+        reserve: Segundos do prazo guardados para depois do passo (ex: envio)
+        limit: Tempo máximo do próprio passo, mesmo sem prazo aberto
+
+    Raises:
+        DeadlineExceeded: se o passo não terminou a tempo
+    """
+    left = remaining()
+    budget = None if left is None else left - reserve
+    if limit is not None:
+        budget = limit if budget is None else min(budget, limit)
+
+    if budget is None:
+        return await awaitable
+
+    if budget <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded()
+
+    try:
+        return await asyncio.wait_for(awaitable, budget)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded() from None
@@ -0,0 +1,122 @@
+"""
+Histórico Recente
+Ring buffer das últimas mensagens de cada conversa (Redis + LRU local)
+"""
+
+import json
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+from loguru import logger
+
+from app.config import settings
+from app.utils.redis_client import get_redis
+
+
+class HistoryBuffer:
+    """
+    Últimas N mensagens por conversa
+    
+    Leitura: LRU do processo -> lista no Redis -> banco (loader). Escrita:
+    append no LRU e no Redis apenas quando o buffer já está aquecido, para
+    nunca guardar um histórico incompleto.
+    """
+    
+    def __init__(self, size: int = None, lru_size: int = None, ttl: int = None):
+        self.redis = get_redis()
+        self.size = size or settings.HISTORY_BUFFER_SIZE
+        self.lru_size = lru_size or settings.HISTORY_LRU_SIZE
+        self.ttl = ttl or settings.HISTORY_TTL
+        self.local: "OrderedDict[int, Deque[Dict]]" = OrderedDict()
+    
+    def _key(self, conversation_id: int) -> str:
+        return f"history:{conversation_id}"
+    
+    def _remember(self, conversation_id: int, messages: List[Dict]):
+        self.local[conversation_id] = deque(messages, maxlen=self.size)
+        self.local.move_to_end(conversation_id)
+        while len(self.local) > self.lru_size:
+            self.local.popitem(last=False)
+    
+    async def get(
+        self,
+        conversation_id: int,
+        limit: int,
+        loader: Callable[[int], Awaitable[List[Dict]]]
+    ) -> List[Dict]:
+        """
+        Retorna as últimas `limit` mensagens em ordem cronológica
+        
+        Args:
+            conversation_id: ID da conversa
+            limit: Quantidade de mensagens
+            loader: Busca as últimas N mensagens no banco (buffer frio)
+        """
+        messages = self.local.get(conversation_id)
+        
+        if messages is not None:
+            self.local.move_to_end(conversation_id)
+        else:
+            messages = await self._get_remote(conversation_id)
+            if messages is None:
+                messages = await loader(self.size)
+                await self._fill_remote(conversation_id, messages)
+            self._remember(conversation_id, messages)
+            messages = self.local[conversation_id]
+        
+        return list(messages)[-limit:] if limit else []
+    
+    async def append(self, conversation_id: int, role: str, content: str, message_id: Optional[int] = None):
+        """Adiciona mensagem (já persistida) ao buffer aquecido"""
+        message = {"id": message_id, "role": role, "content": content}
+        
+        if conversation_id in self.local:
+            self.local[conversation_id].append(message)
+        
+        try:
+            key = self._key(conversation_id)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                # RPUSHX: não cria a lista se ela ainda não foi carregada do banco
+                pipe.rpushx(key, json.dumps(message, ensure_ascii=False))
+                pipe.ltrim(key, -self.size, -1)
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"❌ Erro ao atualizar histórico {conversation_id}: {e}")
+            self.local.pop(conversation_id, None)
+    
+    def forget_local(self):
+        """
+        Descarta o LRU do processo
+        
+        Chamado quando o worker assume novas lanes: outro worker pode ter
+        processado essas conversas nesse meio tempo.
+        """
+        self.local.clear()
+    
+    async def _get_remote(self, conversation_id: int):
+        try:
+            key = self._key(conversation_id)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.exists(key)
+                pipe.lrange(key, -self.size, -1)
+                exists, items = await pipe.execute()
+        except Exception as e:
+            logger.error(f"❌ Erro ao ler histórico {conversation_id}: {e}")
+            return None
+        
+        if not exists:
+            return None
+        return [json.loads(item) for item in items]
+    
+    async def _fill_remote(self, conversation_id: int, messages: List[Dict]):
+        if not messages:
+            return
+        try:
+            key = self._key(conversation_id)
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                pipe.rpush(key, *[json.dumps(m, ensure_ascii=False) for m in messages])
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"❌ Erro ao gravar histórico {conversation_id}: {e}")
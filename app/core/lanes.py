@@ -0,0 +1,174 @@
+"""
+Lanes de Execução
+Roteamento de mensagens por telefone para garantir ordem por conversa
+
+- lane_for: hash consistente (jump hash) do telefone para uma das N lanes
+- LaneLeases: distribui as lanes entre os workers (uma lane = um dono)
+- PhoneScheduler: execução serial por telefone, paralela entre telefones
+"""
+
+import asyncio
+import hashlib
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Set, Tuple
+from loguru import logger
+
+from app.config import settings
+from app.utils.redis_client import get_redis
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Jump consistent hash (Lamping & Veach): mapeia key para [0, buckets)"""
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return b
+
+
+def lane_for(phone: str, lanes: int = None) -> int:
+    """
+    Retorna a lane de um telefone
+    
+    O mapeamento é estável entre processos e, ao aumentar o número de
+    lanes, só ~1/N dos telefones muda de lane.
+    """
+    digest = hashlib.blake2b(phone.encode(), digest_size=8).digest()
+    return jump_hash(int.from_bytes(digest, "big"), lanes or settings.INGEST_LANES)
+
+
+class LaneLeases:
+    """
+    Leases de lanes no Redis
+    
+    Cada lane é consumida por um único worker por vez, o que mantém a
+    ordem das mensagens de um telefone mesmo com vários nós. As lanes
+    são divididas igualmente entre os workers vivos (heartbeat).
+    """
+    
+    RENEW_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('pexpire', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+    
+    RELEASE_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+    
+    def __init__(self, consumer: str, lanes: int = None, ttl_ms: int = None):
+        self.redis = get_redis()
+        self.consumer = consumer
+        self.lanes = lanes or settings.INGEST_LANES
+        self.ttl_ms = ttl_ms or settings.INGEST_LEASE_TTL_MS
+        self.owned: Set[int] = set()
+        self.members_key = f"{settings.INGEST_STREAM}:consumers"
+        self._renew = self.redis.register_script(self.RENEW_SCRIPT)
+        self._release = self.redis.register_script(self.RELEASE_SCRIPT)
+    
+    def _key(self, lane: int) -> str:
+        return f"{settings.INGEST_STREAM}:{lane}:lease"
+    
+    async def rebalance(self) -> Tuple[Set[int], Set[int], Set[int]]:
+        """
+        Renova leases, adquire lanes livres e calcula excedentes
+        
+        Returns:
+            (adquiridas, perdidas, excedentes) - excedentes devem ser
+            drenadas e liberadas com release()
+        """
+        now = time.time()
+        await self.redis.zadd(self.members_key, {self.consumer: now})
+        await self.redis.zremrangebyscore(self.members_key, 0, now - self.ttl_ms / 1000)
+        live = max(await self.redis.zcard(self.members_key), 1)
+        target = math.ceil(self.lanes / live)
+        
+        lost = set()
+        for lane in list(self.owned):
+            if not await self._renew(keys=[self._key(lane)], args=[self.consumer, self.ttl_ms]):
+                lost.add(lane)
+        self.owned -= lost
+        
+        acquired = set()
+        if len(self.owned) < target:
+            # Começa em um offset por consumidor para espalhar as lanes
+            start = lane_for(self.consumer, self.lanes)
+            for i in range(self.lanes):
+                if len(self.owned) >= target:
+                    break
+                lane = (start + i) % self.lanes
+                if lane in self.owned:
+                    continue
+                if await self.redis.set(self._key(lane), self.consumer, nx=True, px=self.ttl_ms):
+                    self.owned.add(lane)
+                    acquired.add(lane)
+        
+        surplus = set(sorted(self.owned)[target:]) if len(self.owned) > target else set()
+        
+        if acquired or lost:
+            logger.info(f"🛣️  Lanes de {self.consumer}: {sorted(self.owned)} (+{sorted(acquired)} -{sorted(lost)})")
+        
+        return acquired, lost, surplus
+    
+    async def release(self, lane: int):
+        """Libera uma lane para outro worker"""
+        await self._release(keys=[self._key(lane)], args=[self.consumer])
+        self.owned.discard(lane)
+        logger.info(f"🛣️  Lane {lane} liberada por {self.consumer}")
+    
+    async def release_all(self):
+        """Libera todas as lanes e sai do grupo de workers"""
+        for lane in list(self.owned):
+            await self.release(lane)
+        await self.redis.zrem(self.members_key, self.consumer)
+
+
+class PhoneScheduler:
+    """
+    Executa jobs em ordem por telefone e em paralelo entre telefones
+    
+    Cada telefone tem uma fila própria drenada por uma única task; o
+    número de jobs executando ao mesmo tempo é limitado por concurrency.
+    """
+    
+    def __init__(self, concurrency: int):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.queues: Dict[str, Deque[Callable[[], Awaitable]]] = {}
+        self.runners: Dict[str, asyncio.Task] = {}
+        self.size = 0
+    
+    def submit(self, phone: str, job: Callable[[], Awaitable]):
+        """Agenda um job para o telefone (executa após os anteriores)"""
+        self.queues.setdefault(phone, deque()).append(job)
+        self.size += 1
+        
+        if phone not in self.runners:
+            self.runners[phone] = asyncio.create_task(self._drain(phone))
+    
+    async def _drain(self, phone: str):
+        queue = self.queues[phone]
+        try:
+            while queue:
+                job = queue.popleft()
+                try:
+                    async with self.semaphore:
+                        await job()
+                except Exception as e:
+                    logger.error(f"❌ Job da lane de {phone} falhou: {e}")
+                finally:
+                    self.size -= 1
+        finally:
+            del self.queues[phone]
+            del self.runners[phone]
+    
+    async def join(self):
+        """Aguarda todos os jobs agendados"""
+        while self.runners:
+            await asyncio.gather(*list(self.runners.values()), return_exceptions=True)
@@ -0,0 +1,210 @@
+"""
+Fila de Ingestão
+Fila durável de mensagens recebidas baseada em Redis Streams
+"""
+
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+from loguru import logger
+
+from app.config import settings
+from app.core.lanes import lane_for
+from app.utils.redis_client import get_redis
+
+
+class MessageQueue:
+    """
+    Produtor/consumidor do stream de mensagens recebidas
+    
+    O stream é particionado em lanes (um stream por lane). Todas as
+    mensagens de um telefone caem sempre na mesma lane.
+    """
+    
+    def __init__(self, group: Optional[str] = None):
+        self.redis = get_redis()
+        self.group = group or settings.INGEST_GROUP
+        self.lanes = settings.INGEST_LANES
+        self.dead_letter_stream = f"{settings.INGEST_STREAM}:dead"
+    
+    def stream_for_lane(self, lane: int) -> str:
+        """Nome do stream de uma lane"""
+        return f"{settings.INGEST_STREAM}:{lane}"
+    
+    async def publish(self, payload: Dict) -> str:
+        """
+        Adiciona mensagem normalizada ao stream da lane do telefone
+        
+        Args:
+            payload: Dados da mensagem (phone, text, name, message_id)
+        
+        Returns:
+            ID da entrada no stream
+        """
+        stream = self.stream_for_lane(lane_for(payload["phone"], self.lanes))
+        entry_id = await self.redis.xadd(
+            stream,
+            {"payload": json.dumps(payload, ensure_ascii=False)},
+            maxlen=settings.INGEST_STREAM_MAXLEN,
+            approximate=True
+        )
+        return entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+    
+    async def ensure_group(self, lane: int):
+        """Cria o consumer group (e o stream) da lane se ainda não existir"""
+        stream = self.stream_for_lane(lane)
+        try:
+            await self.redis.xgroup_create(stream, self.group, id="0", mkstream=True)
+            logger.info(f"✅ Consumer group criado: {self.group} em {stream}")
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+    
+    async def read(self, consumer: str, lanes: Iterable[int], count: int, block_ms: int) -> List[Tuple[str, str, Dict]]:
+        """
+        Lê novas mensagens das lanes deste consumidor
+        
+        Returns:
+            Lista de (stream, entry_id, payload)
+        """
+        response = await self.redis.xreadgroup(
+            self.group,
+            consumer,
+            {self.stream_for_lane(lane): ">" for lane in lanes},
+            count=count,
+            block=block_ms
+        )
+        
+        entries = []
+        for stream, stream_entries in response or []:
+            stream = stream.decode() if isinstance(stream, bytes) else stream
+            entries.extend(self._decode(stream, stream_entries))
+        return entries
+    
+    async def reclaim(self, consumer: str, lane: int, min_idle_ms: int, count: int) -> List[Tuple[str, str, Dict]]:
+        """
+        Assume mensagens pendentes da lane deixadas por outro consumidor
+        
+        Entradas que já excederam o limite de entregas vão para o
+        stream de dead letter em vez de serem reprocessadas.
+        
+        Returns:
+            Lista de (stream, entry_id, payload) reivindicadas
+        """
+        stream = self.stream_for_lane(lane)
+        pending = await self.redis.xpending_range(
+            stream,
+            self.group,
+            min="-",
+            max="+",
+            count=count,
+            idle=min_idle_ms
+        )
+        
+        if not pending:
+            return []
+        
+        to_claim = []
+        for item in pending:
+            entry_id = item["message_id"]
+            entry_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+            if item["times_delivered"] >= settings.INGEST_MAX_DELIVERIES:
+                await self._dead_letter(stream, entry_id, item["times_delivered"])
+            else:
+                to_claim.append(entry_id)
+        
+        if not to_claim:
+            return []
+        
+        claimed = await self.redis.xclaim(
+            stream,
+            self.group,
+            consumer,
+            min_idle_time=min_idle_ms,
+            message_ids=to_claim
+        )
+        
+        entries = self._decode(stream, claimed)
+        
+        # Entradas já removidas do stream (XTRIM) não têm o que reprocessar
+        orphans = set(to_claim) - {entry_id for _, entry_id, _ in entries}
+        if orphans:
+            await self.ack(stream, *orphans)
+        
+        if entries:
+            logger.warning(f"♻️  {len(entries)} mensagens pendentes da lane {lane} reivindicadas por {consumer}")
+        return entries
+    
+    async def ack(self, stream: str, *entry_ids: str):
+        """Confirma o processamento das entradas de um stream"""
+        if entry_ids:
+            await self.redis.xack(stream, self.group, *entry_ids)
+    
+    async def stats(self) -> Dict:
+        """Retorna tamanho, backlog e pendências por lane e totais"""
+        totals = {"length": 0, "pending": 0, "lag": 0}
+        lanes = []
+        
+        for lane in range(self.lanes):
+            stream = self.stream_for_lane(lane)
+            lane_stats = {
+                "lane": lane,
+                "length": await self.redis.xlen(stream),
+                "pending": 0,
+                "lag": 0,
+                "owner": None
+            }
+            
+            try:
+                for group in await self.redis.xinfo_groups(stream):
+                    name = group["name"]
+                    name = name.decode() if isinstance(name, bytes) else name
+                    if name == self.group:
+                        lane_stats["pending"] = group["pending"]
+                        lane_stats["lag"] = group.get("lag") or 0
+            except Exception:
+                # Stream ainda não existe
+                pass
+            
+            owner = await self.redis.get(f"{stream}:lease")
+            lane_stats["owner"] = owner.decode() if owner else None
+            
+            for key in totals:
+                totals[key] += lane_stats[key]
+            lanes.append(lane_stats)
+        
+        return {
+            "stream": settings.INGEST_STREAM,
+            **totals,
+            "dead_letter": await self.redis.xlen(self.dead_letter_stream),
+            "lanes": lanes
+        }
+    
+    async def _dead_letter(self, stream: str, entry_id: str, deliveries: int):
+        """Move entrada para o stream de dead letter e confirma no grupo"""
+        entries = self._decode(stream, await self.redis.xrange(stream, entry_id, entry_id))
+        
+        for _, original_id, payload in entries:
+            await self.redis.xadd(
+                self.dead_letter_stream,
+                {
+                    "payload": json.dumps(payload, ensure_ascii=False),
+                    "original_stream": stream,
+                    "original_id": original_id,
+                    "deliveries": deliveries
+                }
+            )
+        
+        await self.ack(stream, entry_id)
+        logger.error(f"💀 Mensagem {entry_id} movida para dead letter após {deliveries} entregas")
+    
+    def _decode(self, stream: str, stream_entries) -> List[Tuple[str, str, Dict]]:
+        """Converte entradas brutas do Redis em (stream, entry_id, payload)"""
+        entries = []
+        for entry_id, fields in stream_entries:
+            if not fields:
+                # Entrada removida por XTRIM antes de ser processada
+                continue
+            entry_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+            raw = fields.get(b"payload") or fields.get("payload")
+            entries.append((stream, entry_id, json.loads(raw)))
+        return entries
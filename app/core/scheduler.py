@@ -4,7 +4,8 @@ Agenda follow-ups automáticos para conversas
 """
 
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
 
 from app.models.followup import Followup, FollowupStatus, FollowupType
@@ -16,21 +17,20 @@ class FollowupScheduler:
     """Gerenciador de agendamento de follow-ups"""
     
     @staticmethod
-    def schedule_followups(conversation_id: int, db: Session):
+    async def schedule_followups(conversation_id: int, db: AsyncSession, commit: bool = True):
         """
         Agenda todos os follow-ups para uma conversa
         
         Args:
             conversation_id: ID da conversa
             db: Sessão do banco de dados
+            commit: Se False, fica na transação do chamador
         """
         logger.info(f"📅 Agendando follow-ups para conversa {conversation_id}")
         
         try:
             # Busca conversa
-            conversation = db.query(Conversation).filter(
-                Conversation.id == conversation_id
-            ).first()
+            conversation = await db.get(Conversation, conversation_id)
             
             if not conversation:
                 logger.error(f"❌ Conversa {conversation_id} não encontrada")
@@ -40,10 +40,10 @@ class FollowupScheduler:
             
             # Define os intervalos de follow-up
             followup_intervals = {
-                FollowupType.THREE_HOURS: timedelta(hours=3),
-                FollowupType.ONE_DAY: timedelta(days=1),
-                FollowupType.THREE_DAYS: timedelta(days=3),
-                FollowupType.SEVEN_DAYS: timedelta(days=7),
+                FollowupType.three_hours: timedelta(hours=3),
+                FollowupType.one_day: timedelta(days=1),
+                FollowupType.three_days: timedelta(days=3),
+                FollowupType.seven_days: timedelta(days=7),
             }
             
             # Cria os follow-ups
@@ -54,52 +54,63 @@ class FollowupScheduler:
                     conversation_id=conversation_id,
                     type=followup_type,
                     scheduled_for=scheduled_for,
-                    status=FollowupStatus.PENDING,
+                    status=FollowupStatus.pending,
                     message=f"Follow-up automático {followup_type.value}"
                 )
                 
                 db.add(followup)
                 logger.info(f"✅ Follow-up {followup_type.value} agendado para {scheduled_for}")
             
-            db.commit()
+            if commit:
+                await db.commit()
             logger.info(f"✅ {len(followup_intervals)} follow-ups agendados")
             
         except Exception as e:
             logger.error(f"❌ Erro ao agendar follow-ups: {e}")
-            db.rollback()
+            if commit:
+                await db.rollback()
+            else:
+                raise
     
     @staticmethod
-    def cancel_followups(conversation_id: int, db: Session):
+    async def cancel_followups(conversation_id: int, db: AsyncSession, commit: bool = True):
         """
         Cancela todos os follow-ups pendentes de uma conversa
         
         Args:
             conversation_id: ID da conversa
             db: Sessão do banco de dados
+            commit: Se False, fica na transação do chamador
         """
         logger.info(f"🚫 Cancelando follow-ups da conversa {conversation_id}")
         
         try:
             # Busca follow-ups pendentes
-            pending = db.query(Followup).filter(
-                Followup.conversation_id == conversation_id,
-                Followup.status == FollowupStatus.PENDING
-            ).all()
+            pending = (await db.scalars(
+                select(Followup).where(
+                    Followup.conversation_id == conversation_id,
+                    Followup.status == FollowupStatus.pending
+                )
+            )).all()
             
             # Cancela cada um
             for followup in pending:
-                followup.status = FollowupStatus.CANCELLED
+                followup.status = FollowupStatus.cancelled
                 logger.info(f"✅ Follow-up {followup.id} cancelado")
             
-            db.commit()
+            if commit:
+                await db.commit()
             logger.info(f"✅ {len(pending)} follow-ups cancelados")
             
         except Exception as e:
             logger.error(f"❌ Erro ao cancelar follow-ups: {e}")
-            db.rollback()
+            if commit:
+                await db.rollback()
+            else:
+                raise
     
     @staticmethod
-    def reschedule_followup(followup_id: int, new_time: datetime, db: Session):
+    async def reschedule_followup(followup_id: int, new_time: datetime, db: AsyncSession):
         """
         Reagenda um follow-up específico
         
@@ -111,9 +122,7 @@ class FollowupScheduler:
         logger.info(f"🔄 Reagendando follow-up {followup_id}")
         
         try:
-            followup = db.query(Followup).filter(
-                Followup.id == followup_id
-            ).first()
+            followup = await db.get(Followup, followup_id)
             
             if not followup:
                 logger.error(f"❌ Follow-up {followup_id} não encontrado")
@@ -121,11 +130,11 @@ class FollowupScheduler:
             
             old_time = followup.scheduled_for
             followup.scheduled_for = new_time
-            followup.status = FollowupStatus.PENDING
+            followup.status = FollowupStatus.pending
             
-            db.commit()
+            await db.commit()
             logger.info(f"✅ Follow-up reagendado: {old_time} → {new_time}")
             
         except Exception as e:
             logger.error(f"❌ Erro ao reagendar follow-up: {e}")
-            db.rollback()
\ No newline at end of file
+            await db.rollback()
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""
+Estado Quente das Conversas
+Cache no Redis do snapshot da conversa ativa de cada telefone
+"""
+
+import json
+from typing import Dict, Optional
+from loguru import logger
+
+from app.config import settings
+from app.models.conversation import Conversation
+from app.models.lead import Lead
+from app.utils.redis_client import get_redis
+
+
+class ConversationStateCache:
+    """
+    Snapshot da conversa ativa por telefone (read-through / write-through)
+    
+    Guarda id, status, estágio e resumo da conversa e os dados do lead
+    (incluindo datacrazy_id), evitando consultar conversations e leads a
+    cada mensagem. Deve ser invalidado sempre que status, estágio ou
+    resumo mudarem.
+    """
+    
+    def __init__(self, ttl: int = None):
+        self.redis = get_redis()
+        self.ttl = ttl or settings.STATE_CACHE_TTL
+    
+    def _key(self, phone: str) -> str:
+        return f"conv_state:{phone}"
+    
+    @staticmethod
+    def snapshot(conversation: Conversation, lead: Optional[Lead]) -> Dict:
+        """Monta o snapshot a partir dos objetos do banco"""
+        return {
+            "conversation_id": conversation.id,
+            "phone": conversation.phone,
+            "status": conversation.status.value,
+            "stage": conversation.current_stage.value,
+            "summary": conversation.summary,
+            "summary_message_id": conversation.summary_message_id,
+            "lead": lead.to_dict() if lead else {}
+        }
+    
+    async def get(self, phone: str) -> Optional[Dict]:
+        """Retorna o snapshot do telefone ou None se não estiver em cache"""
+        try:
+            value = await self.redis.get(self._key(phone))
+            return json.loads(value) if value else None
+        except Exception as e:
+            logger.error(f"❌ Erro ao ler estado da conversa {phone}: {e}")
+            return None
+    
+    async def set(self, state: Dict):
+        """Grava o snapshot (somente após o commit da transação)"""
+        try:
+            await self.redis.setex(
+                self._key(state["phone"]),
+                self.ttl,
+                json.dumps(state, ensure_ascii=False, default=str)
+            )
+        except Exception as e:
+            logger.error(f"❌ Erro ao gravar estado da conversa {state['phone']}: {e}")
+    
+    async def invalidate(self, phone: str):
+        """Remove o snapshot (mudança de status/estágio/resumo)"""
+        try:
+            await self.redis.delete(self._key(phone))
+        except Exception as e:
+            logger.error(f"❌ Erro ao invalidar estado da conversa {phone}: {e}")
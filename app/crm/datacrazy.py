@@ -4,27 +4,33 @@ URL: https://api.g1.datacrazy.io/api/v1
 Documentação: https://datacrazy.mintlify.app/
 """
 
-import requests
+import httpx
 from typing import Dict, Optional
 from loguru import logger
-import time
+from app.config import settings
+from app.core import deadline
+from app.core.circuit_breaker import CircuitBreaker
 
 
 class DataCrazyClient:
     """Cliente para API do DataCrazy CRM"""
     
-    def __init__(self, api_token: str, base_url: str = None):
-        self.api_token = api_token
+    def __init__(self, api_token: str = None, base_url: str = None):
+        self.api_token = api_token or settings.DATACRAZY_API_TOKEN
         # URL CORRETA da API DataCrazy
-        self.base_url = base_url or "https://api.g1.datacrazy.io/api/v1"
+        self.base_url = base_url or settings.DATACRAZY_BASE_URL
         self.headers = {
-            "Authorization": f"Bearer {api_token}",
+            "Authorization": f"Bearer {self.api_token}",
             "Content-Type": "application/json"
         }
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        self.session = httpx.AsyncClient(headers=self.headers, timeout=10)
+        self.breaker = CircuitBreaker("datacrazy")
     
-    def _make_request(
+    async def close(self):
+        """Fecha o pool de conexões HTTP"""
+        await self.session.aclose()
+    
+    async def _make_request(
         self, 
         method: str, 
         endpoint: str, 
@@ -37,17 +43,23 @@ class DataCrazyClient:
         
         for attempt in range(max_retries):
             try:
-                if method == "GET":
-                    response = self.session.get(url, params=params, timeout=10)
-                elif method == "POST":
-                    response = self.session.post(url, json=data, timeout=10)
-                elif method == "PATCH":
-                    response = self.session.patch(url, json=data, timeout=10)
-                elif method == "DELETE":
-                    response = self.session.delete(url, timeout=10)
-                else:
+                # Timeout limitado pelo prazo do turno (se houver)
+                timeout = deadline.timeout(10)
+                if method not in ("GET", "POST", "PATCH", "DELETE"):
                     raise ValueError(f"Método HTTP inválido: {method}")
                 
+                # Circuito aberto levanta CircuitOpenError sem chamar a API
+                async with self.breaker.call() as call:
+                    if method == "GET":
+                        response = await self.session.get(url, params=params, timeout=timeout)
+                    elif method == "POST":
+                        response = await self.session.post(url, json=data, timeout=timeout)
+                    elif method == "PATCH":
+                        response = await self.session.patch(url, json=data, timeout=timeout)
+                    else:
+                        response = await self.session.delete(url, timeout=timeout)
+                    call.failed = response.status_code >= 500
+                
                 logger.info(f"📤 DataCrazy {method} {endpoint}: Status {response.status_code}")
                 
                 # Trata sucesso
@@ -61,8 +73,8 @@ class DataCrazyClient:
                     if attempt < max_retries - 1:
                         wait_time = 2 ** attempt
                         logger.warning(f"⚠️  Rate limit - aguardando {wait_time}s")
-                        time.sleep(wait_time)
-                        continue
+                        if await deadline.backoff(wait_time):
+                            continue
                 
                 # Trata outros erros
                 try:
@@ -73,17 +85,15 @@ class DataCrazyClient:
                 logger.error(f"❌ Erro DataCrazy: {response.status_code} - {error_data}")
                 response.raise_for_status()
                 
-            except requests.exceptions.Timeout:
-                if attempt < max_retries - 1:
+            except httpx.TimeoutException:
+                if attempt < max_retries - 1 and await deadline.backoff(1):
                     logger.warning(f"⏱️  Timeout - tentativa {attempt + 2}/{max_retries}")
-                    time.sleep(1)
                     continue
                 raise
             
-            except requests.exceptions.RequestException as e:
-                if attempt < max_retries - 1:
+            except httpx.HTTPError as e:
+                if attempt < max_retries - 1 and await deadline.backoff(2 ** attempt):
                     logger.warning(f"🔄 Erro de rede - tentativa {attempt + 2}/{max_retries}")
-                    time.sleep(2 ** attempt)
                     continue
                 raise
         
@@ -91,7 +101,7 @@ class DataCrazyClient:
     
     # ========== LEADS ==========
     
-    def create_lead(self, data: Dict) -> Dict:
+    async def create_lead(self, data: Dict) -> Dict:
         """
         Cria um novo lead
         
@@ -107,29 +117,29 @@ class DataCrazyClient:
         logger.info(f"📝 Criando lead: {data.get('name')} - {data.get('phone')}")
         
         try:
-            result = self._make_request("POST", "leads", data=data)
+            result = await self._make_request("POST", "leads", data=data)
             logger.info(f"✅ Lead criado com sucesso: ID {result.get('id')}")
             return result
         except Exception as e:
             logger.error(f"❌ Falha ao criar lead no DataCrazy")
             raise
     
-    def update_lead(self, lead_id: str, data: Dict) -> Dict:
+    async def update_lead(self, lead_id: str, data: Dict) -> Dict:
         """Atualiza um lead existente"""
         logger.info(f"🔄 Atualizando lead {lead_id}")
-        return self._make_request("PATCH", f"leads/{lead_id}", data=data)
+        return await self._make_request("PATCH", f"leads/{lead_id}", data=data)
     
-    def get_lead(self, lead_id: str) -> Dict:
+    async def get_lead(self, lead_id: str) -> Dict:
         """Busca informações de um lead"""
-        return self._make_request("GET", f"leads/{lead_id}")
+        return await self._make_request("GET", f"leads/{lead_id}")
     
-    def list_leads(self, params: Optional[Dict] = None) -> Dict:
+    async def list_leads(self, params: Optional[Dict] = None) -> Dict:
         """Lista leads com filtros opcionais"""
-        return self._make_request("GET", "leads", params=params)
+        return await self._make_request("GET", "leads", params=params)
     
     # ========== NEGÓCIOS ==========
     
-    def create_deal(self, lead_id: str, pipeline_id: str, stage_id: str, data: Dict) -> Dict:
+    async def create_deal(self, lead_id: str, pipeline_id: str, stage_id: str, data: Dict) -> Dict:
         """
         Cria um negócio para um lead
         
@@ -145,16 +155,16 @@ class DataCrazyClient:
             **data
         }
         logger.info(f"💼 Criando negócio para lead {lead_id}")
-        return self._make_request("POST", f"leads/{lead_id}/deals", data=payload)
+        return await self._make_request("POST", f"leads/{lead_id}/deals", data=payload)
     
-    def update_deal(self, deal_id: str, data: Dict) -> Dict:
+    async def update_deal(self, deal_id: str, data: Dict) -> Dict:
         """Atualiza um negócio"""
         logger.info(f"🔄 Atualizando negócio {deal_id}")
-        return self._make_request("PATCH", f"deals/{deal_id}", data=data)
+        return await self._make_request("PATCH", f"deals/{deal_id}", data=data)
     
     # ========== ANOTAÇÕES ==========
     
-    def add_note(self, lead_id: str, content: str) -> Dict:
+    async def add_note(self, lead_id: str, content: str) -> Dict:
         """
         Adiciona uma anotação ao lead
         
@@ -167,11 +177,11 @@ class DataCrazyClient:
         """
         data = {"note": content}
         logger.info(f"📝 Adicionando nota ao lead {lead_id}")
-        return self._make_request("POST", f"leads/{lead_id}/notes", data=data)
+        return await self._make_request("POST", f"leads/{lead_id}/notes", data=data)
     
     # ========== ATIVIDADES ==========
     
-    def create_activity(self, lead_id: str, data: Dict) -> Dict:
+    async def create_activity(self, lead_id: str, data: Dict) -> Dict:
         """
         Cria uma atividade para um lead
         
@@ -185,21 +195,21 @@ class DataCrazyClient:
             }
         """
         logger.info(f"📅 Criando atividade para lead {lead_id}: {data.get('title')}")
-        return self._make_request("POST", f"leads/{lead_id}/activities", data=data)
+        return await self._make_request("POST", f"leads/{lead_id}/activities", data=data)
     
     # ========== TAGS ==========
     
-    def add_tags(self, lead_id: str, tag_ids: list) -> Dict:
+    async def add_tags(self, lead_id: str, tag_ids: list) -> Dict:
         """Adiciona tags a um lead"""
         data = {"tags": [{"id": tag_id} for tag_id in tag_ids]}
-        return self._make_request("POST", f"leads/{lead_id}/tags", data=data)
+        return await self._make_request("POST", f"leads/{lead_id}/tags", data=data)
     
     # ========== HEALTH CHECK ==========
     
-    def health_check(self) -> bool:
+    async def health_check(self) -> bool:
         """Verifica se a conexão com a API está funcionando"""
         try:
-            self.list_leads(params={"page": 1, "perPage": 1})
+            await self.list_leads(params={"page": 1, "perPage": 1})
             logger.info("✅ Conexão DataCrazy OK")
             return True
         except Exception as e:
@@ -2,7 +2,7 @@ from app.crm.datacrazy import DataCrazyClient
 from app.crm.stage_mapper import StageMapper
 from app.models.lead import Lead
 from app.models.conversation import Conversation
-from app.database import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
 from typing import Optional, Dict
 
@@ -10,16 +10,17 @@ from typing import Optional, Dict
 class CRMSyncService:
     """Serviço de sincronização com DataCrazy CRM"""
     
-    def __init__(self):
-        self.crm = DataCrazyClient()
-        self.db = SessionLocal()
+    def __init__(self, db: AsyncSession, crm: Optional[DataCrazyClient] = None):
+        self.crm = crm or DataCrazyClient()
+        self.db = db
     
-    def sync_lead_create(self, lead_id: int) -> bool:
+    async def sync_lead_create(self, lead_id: int, commit: bool = True) -> bool:
         """
         Cria lead no DataCrazy
         
         Args:
             lead_id: ID do lead no nosso banco
+            commit: Se False, o datacrazy_id é salvo na transação do chamador
             
         Returns:
             True se criado com sucesso
@@ -27,7 +28,7 @@ class CRMSyncService:
         
         try:
             # Buscar lead no banco
-            lead = self.db.query(Lead).filter(Lead.id == lead_id).first()
+            lead = await self.db.get(Lead, lead_id)
             
             if not lead:
                 logger.error(f"❌ Lead {lead_id} não encontrado no banco")
@@ -51,14 +52,15 @@ class CRMSyncService:
                 data["custom_fields"] = lead.profile
             
             # Criar no DataCrazy
-            result = self.crm.create_lead(data)
+            result = await self.crm.create_lead(data)
             
             if result and result.get('data'):
                 datacrazy_id = result['data'].get('id')
                 
                 # Salvar datacrazy_id no nosso banco
                 lead.datacrazy_id = datacrazy_id
-                self.db.commit()
+                if commit:
+                    await self.db.commit()
                 
                 logger.info(f"✅ Lead {lead_id} sincronizado: DataCrazy ID {datacrazy_id}")
                 return True
@@ -69,10 +71,8 @@ class CRMSyncService:
         except Exception as e:
             logger.error(f"❌ Erro ao sincronizar lead {lead_id}: {e}")
             return False
-        finally:
-            self.db.close()
     
-    def sync_lead_update(self, lead_id: int, updates: Dict) -> bool:
+    async def sync_lead_update(self, lead_id: int, updates: Dict) -> bool:
         """
         Atualiza lead no DataCrazy
         
@@ -85,7 +85,7 @@ class CRMSyncService:
         """
         
         try:
-            lead = self.db.query(Lead).filter(Lead.id == lead_id).first()
+            lead = await self.db.get(Lead, lead_id)
             
             if not lead:
                 logger.error(f"❌ Lead {lead_id} não encontrado")
@@ -93,10 +93,10 @@ class CRMSyncService:
             
             if not lead.datacrazy_id:
                 logger.warning(f"⚠️  Lead {lead_id} sem datacrazy_id, criando...")
-                return self.sync_lead_create(lead_id)
+                return await self.sync_lead_create(lead_id)
             
             # Atualizar no DataCrazy
-            result = self.crm.update_lead(lead.datacrazy_id, updates)
+            result = await self.crm.update_lead(lead.datacrazy_id, updates)
             
             if result:
                 logger.info(f"✅ Lead {lead_id} atualizado no DataCrazy")
@@ -107,10 +107,8 @@ class CRMSyncService:
         except Exception as e:
             logger.error(f"❌ Erro ao atualizar lead {lead_id}: {e}")
             return False
-        finally:
-            self.db.close()
     
-    def sync_stage_change(self, conversation_id: int) -> bool:
+    async def sync_stage_change(self, conversation_id: int) -> bool:
         """
         Sincroniza mudança de estágio da conversa
         
@@ -122,21 +120,19 @@ class CRMSyncService:
         """
         
         try:
-            conversation = self.db.query(Conversation).filter(
-                Conversation.id == conversation_id
-            ).first()
+            conversation = await self.db.get(Conversation, conversation_id)
             
             if not conversation:
                 logger.error(f"❌ Conversa {conversation_id} não encontrada")
                 return False
             
-            lead = self.db.query(Lead).filter(Lead.id == conversation.lead_id).first()
+            lead = await self.db.get(Lead, conversation.lead_id)
             
             if not lead or not lead.datacrazy_id:
                 logger.warning(f"⚠️  Lead sem datacrazy_id, sincronizando primeiro...")
-                self.sync_lead_create(conversation.lead_id)
+                await self.sync_lead_create(conversation.lead_id)
                 # Recarregar lead
-                lead = self.db.query(Lead).filter(Lead.id == conversation.lead_id).first()
+                lead = await self.db.get(Lead, conversation.lead_id)
             
             if not lead or not lead.datacrazy_id:
                 return False
@@ -156,7 +152,7 @@ class CRMSyncService:
                 }
             }
             
-            result = self.crm.update_lead(lead.datacrazy_id, update_data)
+            result = await self.crm.update_lead(lead.datacrazy_id, update_data)
             
             if result:
                 logger.info(f"✅ Estágio sincronizado: Conversa {conversation_id}")
@@ -167,10 +163,8 @@ class CRMSyncService:
         except Exception as e:
             logger.error(f"❌ Erro ao sincronizar estágio: {e}")
             return False
-        finally:
-            self.db.close()
     
-    def add_note_to_lead(self, lead_id: int, note_content: str) -> bool:
+    async def add_note_to_lead(self, lead_id: int, note_content: str) -> bool:
         """
         Adiciona nota ao lead no DataCrazy
         
@@ -183,13 +177,13 @@ class CRMSyncService:
         """
         
         try:
-            lead = self.db.query(Lead).filter(Lead.id == lead_id).first()
+            lead = await self.db.get(Lead, lead_id)
             
             if not lead or not lead.datacrazy_id:
                 logger.warning(f"⚠️  Lead {lead_id} sem datacrazy_id")
                 return False
             
-            result = self.crm.add_note(lead.datacrazy_id, note_content)
+            result = await self.crm.add_note(lead.datacrazy_id, note_content)
             
             if result:
                 logger.info(f"✅ Nota adicionada ao lead {lead_id}")
@@ -199,6 +193,4 @@ class CRMSyncService:
                 
         except Exception as e:
             logger.error(f"❌ Erro ao adicionar nota: {e}")
-            return False
-        finally:
-            self.db.close()
\ No newline at end of file
+            return False
\ No newline at end of file
@@ -0,0 +1,160 @@
+"""
+Roteamento de Modelos
+Escolhe o modelo de cada turno (barato primeiro, forte quando importa)
+
+- fast: modelo padrão, rápido e barato (maioria dos turnos)
+- strong: turnos de fechamento/objeção, prompts grandes e reprocessamento
+  de saídas inválidas do modelo rápido
+
+Latência e custo por tier ficam em contadores no Redis, somados entre
+todos os processos.
+"""
+
+import time
+from typing import Dict, List, Optional
+from loguru import logger
+
+from app.config import settings
+from app.utils.redis_client import get_redis
+
+
+FAST = "fast"
+STRONG = "strong"
+
+# Limites superiores (ms) do histograma de latência
+LATENCY_BUCKETS = (500, 1000, 2000, 4000, 8000, 16000)
+
+
+class ModelRouter:
+    """
+    Seleção de modelo por turno a partir de estágio, intenção e tamanho do prompt
+    
+    Cada tier é um dict com name, model e temperature.
+    """
+    
+    def __init__(self):
+        self.redis = get_redis()
+        self.tiers = {
+            FAST: {"name": FAST, "model": settings.MODEL_FAST, "temperature": settings.MODEL_FAST_TEMPERATURE},
+            STRONG: {"name": STRONG, "model": settings.MODEL_STRONG, "temperature": settings.MODEL_STRONG_TEMPERATURE}
+        }
+    
+    def _key(self, tier: str) -> str:
+        return f"llm:tier:{tier}"
+    
+    def select(self, stage: str, intent: Optional[str] = None) -> Dict:
+        """Tier inicial do turno: forte apenas em fechamento/objeção"""
+        if intent in settings.MODEL_STRONG_INTENTS or stage in settings.MODEL_STRONG_STAGES:
+            return self.tiers[STRONG]
+        return self.tiers[FAST]
+    
+    def for_prompt(self, tier: Dict, prompt_tokens: int) -> Dict:
+        """Sobe para o tier forte quando o prompt montado é grande demais para o rápido"""
+        if tier["name"] == FAST and prompt_tokens > settings.MODEL_FAST_MAX_PROMPT_TOKENS:
+            logger.info(f"🪜 Prompt com {prompt_tokens} tokens: usando tier {STRONG}")
+            return self.tiers[STRONG]
+        return tier
+    
+    def escalate(self, tier: Dict) -> Optional[Dict]:
+        """Próximo tier após uma saída inválida (None se já é o mais forte)"""
+        if tier["name"] == FAST:
+            return self.tiers[STRONG]
+        return None
+    
+    async def record(
+        self,
+        tier: Dict,
+        started: float,
+        first_token_at: Optional[float] = None,
+        escalated: bool = False,
+        failed: bool = False
+    ):
+        """
+        Contabiliza uma chamada do tier
+        
+        Args:
+            tier: Tier usado
+            started: time.monotonic() do início da chamada
+            first_token_at: time.monotonic() do primeiro trecho (streaming)
+            escalated: A chamada é um reprocessamento vindo do tier anterior
+            failed: A saída foi inválida/vazia
+        """
+        latency_ms = int((time.monotonic() - started) * 1000)
+        bucket = next((f"le_{limit}" for limit in LATENCY_BUCKETS if latency_ms <= limit), "le_inf")
+        
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                key = self._key(tier["name"])
+                pipe.hincrby(key, "calls", 1)
+                pipe.hincrby(key, "latency_ms", latency_ms)
+                pipe.hincrby(key, bucket, 1)
+                if first_token_at is not None:
+                    pipe.hincrby(key, "first_token_calls", 1)
+                    pipe.hincrby(key, "first_token_ms", int((first_token_at - started) * 1000))
+                if escalated:
+                    pipe.hincrby(key, "escalations", 1)
+                if failed:
+                    pipe.hincrby(key, "failures", 1)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"❌ Erro ao registrar métricas do tier {tier['name']}: {e}")
+    
+    async def get_stats(self, usage: Dict[str, Dict[str, int]]) -> Dict[str, Dict]:
+        """
+        Latência e custo por tier
+        
+        Args:
+            usage: Tokens por modelo (OpenAIClient.get_shared_usage)
+        
+        Returns:
+            Por tier: modelo, chamadas, escalonamentos, falhas, latência
+            média/p50/p95 (limite do bucket), tempo até o primeiro trecho e
+            custo estimado em USD do modelo do tier
+        """
+        stats = {}
+        for name, tier in self.tiers.items():
+            raw = await self.redis.hgetall(self._key(name))
+            values = {field.decode(): int(value) for field, value in raw.items()}
+            calls = values.get("calls", 0)
+            
+            stats[name] = {
+                "model": tier["model"],
+                "calls": calls,
+                "escalations": values.get("escalations", 0),
+                "failures": values.get("failures", 0),
+                "avg_latency_ms": values.get("latency_ms", 0) // calls if calls else 0,
+                "p50_latency_ms": self._percentile(values, calls, 0.5),
+                "p95_latency_ms": self._percentile(values, calls, 0.95),
+                "avg_first_token_ms": (
+                    values["first_token_ms"] // values["first_token_calls"]
+                    if values.get("first_token_calls") else None
+                ),
+                "cost_usd": round(self._cost(tier["model"], usage.get(tier["model"], {})), 4)
+            }
+        return stats
+    
+    @staticmethod
+    def _percentile(values: Dict[str, int], calls: int, q: float) -> Optional[int]:
+        """Limite superior do bucket que contém o percentil q (None se acima do último)"""
+        if not calls:
+            return None
+        seen = 0
+        for limit in LATENCY_BUCKETS:
+            seen += values.get(f"le_{limit}", 0)
+            if seen >= calls * q:
+                return limit
+        return None
+    
+    @staticmethod
+    def _cost(model: str, usage: Dict[str, int]) -> float:
+        """Custo em USD a partir dos tokens do modelo (entrada, entrada em cache e saída)"""
+        prices: List[float] = settings.MODEL_PRICES.get(model)
+        if not prices or not usage:
+            return 0.0
+        
+        price_in, price_cached, price_out = prices
+        prompt = usage.get("prompt_tokens", 0)
+        cached = usage.get("cached_tokens", 0)
+        completion = usage.get("total_tokens", 0) - prompt
+        
+        return ((prompt - cached) * price_in + cached * price_cached + completion * price_out) / 1_000_000
@@ -1,8 +1,17 @@
-from openai import OpenAI
+import time
+from openai import APIConnectionError, AsyncOpenAI, InternalServerError
 from app.config import settings
+from app.core import deadline
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.llm.rate_limiter import OpenAIRateLimiter
+from app.llm.token_budget import count_message_tokens
 from loguru import logger
-import time
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional
+
+
+# Erros que indicam a API degradada (timeout, conexão, 5xx); rate limit e
+# requisições inválidas não contam para o circuit breaker
+UPSTREAM_ERRORS = (APIConnectionError, InternalServerError)
 
 
 class OpenAIClient:
@@ -14,16 +23,21 @@ class OpenAIClient:
         """Singleton pattern"""
         if cls._instance is None:
             cls._instance = super(OpenAIClient, cls).__new__(cls)
-            cls._instance.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+            # Sem retries internos do SDK: os daqui passam pelo limiter, pelo prazo e pelo breaker
+            cls._instance.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
             cls._instance.total_tokens = 0
+            cls._instance.cached_tokens = 0
+            cls._instance.limiter = OpenAIRateLimiter()
+            cls._instance.breaker = CircuitBreaker("openai")
         return cls._instance
     
-    def chat_completion(
+    async def chat_completion(
         self, 
         messages: List[Dict], 
         temperature: float = 0.7,
         max_tokens: int = 500,
-        model: str = "gpt-4o-mini"
+        model: str = "gpt-4o-mini",
+        response_format: Optional[Dict] = None
     ) -> Optional[str]:
         """
         Gera resposta usando chat completion com retry automático
@@ -33,29 +47,41 @@ class OpenAIClient:
             temperature: Criatividade (0-2)
             max_tokens: Máximo de tokens na resposta
             model: Modelo a usar
+            response_format: Formato estruturado da saída (JSON schema, opcional)
             
         Returns:
             Resposta do modelo ou None em caso de erro
+        
+        Raises:
+            CircuitOpenError: se o circuito da OpenAI está aberto (o chamador
+                responde com a contingência em vez de esperar)
         """
         max_retries = 3
         retry_delay = 2
+        estimated_tokens = self.estimate_tokens(messages, max_tokens, model)
         
         for attempt in range(max_retries):
             try:
-                response = self.client.chat.completions.create(
-                    model=model,
-                    messages=messages,
-                    temperature=temperature,
-                    max_tokens=max_tokens
-                )
-                
-                # Contabilizar tokens
-                usage = response.usage
-                self.total_tokens += usage.total_tokens
-                
-                logger.info(f"✅ OpenAI: {usage.total_tokens} tokens usados (total: {self.total_tokens})")
+                # Reserva RPM/TPM no limiter compartilhado antes de chamar a API
+                # Circuito aberto falha antes de reservar no limiter
+                async with self.breaker.call(UPSTREAM_ERRORS) as call:
+                    async with self.limiter.reserve(model, estimated_tokens) as reservation:
+                        call.restart()
+                        response = await self.client.chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            temperature=temperature,
+                            max_tokens=max_tokens,
+                            timeout=deadline.timeout(60),
+                            **({"response_format": response_format} if response_format else {})
+                        )
+                        self._record_usage(response.usage, reservation)
                 
                 return response.choices[0].message.content
+            
+            except CircuitOpenError:
+                logger.warning("🔌 OpenAI indisponível (circuito aberto) - falhando rápido")
+                raise
                 
             except Exception as e:
                 error_msg = str(e)
@@ -64,31 +90,137 @@ class OpenAIClient:
                 if "rate_limit" in error_msg.lower():
                     wait_time = retry_delay * (attempt + 2)
                     logger.warning(f"⚠️  Rate limit atingido. Aguardando {wait_time}s...")
-                    time.sleep(wait_time)
-                    continue
+                    if await deadline.backoff(wait_time):
+                        continue
+                    break
                 
                 # Timeout - tentar novamente
                 elif "timeout" in error_msg.lower():
                     logger.warning(f"⚠️  Timeout. Tentativa {attempt + 1}/{max_retries}")
-                    time.sleep(retry_delay)
-                    continue
+                    if await deadline.backoff(retry_delay):
+                        continue
+                    break
                 
                 # API down - aguardar
                 elif "connection" in error_msg.lower() or "unavailable" in error_msg.lower():
                     logger.warning(f"⚠️  API indisponível. Tentativa {attempt + 1}/{max_retries}")
-                    time.sleep(retry_delay * 2)
-                    continue
+                    if await deadline.backoff(retry_delay * 2):
+                        continue
+                    break
                 
                 # Outros erros - falhar
                 else:
                     logger.error(f"❌ Erro OpenAI: {e}")
-                    if attempt == max_retries - 1:
+                    if attempt == max_retries - 1 or not await deadline.backoff(retry_delay):
                         return None
-                    time.sleep(retry_delay)
         
         logger.error("❌ Falha após todas as tentativas")
         return None
     
+    async def chat_completion_stream(
+        self,
+        messages: List[Dict],
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        model: str = "gpt-4o-mini",
+        response_format: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Gera resposta em streaming, entregando os trechos conforme chegam
+        
+        Só tenta novamente se a falha ocorrer antes do primeiro trecho;
+        depois disso o erro é propagado (parte da resposta já foi usada).
+        
+        Yields:
+            Trechos de texto da resposta
+        
+        Raises:
+            CircuitOpenError: se o circuito da OpenAI está aberto
+        """
+        max_retries = 3
+        retry_delay = 2
+        estimated_tokens = self.estimate_tokens(messages, max_tokens, model)
+        
+        for attempt in range(max_retries):
+            produced = False
+            
+            # Circuito aberto falha antes de reservar no limiter
+            if not await self.breaker.allow():
+                logger.warning("🔌 OpenAI indisponível (circuito aberto) - falhando rápido")
+                raise CircuitOpenError(f"Circuito {self.breaker.name} aberto")
+            
+            try:
+                async with self.limiter.reserve(model, estimated_tokens) as reservation:
+                    # O circuit breaker mede só até o início do stream (tempo de resposta da API)
+                    started = time.monotonic()
+                    try:
+                        stream = await self.client.chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            temperature=temperature,
+                            max_tokens=max_tokens,
+                            stream=True,
+                            stream_options={"include_usage": True},
+                            timeout=deadline.timeout(60),
+                            **({"response_format": response_format} if response_format else {})
+                        )
+                    except Exception as e:
+                        await self.breaker.record(time.monotonic() - started, failed=isinstance(e, UPSTREAM_ERRORS))
+                        raise
+                    await self.breaker.record(time.monotonic() - started)
+                    
+                    async for chunk in stream:
+                        # O último chunk traz apenas o usage
+                        if chunk.usage:
+                            self._record_usage(chunk.usage, reservation)
+                        
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            produced = True
+                            yield chunk.choices[0].delta.content
+                return
+            
+            except Exception as e:
+                if produced:
+                    logger.error(f"❌ Stream OpenAI interrompido: {e}")
+                    raise
+                
+                if attempt == max_retries - 1:
+                    logger.error(f"❌ Erro OpenAI (stream): {e}")
+                    return
+                
+                wait_time = retry_delay * (attempt + 2 if "rate_limit" in str(e).lower() else 1)
+                logger.warning(f"⚠️  Falha no stream ({e}). Tentativa {attempt + 1}/{max_retries}, aguardando {wait_time}s...")
+                if not await deadline.backoff(wait_time):
+                    return
+    
+    def _record_usage(self, usage, reservation):
+        """Contabiliza tokens (incluindo prompt em cache) e ajusta a reserva"""
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = (getattr(details, "cached_tokens", None) or 0) if details else 0
+        
+        reservation.settle(usage.total_tokens, usage.prompt_tokens, cached)
+        self.total_tokens += usage.total_tokens
+        self.cached_tokens += cached
+        
+        logger.info(
+            f"✅ OpenAI: {usage.total_tokens} tokens usados "
+            f"(prompt: {usage.prompt_tokens}, em cache: {cached}, total: {self.total_tokens})"
+        )
+    
+    @staticmethod
+    def estimate_tokens(messages: List[Dict], max_tokens: int, model: str = "gpt-4o-mini") -> int:
+        """Tokens da chamada: prompt (tokenizer do modelo) + resposta máxima"""
+        return count_message_tokens(messages, model) + max_tokens
+    
+    async def close(self):
+        """Fecha o pool de conexões HTTP"""
+        await self.client.close()
+        OpenAIClient._instance = None
+    
     def get_total_tokens(self) -> int:
-        """Retorna total de tokens usados"""
-        return self.total_tokens
\ No newline at end of file
+        """Retorna total de tokens usados por este processo"""
+        return self.total_tokens
+    
+    async def get_shared_usage(self) -> Dict[str, Dict[str, int]]:
+        """Retorna tokens por modelo (total, prompt, em cache) somando todos os processos"""
+        return await self.limiter.get_usage()
\ No newline at end of file
@@ -1,66 +1,95 @@
 from app.llm.router import PromptRouter
-from typing import Dict, Optional
+from app.llm.token_budget import TokenBudget, count_message_tokens
+from typing import Dict, List, Optional
 from loguru import logger
 
 
 class PromptBuilder:
     """Constrói prompts completos com contexto RAG e dados do lead"""
     
-    def __init__(self):
-        self.router = PromptRouter()
-        self.max_tokens = 4000  # Limite seguro para o contexto
+    def __init__(self, router: Optional[PromptRouter] = None):
+        self.router = router or PromptRouter()
     
-    def build_system_prompt(
-        self, 
-        stage: str, 
-        context_rag: str, 
-        lead_data: Optional[Dict] = None,
-        intent: Optional[str] = None
-    ) -> str:
+    def build_system_prompt(self, stage: str, intent: Optional[str] = None) -> str:
         """
-        Monta o prompt completo do sistema
+        Monta o prompt estático do sistema (base + estágio)
+        
+        Não contém nada do lead nem do turno: é idêntico byte a byte entre
+        chamadas do mesmo estágio, o que permite o cache de prefixo da
+        OpenAI.
         
         Args:
             stage: Estágio atual da conversa
-            context_rag: Contexto recuperado do RAG
-            lead_data: Dados do lead (nome, perfil, etc)
             intent: Intenção detectada (opcional)
             
         Returns:
-            Prompt completo formatado
+            Prompt do sistema
         """
+        return self.router.get_prompt(stage, intent)
+    
+    def build_messages(
+        self,
+        stage: str,
+        context_passages: List[str],
+        conversation_history: List[Dict],
+        user_message: str,
+        lead_data: Optional[Dict] = None,
+        intent: Optional[str] = None,
+        model: str = "gpt-4o-mini",
+        summary: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Monta as mensagens da chamada, do mais estável para o mais variável
+        
+        1. Prompt estático (base + estágio) - prefixo reaproveitável
+        2. Estágio e dados do lead - estáveis durante a conversa
+        3. Resumo da conversa - muda a cada K turnos
+        4. Histórico posterior ao resumo
+        5. Contexto RAG do turno
+        6. Mensagem do usuário
         
-        # Buscar template do prompt
-        prompt_template = self.router.get_prompt(stage, intent)
+        Passagens RAG e histórico entram conforme o orçamento de tokens
+        do modelo (TokenBudget).
         
-        # Preparar dados do lead
-        lead_info = self._format_lead_data(lead_data)
+        Args:
+            stage: Estágio atual da conversa
+            context_passages: Passagens do RAG em ordem de relevância
+            conversation_history: Histórico da conversa
+            user_message: Mensagem atual do usuário
+            lead_data: Dados do lead (nome, perfil, etc)
+            intent: Intenção detectada (opcional)
+            model: Modelo que vai receber o prompt
+            summary: Resumo das mensagens antigas (opcional)
+            
+        Returns:
+            Lista de mensagens no formato OpenAI
+        """
         
-        # Truncar contexto RAG se necessário
-        context_rag = self._truncate_context(context_rag)
+        system_prompt = self.build_system_prompt(stage, intent)
+        lead_info = f"## Estágio atual da conversa: {stage}\n\n## Dados do lead:\n{self._format_lead_data(lead_data)}"
+        summary_info = f"## Resumo da conversa até aqui:\n{summary}" if summary else None
         
-        # Interpolar variáveis
-        system_prompt = prompt_template.format(
-            contexto_rag=context_rag,
-            lead_data=lead_info
+        passages, history = TokenBudget(model).allocate(
+            system_prompt=system_prompt,
+            required=[lead_info, user_message] + ([summary_info] if summary_info else []),
+            passages=context_passages,
+            history=[{"role": m["role"], "content": m["content"]} for m in conversation_history]
         )
         
-        # Verificar tamanho (estimativa: 1 token ≈ 4 caracteres)
-        estimated_tokens = len(system_prompt) // 4
+        context_rag = "\n\n".join(passages) if passages else "Não há informações específicas disponíveis no momento."
         
-        if estimated_tokens > self.max_tokens:
-            logger.warning(f"⚠️  Prompt muito grande: ~{estimated_tokens} tokens. Truncando...")
-            # Truncar contexto RAG mais agressivamente
-            max_context_chars = 1500
-            context_rag = context_rag[:max_context_chars] + "..."
-            system_prompt = prompt_template.format(
-                contexto_rag=context_rag,
-                lead_data=lead_info
-            )
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": lead_info},
+            *([{"role": "system", "content": summary_info}] if summary_info else []),
+            *history,
+            {"role": "system", "content": f"## Informações da base de conhecimento:\n{context_rag}"},
+            {"role": "user", "content": user_message}
+        ]
         
-        logger.info(f"✅ Prompt construído: ~{len(system_prompt) // 4} tokens")
+        logger.info(f"✅ Prompt construído: {count_message_tokens(messages, model)} tokens")
         
-        return system_prompt
+        return messages
     
     def _format_lead_data(self, lead_data: Optional[Dict]) -> str:
         """Formata dados do lead para inclusão no prompt"""
@@ -94,17 +123,3 @@ class PromptBuilder:
             parts.append(f"Score: {profile['qualification_score']}/100")
         
         return "\n".join(parts) if parts else "Informações básicas do lead"
-    
-    def _truncate_context(self, context: str, max_chars: int = 2000) -> str:
-        """Trunca contexto RAG mantendo informação útil"""
-        if len(context) <= max_chars:
-            return context
-        
-        # Truncar mas tentar manter parágrafos completos
-        truncated = context[:max_chars]
-        last_newline = truncated.rfind('\n')
-        
-        if last_newline > max_chars * 0.8:  # Se tem quebra perto do fim
-            truncated = truncated[:last_newline]
-        
-        return truncated + "\n\n[... contexto truncado ...]"
\ No newline at end of file
@@ -0,0 +1,178 @@
+"""
+Rate Limiter da OpenAI
+Token bucket distribuído (Redis) de requisições e tokens por modelo
+"""
+
+import asyncio
+import random
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+from loguru import logger
+
+from app.config import settings
+from app.utils.redis_client import get_redis
+
+
+class Reservation:
+    """Tokens reservados para uma chamada, ajustados depois pelo usage real"""
+    
+    def __init__(self, model: str, tokens: int):
+        self.model = model
+        self.tokens = tokens
+        self.actual: Optional[int] = None
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+    
+    def settle(self, actual_tokens: int, prompt_tokens: int = 0, cached_tokens: int = 0):
+        """Informa o total de tokens efetivamente consumido (response.usage)"""
+        self.actual = actual_tokens
+        self.prompt_tokens = prompt_tokens
+        self.cached_tokens = cached_tokens
+
+
+class OpenAIRateLimiter:
+    """
+    Limita RPM e TPM por modelo entre todos os processos
+    
+    Cada modelo tem dois buckets no Redis (requisições e tokens) que se
+    recarregam continuamente até o limite por minuto. A chamada reserva
+    1 requisição + tokens estimados; se não houver saldo, espera na fila
+    local pelo tempo indicado pelo Redis em vez de chamar a API e tomar
+    429. Depois da resposta, a diferença entre estimativa e usage real
+    é devolvida (ou cobrada) do bucket de tokens.
+    """
+    
+    # KEYS: bucket de requisições, bucket de tokens
+    # ARGV: limite RPM, limite TPM, tokens pedidos
+    # Retorna 0 se reservou, senão ms até haver saldo
+    ACQUIRE_SCRIPT = """
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+    local limits = {tonumber(ARGV[1]), tonumber(ARGV[2])}
+    local wanted = {1, math.min(tonumber(ARGV[3]), limits[2])}
+    local levels = {}
+    local wait = 0
+    
+    for i = 1, 2 do
+        local bucket = redis.call('hmget', KEYS[i], 'level', 'ts')
+        local level = tonumber(bucket[1]) or limits[i]
+        local ts = tonumber(bucket[2]) or now
+        local rate = limits[i] / 60000
+        level = math.min(limits[i], level + math.max(0, now - ts) * rate)
+        levels[i] = level
+        if level < wanted[i] then
+            wait = math.max(wait, math.ceil((wanted[i] - level) / rate))
+        end
+    end
+    
+    if wait > 0 then
+        return wait
+    end
+    
+    for i = 1, 2 do
+        redis.call('hset', KEYS[i], 'level', levels[i] - wanted[i], 'ts', now)
+        redis.call('pexpire', KEYS[i], 120000)
+    end
+    return 0
+    """
+    
+    # KEYS: bucket de tokens | ARGV: limite TPM, ajuste (+ devolve, - cobra)
+    ADJUST_SCRIPT = """
+    local level = tonumber(redis.call('hget', KEYS[1], 'level'))
+    if not level then
+        return 0
+    end
+    level = math.min(tonumber(ARGV[1]), level + tonumber(ARGV[2]))
+    redis.call('hset', KEYS[1], 'level', level)
+    return 1
+    """
+    
+    def __init__(self):
+        self.redis = get_redis()
+        self.semaphore = asyncio.Semaphore(settings.OPENAI_MAX_CONCURRENCY)
+        self._acquire = self.redis.register_script(self.ACQUIRE_SCRIPT)
+        self._adjust = self.redis.register_script(self.ADJUST_SCRIPT)
+    
+    def limits_for(self, model: str) -> Tuple[int, int]:
+        """(RPM, TPM) do modelo; modelos sem configuração usam o padrão"""
+        rpm, tpm = settings.OPENAI_MODEL_LIMITS.get(
+            model,
+            (settings.OPENAI_RPM_LIMIT, settings.OPENAI_TPM_LIMIT)
+        )
+        return int(rpm), int(tpm)
+    
+    def _keys(self, model: str):
+        return [f"openai:ratelimit:{model}:rpm", f"openai:ratelimit:{model}:tpm"]
+    
+    @asynccontextmanager
+    async def reserve(self, model: str, estimated_tokens: int) -> AsyncIterator[Reservation]:
+        """
+        Aguarda saldo e reserva a chamada
+        
+        Uso:
+            async with limiter.reserve(model, tokens) as reservation:
+                response = await ...
+                reservation.settle(response.usage.total_tokens)
+        """
+        reservation = Reservation(model, estimated_tokens)
+        
+        async with self.semaphore:
+            await self._wait_for_capacity(model, estimated_tokens)
+            try:
+                yield reservation
+            finally:
+                await self._reconcile(reservation)
+    
+    async def _wait_for_capacity(self, model: str, tokens: int):
+        rpm, tpm = self.limits_for(model)
+        waited = 0.0
+        
+        while True:
+            try:
+                wait_ms = await self._acquire(keys=self._keys(model), args=[rpm, tpm, tokens])
+            except Exception as e:
+                # Sem Redis não bloqueia a chamada (a API ainda aplica o limite dela)
+                logger.error(f"❌ Erro no rate limiter da OpenAI: {e}")
+                return
+            
+            if not wait_ms:
+                if waited:
+                    logger.info(f"⏳ Rate limiter {model}: aguardou {waited:.1f}s por {tokens} tokens")
+                return
+            
+            # Jitter evita que os processos acordem todos juntos
+            delay = min(wait_ms / 1000, settings.OPENAI_LIMITER_MAX_WAIT) * random.uniform(1.0, 1.2)
+            waited += delay
+            await asyncio.sleep(delay)
+    
+    async def _reconcile(self, reservation: Reservation):
+        """Devolve tokens não usados (ou cobra o excesso) e soma o usage compartilhado"""
+        # Sem usage (erro na chamada): a requisição pode ter sido cobrada, mantém a reserva
+        if reservation.actual is None:
+            return
+        
+        _, tpm = self.limits_for(reservation.model)
+        delta = reservation.tokens - reservation.actual
+        
+        try:
+            if delta:
+                await self._adjust(keys=self._keys(reservation.model)[1:], args=[tpm, delta])
+            async with self.redis.pipeline(transaction=False) as pipe:
+                key = f"openai:usage:{reservation.model}"
+                pipe.hincrby(key, "total_tokens", reservation.actual)
+                pipe.hincrby(key, "prompt_tokens", reservation.prompt_tokens)
+                pipe.hincrby(key, "cached_tokens", reservation.cached_tokens)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"❌ Erro ao reconciliar tokens da OpenAI: {e}")
+    
+    async def get_usage(self) -> Dict[str, Dict[str, int]]:
+        """Tokens por modelo (total, prompt e prompt em cache) somados entre todos os processos"""
+        usage = {}
+        async for key in self.redis.scan_iter(match="openai:usage:*"):
+            key = key.decode() if isinstance(key, bytes) else key
+            values = await self.redis.hgetall(key)
+            usage[key.split(":", 2)[2]] = {
+                field.decode(): int(value) for field, value in values.items()
+            }
+        return usage
@@ -1,126 +1,381 @@
+import asyncio
+import time
+from app.config import settings
+from app.core import deadline
+from app.llm.model_router import ModelRouter
 from app.llm.openai_client import OpenAIClient
 from app.llm.prompt_builder import PromptBuilder
+from app.llm.semantic_cache import SemanticResponseCache
+from app.llm.structured import RESPONSE_FORMAT, ReplyStreamParser, empty_turn, parse_turn
+from app.llm.token_budget import count_message_tokens
 from app.rag.query import RAGQuery
-from typing import List, Dict, Tuple, Optional
+from app.utils.formatters import SentenceChunker
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
 from loguru import logger
 
 
 class ResponseGenerator:
-    """Gera respostas da IA integrando RAG, prompts e OpenAI"""
+    """
+    Gera respostas da IA integrando RAG, prompts e OpenAI
     
-    def __init__(self):
-        self.openai_client = OpenAIClient()
-        self.prompt_builder = PromptBuilder()
-        self.rag_query = RAGQuery()
+    Cada turno é uma única chamada com saída estruturada: a resposta, a
+    decisão de handoff, o próximo estágio e os dados do lead extraídos.
+    O ModelRouter escolhe o modelo; saída inválida é refeita no tier
+    seguinte.
+    """
     
-    def generate_response(
+    def __init__(
+        self,
+        openai_client: Optional[OpenAIClient] = None,
+        prompt_builder: Optional[PromptBuilder] = None,
+        rag_query: Optional[RAGQuery] = None,
+        semantic_cache: Optional[SemanticResponseCache] = None,
+        model_router: Optional[ModelRouter] = None
+    ):
+        self.openai_client = openai_client or OpenAIClient()
+        self.model_router = model_router or ModelRouter()
+        self.prompt_builder = prompt_builder or PromptBuilder()
+        self.rag_query = rag_query or RAGQuery()
+        self.semantic_cache = semantic_cache
+    
+    async def generate_response(
         self,
         user_message: str,
         conversation_history: List[Dict],
         stage: str,
         lead_data: Optional[Dict] = None,
-        intent: Optional[str] = None
-    ) -> Tuple[Optional[str], bool]:
+        intent: Optional[str] = None,
+        summary: Optional[str] = None
+    ) -> Dict:
         """
         Gera resposta baseada na mensagem do usuário
         
+        Se a geração falhar (erro da OpenAI, circuito aberto, saída vazia)
+        ou o prazo do turno acabar antes da resposta ficar pronta, devolve
+        a resposta de contingência (FALLBACK_REPLY).
+        
         Args:
             user_message: Mensagem do usuário
-            conversation_history: Histórico da conversa (últimas N mensagens)
+            conversation_history: Mensagens posteriores ao resumo
             stage: Estágio atual da conversa
             lead_data: Dados do lead
             intent: Intenção detectada (opcional)
+            summary: Resumo das mensagens antigas (opcional)
             
         Returns:
-            Tupla (resposta, precisa_handoff)
+            Turno com reply, handoff, next_stage e lead
         """
         
         try:
-            # 1. Buscar contexto relevante no RAG
-            logger.info(f"🔍 Buscando contexto RAG para: {user_message[:50]}...")
-            context_rag = self.rag_query.build_context(user_message, top_k=3)
+            # Pergunta equivalente já respondida: não chama o modelo
+            embedding, cached = await self._lookup_cache(user_message, stage, intent)
+            if cached:
+                return empty_turn(cached["response"])
             
-            # 2. Construir prompt do sistema
-            system_prompt = self.prompt_builder.build_system_prompt(
-                stage=stage,
-                context_rag=context_rag,
-                lead_data=lead_data,
-                intent=intent
+            # 3. Gerar resposta dentro do prazo (o tempo reservado é do envio)
+            turn = await deadline.within(
+                self._complete(user_message, conversation_history, stage, lead_data, intent, embedding, summary),
+                reserve=settings.DEADLINE_SEND_RESERVE
             )
             
-            # 3. Montar mensagens para OpenAI
-            messages = [
-                {"role": "system", "content": system_prompt}
-            ]
-            
-            # Adicionar histórico (últimas 6 mensagens = 3 trocas)
-            for msg in conversation_history[-6:]:
-                messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
-            
-            # Adicionar mensagem atual do usuário
-            messages.append({
-                "role": "user",
-                "content": user_message
-            })
-            
-            # 4. Gerar resposta
-            logger.info("🤖 Gerando resposta com OpenAI...")
-            response = self.openai_client.chat_completion(
-                messages=messages,
-                temperature=0.8,  # Mais criativo para vendas
-                max_tokens=500
-            )
+            turn = self._finish(turn)
+            await self._store_cache(embedding, stage, intent, turn, lead_data)
+            return turn
+        
+        except deadline.DeadlineExceeded:
+            logger.warning("⏰ Prazo do turno esgotado: enviando resposta de contingência")
+            return self._fallback()
             
-            if not response:
-                logger.error("❌ OpenAI retornou resposta vazia")
-                return None, False
+        except Exception as e:
+            logger.error(f"❌ Erro ao gerar resposta: {e}")
+            return self._fallback()
+    
+    async def stream_response(
+        self,
+        user_message: str,
+        conversation_history: List[Dict],
+        stage: str,
+        on_chunk: Callable[[str], Awaitable],
+        lead_data: Optional[Dict] = None,
+        intent: Optional[str] = None,
+        summary: Optional[str] = None
+    ) -> Dict:
+        """
+        Gera resposta em streaming, entregando cada frase/parágrafo pronto
+        
+        O campo "reply" do JSON é extraído conforme chega e on_chunk é
+        chamado em ordem para cada balão, em paralelo com a leitura do
+        stream. Handoff, estágio e lead vêm do JSON completo.
+        
+        Se o stream falhar ou o prazo do turno acabar (o stream é
+        cancelado), o que já foi gerado é entregue e, se nada ficou pronto,
+        vai a resposta de contingência (FALLBACK_REPLY). Se on_chunk falhar,
+        os balões seguintes não são enviados e o erro é relançado ao final.
+        
+        Returns:
+            Turno com reply completo, handoff, next_stage e lead
+        """
+        
+        parser = ReplyStreamParser()
+        cached = None
+        embedding = None
+        timed_out = False
+        failed = False
+        delivery_error = None
+        bubbles: asyncio.Queue = asyncio.Queue()
+        
+        async def deliver():
+            nonlocal delivery_error
+            while (bubble := await bubbles.get()) is not None:
+                if delivery_error:
+                    # Um balão falhou: os seguintes não saem fora de ordem
+                    continue
+                try:
+                    await on_chunk(bubble)
+                except Exception as e:
+                    delivery_error = e
+                    logger.error(f"❌ Erro ao entregar trecho da resposta: {e}")
+        
+        sender = asyncio.create_task(deliver())
+        chunker = SentenceChunker(settings.STREAM_MIN_CHUNK_CHARS)
+        
+        async def produce():
+            nonlocal embedding, cached
+            embedding, cached = await self._lookup_cache(user_message, stage, intent)
             
-            # 5. Detectar se precisa handoff
-            precisa_handoff = self._detect_handoff(response)
+            if cached:
+                # Resposta em cache: entrega todos os balões de uma vez
+                for bubble in chunker.feed(cached["response"]):
+                    bubbles.put_nowait(bubble)
+                return
             
-            if precisa_handoff:
-                logger.warning("⚠️  Handoff detectado na resposta")
+            tier, messages = await self._prepare(user_message, conversation_history, stage, lead_data, intent, embedding, summary)
             
-            logger.info(f"✅ Resposta gerada: {len(response)} caracteres")
+            # Tier seguinte só se nada da resposta foi entregue ainda
+            escalated = False
+            while True:
+                logger.info(f"🤖 Gerando resposta com OpenAI ({tier['model']}, streaming)...")
+                parser.reset()
+                started = time.monotonic()
+                first_token_at = None
+                try:
+                    async for delta in self.openai_client.chat_completion_stream(
+                        messages=messages,
+                        temperature=tier["temperature"],
+                        max_tokens=600,  # Resposta + campos do JSON
+                        model=tier["model"],
+                        response_format=RESPONSE_FORMAT
+                    ):
+                        first_token_at = first_token_at or time.monotonic()
+                        for bubble in chunker.feed(parser.feed(delta)):
+                            bubbles.put_nowait(bubble)
+                finally:
+                    await self.model_router.record(
+                        tier,
+                        started,
+                        first_token_at=first_token_at,
+                        escalated=escalated,
+                        failed=not parser.reply.strip()
+                    )
+                
+                if parser.reply.strip() or not (tier := self._escalate(tier)):
+                    break
+                escalated = True
+        
+        try:
+            try:
+                # O tempo reservado do prazo é do envio dos balões
+                await deadline.within(produce(), reserve=settings.DEADLINE_SEND_RESERVE)
+            except deadline.DeadlineExceeded:
+                timed_out = True
+            except Exception as e:
+                failed = True
+                logger.error(f"❌ Erro ao gerar resposta (streaming): {e}")
             
-            return response, precisa_handoff
+            tail = chunker.flush()
+            if tail:
+                bubbles.put_nowait(tail)
             
-        except Exception as e:
-            logger.error(f"❌ Erro ao gerar resposta: {e}")
-            return None, False
+            if (timed_out or failed) and not parser.reply.strip():
+                logger.warning("⚠️  Nenhum trecho gerado: enviando resposta de contingência")
+                bubbles.put_nowait(settings.FALLBACK_REPLY)
+        
+        finally:
+            # Termina de enviar o que já foi gerado
+            bubbles.put_nowait(None)
+            await sender
+        
+        if delivery_error:
+            # Quem chamou decide: sem entrega, o turno não foi respondido
+            raise delivery_error
+        
+        if cached:
+            return empty_turn(cached["response"])
+        
+        if timed_out:
+            # Resposta parcial (ou contingência): nada de estado nem cache
+            logger.warning(f"⏰ Prazo do turno esgotado após {len(parser.reply)} caracteres")
+            return empty_turn(parser.reply.strip() or settings.FALLBACK_REPLY, partial=True)
+        
+        if failed:
+            # Stream interrompido: a resposta parcial já foi entregue, mas não vai ao cache
+            return empty_turn(parser.reply.strip() or settings.FALLBACK_REPLY, partial=True)
+        
+        turn = self._finish(parse_turn(parser.raw, parser.reply.strip() or None))
+        await self._store_cache(embedding, stage, intent, turn, lead_data)
+        return turn
     
-    def _detect_handoff(self, response: str) -> bool:
+    async def _lookup_cache(self, user_message: str, stage: str, intent: Optional[str]):
         """
-        Detecta se a IA está indicando necessidade de handoff
+        Embedding da pergunta e resposta do cache semântico (se houver)
         
-        Keywords que indicam handoff:
-        - Transferir, passar, conectar
-        - Atendente, consultor, especialista
-        - Não consigo, não posso
+        Mensagens curtas ("e o preço?", "sim") dependem do contexto da
+        conversa e não passam pelo cache.
         """
+        if not self.semantic_cache or len(user_message.strip()) < settings.SEMANTIC_CACHE_MIN_CHARS:
+            return None, None
+        
+        try:
+            embedding = await deadline.within(
+                self.rag_query.vectorstore.embed_query(user_message),
+                limit=settings.RAG_TIMEOUT
+            )
+        except Exception:
+            return None, None
+        
+        return embedding, await self.semantic_cache.lookup(embedding, stage, intent)
+    
+    async def _store_cache(
+        self,
+        embedding: Optional[List[float]],
+        stage: str,
+        intent: Optional[str],
+        turn: Dict,
+        lead_data: Optional[Dict]
+    ):
+        """Guarda a resposta no cache semântico se ela não for pessoal"""
+        response = turn["reply"]
+        # Turnos que mudam estado (handoff, dados do lead) dependem da conversa;
+        # saída incompleta do modelo (JSON cortado) nunca vai para o cache
+        if embedding is None or not response or turn["partial"] or turn["handoff"] or turn["lead"]:
+            return
+        
+        name = (lead_data or {}).get("name")
+        if name and name.split()[0].lower() in response.lower():
+            return
+        
+        await self.semantic_cache.store(embedding, stage, response, False, intent)
+    
+    async def _build_messages(
+        self,
+        user_message: str,
+        conversation_history: List[Dict],
+        stage: str,
+        lead_data: Optional[Dict],
+        intent: Optional[str],
+        query_embedding: Optional[List[float]] = None,
+        summary: Optional[str] = None,
+        model: str = "gpt-4o-mini"
+    ) -> List[Dict]:
+        """Monta as mensagens da chamada (RAG + prompt + resumo + histórico)"""
+        
+        # 1. Buscar passagens relevantes no RAG (o orçamento de tokens decide quantas entram)
+        logger.info(f"🔍 Buscando contexto RAG para: {user_message[:50]}...")
+        try:
+            passages = await deadline.within(
+                self.rag_query.search_passages(user_message, top_k=settings.RAG_TOP_K, query_embedding=query_embedding),
+                limit=settings.RAG_TIMEOUT
+            )
+        except deadline.DeadlineExceeded:
+            # Sem tempo para o RAG: responde só com prompt e histórico
+            logger.warning(f"⏰ Busca RAG excedeu {settings.RAG_TIMEOUT}s: seguindo sem contexto")
+            passages = []
+        
+        # 2. Montar mensagens (prefixo estático primeiro, conteúdo do turno no fim)
+        return self.prompt_builder.build_messages(
+            stage=stage,
+            context_passages=passages,
+            conversation_history=conversation_history,
+            user_message=user_message,
+            lead_data=lead_data,
+            intent=intent,
+            model=model,
+            summary=summary
+        )
+    
+    async def _prepare(
+        self,
+        user_message: str,
+        conversation_history: List[Dict],
+        stage: str,
+        lead_data: Optional[Dict],
+        intent: Optional[str],
+        query_embedding: Optional[List[float]],
+        summary: Optional[str]
+    ) -> Tuple[Dict, List[Dict]]:
+        """Tier do turno (estágio, intenção, tamanho do prompt) e mensagens montadas"""
+        tier = self.model_router.select(stage, intent)
+        messages = await self._build_messages(
+            user_message, conversation_history, stage, lead_data, intent, query_embedding, summary, tier["model"]
+        )
+        return self.model_router.for_prompt(tier, count_message_tokens(messages, tier["model"])), messages
+    
+    async def _complete(
+        self,
+        user_message: str,
+        conversation_history: List[Dict],
+        stage: str,
+        lead_data: Optional[Dict],
+        intent: Optional[str],
+        query_embedding: Optional[List[float]],
+        summary: Optional[str]
+    ) -> Dict:
+        """Monta o prompt e chama o modelo (tier seguinte se a saída vier inválida)"""
+        tier, messages = await self._prepare(user_message, conversation_history, stage, lead_data, intent, query_embedding, summary)
+        
+        escalated = False
+        while True:
+            logger.info(f"🤖 Gerando resposta com OpenAI ({tier['model']})...")
+            started = time.monotonic()
+            response = await self.openai_client.chat_completion(
+                messages=messages,
+                temperature=tier["temperature"],
+                max_tokens=600,  # Resposta + campos do JSON
+                model=tier["model"],
+                response_format=RESPONSE_FORMAT
+            )
+            turn = parse_turn(response)
+            await self.model_router.record(tier, started, escalated=escalated, failed=not turn["reply"])
+            
+            if turn["reply"] or not (tier := self._escalate(tier)):
+                return turn
+            escalated = True
+    
+    def _escalate(self, tier: Dict) -> Optional[Dict]:
+        """Tier seguinte após saída vazia/inválida (None se não houver)"""
+        next_tier = self.model_router.escalate(tier)
+        if next_tier:
+            logger.warning(f"🪜 Saída inválida em {tier['model']}: refazendo com {next_tier['model']}")
+        return next_tier
+    
+    @staticmethod
+    def _fallback() -> Dict:
+        """Turno com a resposta de contingência (nunca vai para o cache)"""
+        return empty_turn(settings.FALLBACK_REPLY, partial=True)
+    
+    def _finish(self, turn: Dict) -> Dict:
+        """Valida o turno completo"""
+        
+        if not turn["reply"]:
+            logger.error("❌ OpenAI retornou resposta vazia: enviando resposta de contingência")
+            return self._fallback()
+        
+        if turn["handoff"]:
+            logger.warning("⚠️  Handoff solicitado pelo modelo")
+        
+        logger.info(
+            f"✅ Resposta gerada: {len(turn['reply'])} caracteres "
+            f"(estágio: {turn['next_stage']}, lead: {list(turn['lead'])})"
+        )
         
-        handoff_keywords = [
-            'transferir',
-            'passar para',
-            'conectar com',
-            'atendente',
-            'consultor',
-            'especialista',
-            'equipe',
-            'não consigo',
-            'não posso ajudar',
-            'aguarde um momento',
-            'alguém te retorna'
-        ]
-        
-        response_lower = response.lower()
-        
-        for keyword in handoff_keywords:
-            if keyword in response_lower:
-                logger.info(f"🎯 Keyword de handoff detectada: {keyword}")
-                return True
-        
-        return False
\ No newline at end of file
+        return turn
\ No newline at end of file
@@ -19,7 +19,9 @@ class PromptRouter:
             'qualificacao': 'qualificacao.txt',
             'objecoes': 'objecoes.txt',
             'fechamento': 'fechamento.txt',
-            'handoff': 'handoff.txt'
+            'handoff': 'handoff.txt',
+            'resumo': 'resumo.txt',
+            'saida': 'saida.txt'
         }
         
         for key, filename in prompt_files.items():
@@ -70,8 +72,11 @@ class PromptRouter:
         # Sempre incluir o prompt base
         base_prompt = self.prompts_cache.get('base', '')
         
+        # Instruções da saída estruturada (JSON) sempre no fim
+        output_prompt = self.prompts_cache.get('saida', '')
+        
         # Combinar prompts
-        combined = f"{base_prompt}\n\n{specific_prompt}"
+        combined = f"{base_prompt}\n\n{specific_prompt}\n\n{output_prompt}"
         
         logger.info(f"🎯 Prompt selecionado: {prompt_key} (stage: {stage}, intent: {intent})")
         
@@ -81,4 +86,8 @@ class PromptRouter:
         """Retorna prompt específico de handoff"""
         base = self.prompts_cache.get('base', '')
         handoff = self.prompts_cache.get('handoff', '')
-        return f"{base}\n\n{handoff}"
\ No newline at end of file
+        return f"{base}\n\n{handoff}"
+    
+    def get_summary_prompt(self) -> str:
+        """Retorna prompt do resumo incremental da conversa"""
+        return self.prompts_cache.get('resumo', '')
\ No newline at end of file
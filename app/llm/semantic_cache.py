@@ -0,0 +1,180 @@
+"""
+Cache Semântico de Respostas
+Reaproveita respostas de perguntas equivalentes (FAQ: preço, duração, matrícula)
+"""
+
+import hashlib
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+
+from app.config import settings
+from app.utils.redis_client import get_redis
+
+
+def content_version(prompts: Iterable[str], rag_dir: str = "data/rag") -> str:
+    """
+    Versão do conhecimento usado nas respostas
+    
+    Hash do texto dos prompts e dos arquivos da base RAG: qualquer
+    alteração gera um novo namespace e as respostas antigas deixam de
+    ser usadas.
+    """
+    digest = hashlib.sha1()
+    for prompt in prompts:
+        digest.update(prompt.encode())
+    
+    base = Path(rag_dir)
+    if base.exists():
+        for path in sorted(p for p in base.rglob("*") if p.is_file()):
+            digest.update(str(path.relative_to(base)).encode())
+            digest.update(path.read_bytes())
+    
+    return digest.hexdigest()[:12]
+
+
+class SemanticResponseCache:
+    """
+    Cache de respostas indexado pelo embedding da pergunta
+    
+    Namespace = versão (prompts + base RAG) + estágio + intenção. Cada
+    entrada fica no Redis com TTL; o processo mantém uma matriz local
+    dos embeddings do namespace (recarregada periodicamente) e busca por
+    similaridade de cosseno. Acima de max_entries o menos usado recente
+    (LRU) é removido.
+    """
+    
+    def __init__(self, version: str, threshold: float = None, ttl: int = None, max_entries: int = None):
+        self.redis = get_redis()
+        self.version = version
+        self.threshold = threshold or settings.SEMANTIC_CACHE_THRESHOLD
+        self.ttl = ttl or settings.SEMANTIC_CACHE_TTL
+        self.max_entries = max_entries or settings.SEMANTIC_CACHE_MAX_ENTRIES
+        # namespace -> (ids, matriz normalizada, carregado_em)
+        self.local: Dict[str, Tuple[List[str], np.ndarray, float]] = {}
+    
+    def _namespace(self, stage: str, intent: Optional[str]) -> str:
+        return f"semcache:{self.version}:{stage}:{intent or '-'}"
+    
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    async def lookup(self, embedding: List[float], stage: str, intent: Optional[str] = None) -> Optional[Dict]:
+        """
+        Busca resposta de uma pergunta semelhante
+        
+        Returns:
+            {"response", "handoff", "similarity"} ou None
+        """
+        if not settings.SEMANTIC_CACHE_ENABLED:
+            return None
+        
+        namespace = self._namespace(stage, intent)
+        try:
+            ids, matrix = await self._index(namespace)
+            if not ids:
+                return None
+            
+            scores = matrix @ self._normalize(embedding)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            
+            entry_id = ids[best]
+            entry = await self.redis.hgetall(f"{namespace}:entry:{entry_id}")
+            if not entry:
+                # Expirou ou foi invalidada depois da última recarga
+                await self.redis.zrem(f"{namespace}:lru", entry_id)
+                await self.redis.hdel(f"{namespace}:emb", entry_id)
+                self.local.pop(namespace, None)
+                return None
+            
+            await self.redis.zadd(f"{namespace}:lru", {entry_id: time.time()})
+            logger.info(f"⚡ Cache semântico: hit ({scores[best]:.3f}) em {namespace}")
+            return {
+                "response": entry[b"response"].decode(),
+                "handoff": entry[b"handoff"] == b"1",
+                "similarity": float(scores[best])
+            }
+        
+        except Exception as e:
+            logger.error(f"❌ Erro no cache semântico: {e}")
+            return None
+    
+    async def store(self, embedding: List[float], stage: str, response: str, handoff: bool = False, intent: Optional[str] = None):
+        """Armazena a resposta gerada para a pergunta"""
+        if not settings.SEMANTIC_CACHE_ENABLED:
+            return
+        
+        namespace = self._namespace(stage, intent)
+        entry_id = uuid.uuid4().hex[:16]
+        vector = self._normalize(embedding)
+        
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hset(f"{namespace}:entry:{entry_id}", mapping={
+                    "response": response,
+                    "handoff": "1" if handoff else "0"
+                })
+                pipe.expire(f"{namespace}:entry:{entry_id}", self.ttl)
+                pipe.hset(f"{namespace}:emb", entry_id, vector.tobytes())
+                pipe.expire(f"{namespace}:emb", self.ttl)
+                pipe.zadd(f"{namespace}:lru", {entry_id: time.time()})
+                pipe.expire(f"{namespace}:lru", self.ttl)
+                await pipe.execute()
+            
+            await self._evict(namespace)
+            
+            # Entrada nova já fica visível para este processo
+            if namespace in self.local:
+                ids, matrix, loaded_at = self.local[namespace]
+                matrix = np.vstack([matrix, vector]) if len(ids) else vector[np.newaxis, :]
+                self.local[namespace] = (ids + [entry_id], matrix, loaded_at)
+        
+        except Exception as e:
+            logger.error(f"❌ Erro ao gravar no cache semântico: {e}")
+    
+    async def invalidate(self):
+        """Remove todas as respostas em cache (ex: base RAG recarregada)"""
+        removed = 0
+        async for key in self.redis.scan_iter(match="semcache:*", count=500):
+            await self.redis.delete(key)
+            removed += 1
+        self.local.clear()
+        logger.info(f"🗑️  Cache semântico invalidado ({removed} chaves)")
+    
+    async def _index(self, namespace: str) -> Tuple[List[str], np.ndarray]:
+        """Matriz local de embeddings do namespace (recarrega a cada SEMANTIC_CACHE_REFRESH s)"""
+        cached = self.local.get(namespace)
+        if cached and time.monotonic() - cached[2] < settings.SEMANTIC_CACHE_REFRESH:
+            return cached[0], cached[1]
+        
+        raw = await self.redis.hgetall(f"{namespace}:emb")
+        ids = [key.decode() for key in raw]
+        matrix = (
+            np.vstack([np.frombuffer(value, dtype=np.float32) for value in raw.values()])
+            if raw else np.empty((0, 0), dtype=np.float32)
+        )
+        self.local[namespace] = (ids, matrix, time.monotonic())
+        return ids, matrix
+    
+    async def _evict(self, namespace: str):
+        """Remove as entradas menos usadas acima de max_entries (LRU)"""
+        excess = await self.redis.zcard(f"{namespace}:lru") - self.max_entries
+        if excess <= 0:
+            return
+        
+        victims = [v.decode() for v in await self.redis.zrange(f"{namespace}:lru", 0, excess - 1)]
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zrem(f"{namespace}:lru", *victims)
+            pipe.hdel(f"{namespace}:emb", *victims)
+            for entry_id in victims:
+                pipe.delete(f"{namespace}:entry:{entry_id}")
+            await pipe.execute()
+        self.local.pop(namespace, None)
@@ -0,0 +1,158 @@
+"""
+Saída Estruturada
+Formato JSON da resposta do turno (resposta, handoff, estágio e dados do lead)
+
+Uma única chamada devolve tudo o que o turno precisa; o campo "reply" vem
+primeiro para que o streaming possa entregar a resposta enquanto o resto
+do JSON ainda está sendo gerado.
+"""
+
+import json
+import re
+from typing import Dict, Optional
+from loguru import logger
+
+from app.models.conversation import ConversationStage
+
+
+LEAD_FIELDS = ("name", "email", "interest", "budget", "urgency")
+
+TURN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "reply": {"type": "string"},
+        "handoff": {"type": "boolean"},
+        "next_stage": {"type": "string", "enum": [stage.value for stage in ConversationStage]},
+        "lead": {
+            "type": "object",
+            "properties": {
+                "name": {"type": ["string", "null"]},
+                "email": {"type": ["string", "null"]},
+                "interest": {"type": ["string", "null"]},
+                "budget": {"type": ["number", "null"]},
+                "urgency": {"type": ["string", "null"], "enum": ["baixa", "media", "alta", None]}
+            },
+            "required": list(LEAD_FIELDS),
+            "additionalProperties": False
+        }
+    },
+    "required": ["reply", "handoff", "next_stage", "lead"],
+    "additionalProperties": False
+}
+
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "turno", "strict": True, "schema": TURN_SCHEMA}
+}
+
+
+def empty_turn(reply: Optional[str] = None, partial: bool = False) -> Dict:
+    """
+    Turno sem decisões (sem handoff, estágio mantido, lead sem novidades)
+    
+    partial indica que a resposta veio de uma saída incompleta do modelo
+    (não pode ir para o cache).
+    """
+    return {"reply": reply, "handoff": False, "next_stage": None, "lead": {}, "partial": partial}
+
+
+def parse_turn(raw: Optional[str], fallback_reply: Optional[str] = None) -> Dict:
+    """
+    Converte o JSON do modelo no turno normalizado
+    
+    JSON inválido ou incompleto (ex: resposta cortada por max_tokens) vira
+    um turno só com a resposta já extraída, marcado como partial.
+    
+    Returns:
+        Dict com reply, handoff, next_stage (ou None), lead (só campos
+        preenchidos) e partial
+    """
+    try:
+        data = json.loads(raw) if raw else {}
+    except ValueError:
+        logger.warning("⚠️  Saída estruturada inválida, usando apenas a resposta")
+        return empty_turn(fallback_reply, partial=True)
+    
+    if not isinstance(data, dict) or not all(key in data for key in TURN_SCHEMA["required"]):
+        logger.warning("⚠️  Saída estruturada incompleta, usando apenas a resposta")
+        return empty_turn(fallback_reply, partial=True)
+    
+    reply = (data.get("reply") or "").strip() or fallback_reply
+    stages = {stage.value for stage in ConversationStage}
+    lead = data.get("lead") or {}
+    
+    return {
+        "reply": reply,
+        "handoff": bool(data.get("handoff")),
+        "next_stage": data.get("next_stage") if data.get("next_stage") in stages else None,
+        "lead": {key: lead[key] for key in LEAD_FIELDS if lead.get(key) not in (None, "")},
+        "partial": False
+    }
+
+
+class ReplyStreamParser:
+    """
+    Extrai o campo "reply" de um JSON recebido em pedaços
+    
+    feed() recebe os trechos do stream e devolve somente o texto novo da
+    resposta (já sem escapes JSON), que pode ir direto para os balões.
+    """
+    
+    _START = re.compile(r'"reply"\s*:\s*"')
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        """Descarta o que foi recebido (nova tentativa de geração)"""
+        self.raw = ""
+        self.reply = ""
+        self._pos = None
+        self._done = False
+    
+    def feed(self, delta: str) -> str:
+        """Adiciona um trecho do JSON e devolve o texto novo da resposta"""
+        self.raw += delta
+        
+        if self._done:
+            return ""
+        
+        if self._pos is None:
+            match = self._START.search(self.raw)
+            if not match:
+                return ""
+            self._pos = match.end()
+        
+        out = []
+        raw, pos = self.raw, self._pos
+        
+        while pos < len(raw):
+            char = raw[pos]
+            if char == '"':
+                self._done = True
+                pos += 1
+                break
+            if char != "\\":
+                out.append(char)
+                pos += 1
+                continue
+            # Escape incompleto: espera o próximo trecho
+            if pos + 1 >= len(raw):
+                break
+            code = raw[pos + 1]
+            if code == "u":
+                # Emojis escapados chegam como par de surrogates (\ud83d\ude00)
+                size = 12 if raw[pos + 2:pos + 4].lower() in ("d8", "d9", "da", "db") else 6
+                if pos + size > len(raw):
+                    break
+                out.append(json.loads(f'"{raw[pos:pos + size]}"'))
+                pos += size
+            else:
+                out.append(self._ESCAPES.get(code, code))
+                pos += 2
+        
+        self._pos = pos
+        text = "".join(out)
+        self.reply += text
+        return text
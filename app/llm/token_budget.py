@@ -0,0 +1,149 @@
+"""
+Orçamento de Tokens
+Contagem com o tokenizer do modelo (tiktoken) e divisão do orçamento do prompt
+"""
+
+from functools import lru_cache
+from typing import Dict, List, Tuple
+from loguru import logger
+
+from app.config import settings
+
+# Tokens extras que a API cobra por mensagem (papel + separadores)
+MESSAGE_OVERHEAD = 4
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    """Encoder do modelo; None se o tiktoken ou o arquivo BPE não estiverem disponíveis"""
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"⚠️  Tokenizer indisponível para {model} ({e}). Usando estimativa por caracteres")
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Conta tokens do texto com o tokenizer do modelo"""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        # Estimativa conservadora para português (acentos e emoji)
+        return len(text) // 3 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=256)
+def count_static_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Contagem em cache para textos fixos (prompts de sistema)"""
+    return count_tokens(text, model)
+
+
+def count_message_tokens(messages: List[Dict], model: str = "gpt-4o-mini") -> int:
+    """Tokens de uma lista de mensagens no formato OpenAI"""
+    return sum(count_tokens(m.get("content") or "", model) + MESSAGE_OVERHEAD for m in messages) + 3
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> str:
+    """Corta o texto em max_tokens, preferindo terminar em quebra de linha"""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    
+    encoding = _encoding(model)
+    if encoding is None:
+        truncated = text[:max_tokens * 3]
+    else:
+        truncated = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    
+    last_newline = truncated.rfind("\n")
+    if last_newline > len(truncated) * 0.8:
+        truncated = truncated[:last_newline]
+    return truncated + "..."
+
+
+class TokenBudget:
+    """
+    Divide o orçamento de tokens do prompt por prioridade
+    
+    1. Prompt do sistema, dados do lead e mensagem do usuário (obrigatórios)
+    2. Passagens RAG, na ordem de relevância, até PROMPT_RAG_SHARE do restante
+    3. Histórico, da mensagem mais recente para a mais antiga
+    4. Sobra do histórico volta para passagens RAG que ficaram de fora
+    """
+    
+    MIN_PASSAGE_TOKENS = 60  # Não vale a pena incluir um pedaço menor que isso
+    
+    def __init__(self, model: str = "gpt-4o-mini", budget: int = None):
+        self.model = model
+        self.budget = budget or settings.PROMPT_TOKEN_BUDGETS.get(model, settings.PROMPT_TOKEN_BUDGET)
+    
+    def allocate(
+        self,
+        system_prompt: str,
+        required: List[str],
+        passages: List[str],
+        history: List[Dict]
+    ) -> Tuple[List[str], List[Dict]]:
+        """
+        Escolhe as passagens RAG e o histórico que cabem no orçamento
+        
+        Args:
+            system_prompt: Prompt estático (contagem em cache)
+            required: Demais textos obrigatórios (dados do lead, mensagem do usuário)
+            passages: Passagens RAG em ordem de relevância
+            history: Histórico em ordem cronológica
+        
+        Returns:
+            Tupla (passagens escolhidas, histórico escolhido em ordem cronológica)
+        """
+        used = count_static_tokens(system_prompt, self.model) + MESSAGE_OVERHEAD
+        used += sum(count_tokens(text, self.model) + MESSAGE_OVERHEAD for text in required)
+        remaining = max(self.budget - used, 0)
+        
+        passage_tokens = [count_tokens(p, self.model) for p in passages]
+        rag_budget = int(remaining * settings.PROMPT_RAG_SHARE)
+        chosen, rag_used, next_passage = self._take_passages(passages, passage_tokens, 0, rag_budget)
+        remaining -= rag_used
+        
+        kept_history = []
+        for msg in reversed(history):
+            cost = count_tokens(msg["content"], self.model) + MESSAGE_OVERHEAD
+            if cost > remaining:
+                break
+            kept_history.append(msg)
+            remaining -= cost
+        kept_history.reverse()
+        
+        # Orçamento que o histórico não usou vai para mais contexto
+        more, extra_used, _ = self._take_passages(passages, passage_tokens, next_passage, remaining)
+        chosen += more
+        remaining -= extra_used
+        
+        logger.info(
+            f"🧮 Orçamento {self.budget} tokens: {len(chosen)}/{len(passages)} passagens, "
+            f"{len(kept_history)}/{len(history)} mensagens de histórico, sobra {remaining}"
+        )
+        
+        return chosen, kept_history
+    
+    def _take_passages(self, passages: List[str], costs: List[int], start: int, budget: int):
+        """Passagens inteiras a partir de start; a última pode ser truncada"""
+        chosen, used, i = [], 0, start
+        while i < len(passages):
+            if used + costs[i] <= budget:
+                chosen.append(passages[i])
+                used += costs[i]
+            else:
+                room = budget - used
+                if room >= self.MIN_PASSAGE_TOKENS:
+                    chosen.append(truncate_to_tokens(passages[i], room - 1, self.model))
+                    used = budget
+                    i += 1
+                break
+            i += 1
+        return chosen, used, i
@@ -1,6 +1,9 @@
-from fastapi import FastAPI, Request, BackgroundTasks
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from app.config import settings
-from app.services.message_processor import MessageProcessor
+from app.core.container import container
+from app.core.queue import MessageQueue
+from app.utils.dedup import DedupManager
 from loguru import logger
 
 app = FastAPI(
@@ -28,14 +31,51 @@ async def health_check():
     }
 
 
-def process_message_background(phone: str, text: str, name: str):
-    """Processa mensagem em background"""
-    processor = MessageProcessor()
-    processor.process_message(phone, text, name)
+@app.get("/health/queue")
+async def queue_health():
+    """Backlog da fila de ingestão (tamanho, pendentes, lag, dead letter)"""
+    return await MessageQueue().stats()
+
+
+@app.get("/health/llm")
+async def llm_health():
+    """
+    Uso da OpenAI somando todos os processos
+    
+    models: tokens por modelo (total, prompt e prompt em cache)
+    tiers: chamadas, latência e custo estimado por tier do ModelRouter
+    """
+    usage = await container.openai.get_shared_usage()
+    return {
+        "models": usage,
+        "tiers": await container.generator.model_router.get_stats(usage)
+    }
+
+
+@app.get("/health/breakers")
+async def breakers_health():
+    """
+    Circuit breakers dos upstreams (estado compartilhado entre processos)
+    
+    Por upstream: estado (closed/open/half_open), chamadas, falhas e
+    chamadas lentas da janela atual e, se aberto, segundos até o half-open
+    """
+    breakers = (container.openai.breaker, container.zapi.breaker, container.datacrazy.breaker)
+    return {breaker.name: await breaker.snapshot() for breaker in breakers}
+
+
+@app.on_event("startup")
+async def startup():
+    await container.startup()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await container.shutdown()
 
 
 @app.post("/webhook")
-async def webhook_receiver(request: Request, background_tasks: BackgroundTasks):
+async def webhook_receiver(request: Request):
     """
     Recebe webhooks do Z-API com mensagens do WhatsApp
     """
@@ -50,6 +90,7 @@ async def webhook_receiver(request: Request, background_tasks: BackgroundTasks):
         text = payload.get('text', {}).get('message', '')
         from_me = payload.get('fromMe', False)
         sender_name = payload.get('senderName', '')
+        message_id = payload.get('messageId')
         
         # Ignorar mensagens próprias
         if from_me:
@@ -61,14 +102,32 @@ async def webhook_receiver(request: Request, background_tasks: BackgroundTasks):
             logger.warning("⚠️  Webhook sem phone ou texto")
             return {"status": "ignored", "reason": "missing_fields"}
         
+        # Duplicata (reenvio do Z-API) ou eco da nossa resposta
+        dedup = DedupManager()
+        rejected = await dedup.check_inbound(phone, text, message_id)
+        if rejected:
+            return {"status": "ignored", "reason": rejected}
+        
         # Log da mensagem
         logger.info(f"💬 Nova mensagem de {sender_name} ({phone}): {text[:50]}...")
         
-        # Processar mensagem em background
-        background_tasks.add_task(process_message_background, phone, text, sender_name)
+        # Enfileirar no stream (processado pelos workers de mensagens)
+        try:
+            entry_id = await MessageQueue().publish({
+                "phone": phone,
+                "text": text,
+                "name": sender_name,
+                "message_id": message_id
+            })
+        except Exception as e:
+            # Sem persistir na fila, pedimos para o Z-API reenviar (e liberamos
+            # a chave de dedup para o reenvio não ser descartado)
+            logger.error(f"❌ Falha ao enfileirar mensagem de {phone}: {e}")
+            await dedup.release(phone, text, message_id)
+            return JSONResponse(status_code=503, content={"status": "error", "message": "queue_unavailable"})
         
         # Retornar 200 imediatamente
-        return {"status": "received"}
+        return {"status": "queued", "id": entry_id}
         
     except Exception as e:
         logger.error(f"❌ Erro ao processar webhook: {e}")
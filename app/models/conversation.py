@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum as SQLEnum, Index
+from sqlalchemy import Column, Integer, String, Text, DateTime, Enum as SQLEnum, Index, text
 from sqlalchemy.sql import func
 from datetime import datetime, timedelta
 import enum
@@ -32,6 +32,12 @@ class Conversation(Base):
     
     last_message_at = Column(DateTime(timezone=True), server_default=func.now())
     handoff_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Resumo incremental das mensagens antigas (até summary_message_id)
+    summary = Column(Text, nullable=True)
+    summary_message_id = Column(Integer, nullable=True)
+    summary_updated_at = Column(DateTime(timezone=True), nullable=True)
+    
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -39,6 +45,8 @@ class Conversation(Base):
     __table_args__ = (
         Index('idx_phone_status', 'phone', 'status'),
         Index('idx_created_at', 'created_at'),
+        # Uma única conversa ativa por telefone (alvo do upsert)
+        Index('uq_conversation_phone_active', 'phone', unique=True, postgresql_where=text("status = 'active'")),
     )
 
     def is_active(self):
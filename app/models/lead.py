@@ -18,6 +18,17 @@ class Lead(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    def to_dict(self):
+        """Retorna dados do lead para montagem do prompt"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'phone': self.phone,
+            'email': self.email,
+            'profile': self.profile or {},
+            'datacrazy_id': self.datacrazy_id
+        }
+
     def get_qualification_data(self):
         """Retorna dados de qualificação do lead"""
         return self.profile.get('qualification', {})
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -11,12 +11,14 @@ class Message(Base):
     conversation_id = Column(Integer, ForeignKey('conversations.id'), nullable=False)
     role = Column(String(20), nullable=False)  # 'user' ou 'assistant'
     content = Column(Text, nullable=False)
+    zapi_message_id = Column(String(100), nullable=True)  # messageId do Z-API (reentregas)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relacionamento
     conversation = relationship("Conversation", backref="messages")
 
-    # Índice composto
+    # Índice composto e unicidade do messageId (reprocessamento idempotente)
     __table_args__ = (
         Index('idx_conversation_created', 'conversation_id', 'created_at'),
+        UniqueConstraint('zapi_message_id', name='uq_messages_zapi_message_id'),
     )
\ No newline at end of file
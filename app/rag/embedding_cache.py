@@ -0,0 +1,78 @@
+"""
+Cache de Embeddings
+Embeddings das mensagens recebidas (LRU do processo + Redis)
+
+Mensagens de WhatsApp se repetem muito ("oi", "qual o valor?", "quero
+me matricular"): o embedding de um texto já visto sai da memória ou do
+Redis em vez de uma chamada de rede à OpenAI.
+
+Chave: modelo + hash do texto normalizado (minúsculas, espaços simples).
+Valor: vetor float32 em bytes (6 KB para 1536 dimensões).
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+from loguru import logger
+
+from app.config import settings
+from app.utils.redis_client import get_redis
+
+
+def normalize(text: str) -> str:
+    """Texto da chave: minúsculas e espaços simples"""
+    return " ".join(text.casefold().split())
+
+
+class EmbeddingCache:
+    """Embeddings por texto normalizado: LRU local na frente do Redis"""
+    
+    def __init__(self, model: str, lru_size: int = None, ttl: int = None):
+        self.redis = get_redis()
+        self.model = model
+        self.lru_size = lru_size or settings.EMBEDDING_CACHE_LRU_SIZE
+        self.ttl = ttl or settings.EMBEDDING_CACHE_TTL
+        self.local: "OrderedDict[str, np.ndarray]" = OrderedDict()
+    
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha1(normalize(text).encode()).hexdigest()
+        return f"emb:{self.model}:{digest}"
+    
+    def _remember(self, key: str, vector: np.ndarray):
+        self.local[key] = vector
+        self.local.move_to_end(key)
+        while len(self.local) > self.lru_size:
+            self.local.popitem(last=False)
+    
+    async def get(self, text: str) -> Optional[np.ndarray]:
+        """Embedding em cache do texto (None se ainda não foi calculado)"""
+        key = self._key(text)
+        vector = self.local.get(key)
+        if vector is not None:
+            self.local.move_to_end(key)
+            return vector
+        
+        try:
+            raw = await self.redis.get(key)
+        except Exception as e:
+            logger.error(f"❌ Erro ao ler cache de embeddings: {e}")
+            return None
+        
+        if raw is None:
+            return None
+        
+        vector = np.frombuffer(raw, dtype=np.float32)
+        self._remember(key, vector)
+        return vector
+    
+    async def set(self, text: str, embedding: List[float]):
+        """Guarda o embedding do texto no LRU e no Redis"""
+        key = self._key(text)
+        vector = np.asarray(embedding, dtype=np.float32)
+        self._remember(key, vector)
+        
+        try:
+            await self.redis.set(key, vector.tobytes(), ex=self.ttl)
+        except Exception as e:
+            logger.error(f"❌ Erro ao gravar cache de embeddings: {e}")
@@ -0,0 +1,211 @@
+"""
+Indexador Incremental do RAG
+Sincroniza a tabela documents com os arquivos da base de conhecimento
+
+Cada chunk guarda o arquivo de origem, a versão (hash) do arquivo e o
+hash do próprio conteúdo:
+- arquivo com a mesma versão: nada a fazer (nem é dividido em chunks)
+- arquivo alterado: chunks cujo hash já está indexado são mantidos (só
+  os metadados mudam); apenas os novos/alterados geram embedding
+- arquivo removido: seus chunks são apagados
+
+Os embeddings são gerados antes, fora de transação; a diferença é
+reaplicada numa transação curta: a busca vê a base antiga até o commit e
+a nova logo depois, sem janela com a base vazia. Se algum embedding
+falhar, nada é aplicado.
+"""
+
+import hashlib
+from collections import defaultdict
+from typing import Dict, List, Tuple
+from sqlalchemy import select, delete, insert, update, text
+from loguru import logger
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.rag.splitter import RAGSplitter
+from app.rag.vectorstore import Document, VectorStore, EMBEDDING_MODEL
+
+
+# Chave do pg_advisory_xact_lock (um indexador por vez)
+INDEX_LOCK_KEY = 0x52414749  # "RAGI"
+
+
+def content_hash(content: str) -> str:
+    """Hash do chunk (inclui o modelo: trocar o modelo de embedding reindexa tudo)"""
+    return hashlib.sha256(f"{EMBEDDING_MODEL}\n{content}".encode()).hexdigest()
+
+
+def source_key(document: Dict) -> str:
+    """Identificador do arquivo de origem (categoria/nome)"""
+    return f"{document.get('category', 'unknown')}/{document.get('source', 'unknown')}"
+
+
+class RAGIndexer:
+    """Atualiza a base vetorial apenas com o que mudou nos arquivos"""
+    
+    def __init__(self, vectorstore: VectorStore, splitter: RAGSplitter):
+        self.vectorstore = vectorstore
+        self.splitter = splitter
+    
+    def source_version(self, document: Dict) -> str:
+        """Versão do arquivo: conteúdo + parâmetros de divisão e modelo"""
+        params = f"{EMBEDDING_MODEL}|{self.splitter.chunk_size}|{self.splitter.overlap}"
+        return hashlib.sha256(f"{params}\n{document['content']}".encode()).hexdigest()
+    
+    async def sync(self, documents: List[Dict]) -> Dict[str, int]:
+        """
+        Aplica na base os arquivos carregados (RAGLoader)
+        
+        1. Calcula a diferença com a base atual (leitura rápida)
+        2. Gera os embeddings dos chunks novos, sem transação nem lock abertos
+        3. Recalcula a diferença e aplica tudo numa transação curta
+        
+        Returns:
+            Contadores: arquivos inalterados/atualizados/removidos e chunks
+            mantidos/embedados/apagados; {} se outro indexador está rodando
+        
+        Raises:
+            RuntimeError: se algum lote de embeddings falhou ou a base mudou
+                durante os embeddings (nada é aplicado)
+        """
+        async with AsyncSessionLocal() as db:
+            if not await self._try_lock(db):
+                return {}
+            _, _, pending, _ = self._diff(documents, await self._indexed(db))
+        
+        embeddings = await self._embed(pending)
+        
+        async with AsyncSessionLocal() as db:
+            try:
+                if not await self._try_lock(db):
+                    return {}
+                
+                # Outro indexador pode ter rodado enquanto os embeddings eram gerados
+                stats, updates, pending, deletes = self._diff(documents, await self._indexed(db))
+                missing = sum(1 for chunk in pending if chunk['content_hash'] not in embeddings)
+                if missing:
+                    raise RuntimeError(f"{missing} chunks mudaram durante os embeddings - rode o indexador de novo")
+                
+                # Mudanças na mesma transação (invisíveis para a busca até o commit)
+                if deletes:
+                    await db.execute(delete(Document).where(Document.id.in_(deletes)))
+                if updates:
+                    await db.execute(update(Document), updates)
+                
+                rows = [{**chunk, 'embedding': embeddings[chunk['content_hash']]} for chunk in pending]
+                for i in range(0, len(rows), settings.RAG_INSERT_BATCH_SIZE):
+                    await db.execute(insert(Document), rows[i:i + settings.RAG_INSERT_BATCH_SIZE])
+                stats["chunks_embedded"] = len(rows)
+                
+                await db.commit()
+            
+            except Exception:
+                await db.rollback()
+                raise
+        
+        logger.info(
+            f"✅ Base RAG sincronizada: {stats['chunks_embedded']} chunks embedados, "
+            f"{stats['chunks_kept']} mantidos, {stats['chunks_deleted']} apagados"
+        )
+        return dict(stats)
+    
+    @staticmethod
+    async def _try_lock(db) -> bool:
+        """pg_try_advisory_xact_lock: um indexador por vez (liberado no fim da transação)"""
+        if await db.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": INDEX_LOCK_KEY}):
+            return True
+        logger.warning("⚠️  Outro indexador está em execução - nada a fazer")
+        return False
+    
+    @staticmethod
+    async def _indexed(db) -> Dict[str, List]:
+        """Chunks indexados agrupados pelo arquivo de origem"""
+        rows = (await db.execute(
+            select(Document.id, Document.source, Document.source_version, Document.content_hash)
+        )).all()
+        indexed = defaultdict(list)
+        for row in rows:
+            indexed[row.source].append(row)
+        return indexed
+    
+    def _diff(
+        self,
+        documents: List[Dict],
+        indexed: Dict[str, List]
+    ) -> Tuple[Dict[str, int], List[Dict], List[Dict], List[int]]:
+        """
+        Diferença entre os arquivos e a base
+        
+        Returns:
+            (contadores, chunks mantidos, chunks a embedar, ids a apagar)
+        """
+        stats = defaultdict(int)
+        updates: List[Dict] = []
+        pending: List[Dict] = []
+        deletes: List[int] = []
+        current = set()
+        
+        # 1. Arquivos novos ou alterados
+        for document in documents:
+            source = source_key(document)
+            current.add(source)
+            version = self.source_version(document)
+            existing = indexed.get(source, [])
+            
+            if existing and all(row.source_version == version for row in existing):
+                stats["sources_unchanged"] += 1
+                continue
+            stats["sources_updated"] += 1
+            
+            # Chunks já indexados (mesmo hash) são reaproveitados sem novo embedding
+            available = defaultdict(list)
+            for row in existing:
+                available[row.content_hash].append(row.id)
+            
+            for chunk in self.splitter.split_documents([document]):
+                fields = {
+                    'source': source,
+                    'source_version': version,
+                    'content_hash': content_hash(chunk['content']),
+                    'meta': chunk['metadata']
+                }
+                ids = available.get(fields['content_hash'])
+                if ids:
+                    updates.append({'id': ids.pop(), **fields})
+                else:
+                    pending.append({**fields, 'content': chunk['content']})
+            
+            deletes.extend(row_id for ids in available.values() for row_id in ids)
+        
+        # 2. Arquivos que saíram da base (inclui linhas de cargas antigas, sem source)
+        for source, rows in indexed.items():
+            if source not in current:
+                stats["sources_removed"] += 1
+                deletes.extend(row.id for row in rows)
+        
+        stats["chunks_kept"] = len(updates)
+        stats["chunks_deleted"] = len(deletes)
+        return stats, updates, pending, deletes
+    
+    async def _embed(self, pending: List[Dict]) -> Dict[str, List[float]]:
+        """
+        Embeddings dos chunks pendentes por content_hash (conteúdo repetido vai uma vez só)
+        
+        Raises:
+            RuntimeError: se algum lote falhou depois das tentativas
+        """
+        unique = list({chunk['content_hash']: chunk for chunk in pending}.values())
+        logger.info(f"🔮 {len(unique)} chunks novos ou alterados para embedar")
+        
+        embeddings: Dict[str, List[float]] = {}
+        failed = 0
+        async for batch, vectors in self.vectorstore.embed_batches(unique):
+            if vectors is None:
+                failed += len(batch)
+                continue
+            embeddings.update((chunk['content_hash'], vector) for chunk, vector in zip(batch, vectors))
+        
+        if failed:
+            raise RuntimeError(f"{failed} chunks sem embedding - base mantida na versão anterior")
+        return embeddings
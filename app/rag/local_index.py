@@ -0,0 +1,201 @@
+"""
+Índice Vetorial Local
+Busca RAG em memória (NumPy) para bases pequenas, sem usar o banco
+
+O loader (scripts/load_rag.py) grava um snapshot da tabela documents:
+- embeddings-{versão}.f32: matriz float32 contígua, linhas normalizadas
+- documents-{versão}.json: id, conteúdo e metadados na mesma ordem
+- manifest.json: versão atual, dimensões e nomes dos arquivos
+
+O processo abre a matriz com memmap (as páginas são compartilhadas
+entre os workers da máquina) e a busca é um produto matriz-vetor +
+top-k. A versão é o hash de ids, embeddings, conteúdo e metadados; cada
+arquivo é gravado em temporário + os.replace e o manifesto é trocado por
+último, então o leitor nunca vê um snapshot pela metade. A cada
+RAG_LOCAL_INDEX_REFRESH segundos o processo confere a versão e recarrega
+se mudou.
+
+Sem snapshot (ex: outro nó, arquivo ainda não gerado) a busca volta
+para o pgvector.
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from loguru import logger
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.rag.vectorstore import Document
+
+
+MANIFEST = "manifest.json"
+
+
+def _replace(target: Path, write):
+    """Grava via arquivo temporário e troca atômica (os.replace)"""
+    tmp = target.with_name(f"{target.name}.tmp")
+    write(tmp)
+    os.replace(tmp, target)
+
+
+def write_snapshot(path: str, ids: List[int], documents: List[Dict], matrix: np.ndarray) -> str:
+    """
+    Grava o snapshot (arquivos da versão + manifesto) e apaga versões antigas
+    
+    Args:
+        path: Diretório do índice
+        ids: IDs dos documentos
+        documents: {"content", "metadata"} na ordem das linhas
+        matrix: Embeddings (uma linha por documento)
+    
+    Returns:
+        Versão gravada (hash de ids, embeddings, conteúdo e metadados)
+    """
+    base = Path(path)
+    base.mkdir(parents=True, exist_ok=True)
+    
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    if len(matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+    
+    rows = [{"id": doc_id, **document} for doc_id, document in zip(ids, documents)]
+    payload = json.dumps(rows, ensure_ascii=False, sort_keys=True)
+    
+    # Conteúdo e metadados entram na versão: editar só o texto também recarrega
+    digest = hashlib.sha1(np.asarray(ids, dtype=np.int64).tobytes())
+    digest.update(matrix.tobytes())
+    digest.update(payload.encode())
+    version = digest.hexdigest()[:12]
+    
+    manifest = {
+        "version": version,
+        "count": len(ids),
+        "dim": int(matrix.shape[1]) if len(matrix) else 0,
+        "embeddings": f"embeddings-{version}.f32",
+        "documents": f"documents-{version}.json"
+    }
+    
+    _replace(base / manifest["embeddings"], matrix.tofile)
+    _replace(base / manifest["documents"], lambda tmp: tmp.write_text(payload, encoding="utf-8"))
+    
+    # Troca atômica: leitores passam a ver a nova versão de uma vez
+    _replace(base / MANIFEST, lambda tmp: tmp.write_text(json.dumps(manifest), encoding="utf-8"))
+    
+    # Versões antigas (processos com o arquivo aberto continuam lendo até recarregar)
+    for old in base.glob("*-*.*"):
+        if old.name not in (manifest["embeddings"], manifest["documents"]):
+            old.unlink(missing_ok=True)
+    
+    return version
+
+
+async def export_snapshot(path: str = None) -> str:
+    """Lê todos os documentos com embedding do banco e grava o snapshot"""
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(Document.id, Document.content, Document.meta, Document.embedding)
+            .where(Document.embedding.isnot(None))
+            .order_by(Document.id)
+        )).all()
+    
+    matrix = np.array([row.embedding for row in rows], dtype=np.float32)
+    return write_snapshot(
+        path or settings.RAG_LOCAL_INDEX_PATH,
+        [row.id for row in rows],
+        [{"content": row.content, "metadata": row.meta} for row in rows],
+        matrix
+    )
+
+
+class LocalVectorIndex:
+    """
+    Top-k por cosseno sobre o snapshot em memmap
+    
+    search() é síncrono e custa microssegundos para alguns milhares de
+    chunks; a verificação de versão é um stat do manifesto a cada
+    refresh segundos.
+    """
+    
+    def __init__(self, path: str = None, refresh: int = None):
+        self.path = Path(path or settings.RAG_LOCAL_INDEX_PATH)
+        self.refresh = refresh if refresh is not None else settings.RAG_LOCAL_INDEX_REFRESH
+        self.version: Optional[str] = None
+        self.matrix: Optional[np.ndarray] = None
+        self.documents: List[Dict] = []
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+    
+    def ready(self) -> bool:
+        """
+        True se há snapshot carregado com documentos (recarrega se a versão mudou)
+        
+        Um snapshot vazio não conta: a busca cai no pgvector em vez de
+        devolver sempre zero documentos.
+        """
+        now = time.monotonic()
+        if now - self._checked_at >= self.refresh:
+            self._checked_at = now
+            self._maybe_reload()
+        return self.matrix is not None and self.matrix.shape[0] > 0
+    
+    def _maybe_reload(self):
+        manifest_path = self.path / MANIFEST
+        try:
+            mtime = manifest_path.stat().st_mtime
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        
+        try:
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            
+            if manifest["version"] != self.version:
+                matrix = np.memmap(
+                    self.path / manifest["embeddings"],
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(manifest["count"], manifest["dim"])
+                ) if manifest["count"] else np.zeros((0, 0), dtype=np.float32)
+                with open(self.path / manifest["documents"], encoding="utf-8") as f:
+                    documents = json.load(f)
+                
+                self.matrix, self.documents, self.version = matrix, documents, manifest["version"]
+                logger.info(f"📦 Índice vetorial local carregado: versão {self.version} ({len(documents)} chunks)")
+            
+            self._mtime = mtime
+        except Exception as e:
+            # Snapshot trocado durante a leitura: tenta de novo na próxima verificação
+            logger.error(f"❌ Erro ao carregar índice vetorial local: {e}")
+    
+    def search(self, query_embedding: List[float], top_k: int = 4) -> List[Dict]:
+        """Documentos mais similares (cosseno), no formato de VectorStore.similarity_search"""
+        if self.matrix is None or not len(self.documents):
+            return []
+        
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        
+        scores = self.matrix @ query
+        k = min(top_k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        
+        return [
+            {
+                'content': self.documents[i]['content'],
+                'metadata': self.documents[i]['metadata'],
+                'id': self.documents[i]['id']
+            }
+            for i in best
+        ]
@@ -1,4 +1,4 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from app.rag.vectorstore import VectorStore
 from loguru import logger
 
@@ -6,15 +6,15 @@ from loguru import logger
 class RAGQuery:
     """Gerencia queries e formatação de contexto RAG"""
     
-    def __init__(self):
-        self.vectorstore = VectorStore()
+    def __init__(self, vectorstore: Optional[VectorStore] = None):
+        self.vectorstore = vectorstore or VectorStore()
         self.max_context_chars = 2000
     
-    def build_context(self, query: str, top_k: int = 4) -> str:
+    async def build_context(self, query: str, top_k: int = 4, query_embedding: Optional[List[float]] = None) -> str:
         """Busca documentos relevantes e formata contexto"""
         try:
             # Buscar documentos similares
-            documents = self.vectorstore.similarity_search(query, top_k)
+            documents = await self.vectorstore.similarity_search(query, top_k, query_embedding)
             
             if not documents:
                 logger.warning("Nenhum documento relevante encontrado")
@@ -51,6 +51,27 @@ class RAGQuery:
             logger.error(f"Erro ao construir contexto: {e}")
             return "Erro ao buscar informações."
     
+    async def search_passages(self, query: str, top_k: int = 4, query_embedding: Optional[List[float]] = None) -> List[str]:
+        """
+        Busca documentos relevantes e retorna cada um formatado, sem cortes
+        
+        O tamanho final do contexto é decidido pelo orçamento de tokens
+        do prompt (TokenBudget), não por limite de caracteres.
+        """
+        try:
+            documents = await self.vectorstore.similarity_search(query, top_k, query_embedding)
+        except Exception as e:
+            logger.error(f"Erro ao buscar passagens: {e}")
+            return []
+        
+        passages = []
+        for doc in documents:
+            category = doc['metadata'].get('category', 'geral')
+            source = doc['metadata'].get('source', 'documento')
+            passages.append(f"### [{category.upper()}] {source}\n{doc['content']}")
+        
+        return passages
+    
     def rerank_results(self, query: str, results: List[Dict]) -> List[Dict]:
         """Reordena resultados por relevância (implementação simples)"""
         # Por enquanto, mantém ordem da busca vetorial
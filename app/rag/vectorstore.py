@@ -1,11 +1,16 @@
-from sqlalchemy import Column, Integer, Text, JSON, Index
+import asyncio
+from sqlalchemy import Column, Integer, String, Text, JSON, Index, select, delete, func
 from sqlalchemy.dialects.postgresql import ARRAY
 from pgvector.sqlalchemy import Vector
-from app.database import Base, SessionLocal
+from app.database import Base, AsyncSessionLocal
 from app.config import settings
-from openai import OpenAI
+from app.rag.embedding_cache import EmbeddingCache
+from openai import AsyncOpenAI
 from loguru import logger
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+
+
+EMBEDDING_MODEL = "text-embedding-3-small"
 
 
 class Document(Base):
@@ -16,23 +21,37 @@ class Document(Base):
     embedding = Column(Vector(1536))  # OpenAI embeddings são 1536 dimensões
     meta = Column(JSON, default={})  # MUDOU AQUI: metadata -> meta
     
+    # Indexação incremental (RAGIndexer)
+    source = Column(String(255), nullable=True, index=True)  # categoria/arquivo de origem
+    source_version = Column(String(64), nullable=True)  # hash do arquivo quando indexado
+    content_hash = Column(String(64), nullable=True)  # hash do chunk (+ modelo de embedding)
+    
     __table_args__ = (
-        Index('idx_embedding', 'embedding', postgresql_using='ivfflat'),
+        # HNSW por cosseno: não depende de treino (IVF em tabela vazia) e aceita inserts incrementais
+        Index(
+            'idx_documents_embedding_hnsw', 'embedding',
+            postgresql_using='hnsw',
+            postgresql_with={'m': 16, 'ef_construction': 64},
+            postgresql_ops={'embedding': 'vector_cosine_ops'}
+        ),
     )
 
 
 class VectorStore:
     """Gerencia armazenamento e busca de embeddings"""
     
-    def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.db = SessionLocal()
+    def __init__(self, embedding_cache: Optional[EmbeddingCache] = None, local_index=None):
+        # Sem retries internos do SDK (escondidos do prazo do turno); a ingestão tenta de novo em embed_batches
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+        self.embedding_cache = embedding_cache
+        # LocalVectorIndex (app/rag/local_index.py): busca em memória no lugar do pgvector
+        self.local_index = local_index
     
-    def embed_text(self, text: str) -> List[float]:
+    async def embed_text(self, text: str) -> List[float]:
         """Gera embedding para um texto usando OpenAI"""
         try:
-            response = self.client.embeddings.create(
-                model="text-embedding-3-small",
+            response = await self.client.embeddings.create(
+                model=EMBEDDING_MODEL,
                 input=text
             )
             return response.data[0].embedding
@@ -40,40 +59,122 @@ class VectorStore:
             logger.error(f"Erro ao gerar embedding: {e}")
             raise
     
-    def store_document(self, content: str, metadata: Dict) -> int:
+    async def embed_query(self, text: str) -> List[float]:
+        """Embedding de uma mensagem recebida (cache de embeddings, se configurado)"""
+        if self.embedding_cache is None or len(text) > settings.EMBEDDING_CACHE_MAX_CHARS:
+            return await self.embed_text(text)
+        
+        cached = await self.embedding_cache.get(text)
+        if cached is not None:
+            return cached.tolist()
+        
+        embedding = await self.embed_text(text)
+        await self.embedding_cache.set(text, embedding)
+        return embedding
+    
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Gera embeddings de vários textos em uma única requisição (mesma ordem)"""
+        response = await self.client.embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=texts
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    
+    async def store_document(self, content: str, metadata: Dict) -> int:
         """Armazena um documento com seu embedding"""
-        try:
-            # Gerar embedding
-            embedding = self.embed_text(content)
-            
-            # Criar documento
-            doc = Document(
-                content=content,
-                embedding=embedding,
-                meta=metadata  # MUDOU AQUI: metadata -> meta
-            )
-            
-            self.db.add(doc)
-            self.db.commit()
-            self.db.refresh(doc)
-            
-            return doc.id
-            
-        except Exception as e:
-            logger.error(f"Erro ao armazenar documento: {e}")
-            self.db.rollback()
-            raise
+        # Gerar embedding
+        embedding = await self.embed_text(content)
+        
+        async with AsyncSessionLocal() as db:
+            try:
+                # Criar documento
+                doc = Document(
+                    content=content,
+                    embedding=embedding,
+                    meta=metadata  # MUDOU AQUI: metadata -> meta
+                )
+                
+                db.add(doc)
+                await db.commit()
+                
+                return doc.id
+                
+            except Exception as e:
+                logger.error(f"Erro ao armazenar documento: {e}")
+                await db.rollback()
+                raise
     
-    def similarity_search(self, query: str, top_k: int = 4) -> List[Dict]:
-        """Busca documentos similares usando embeddings"""
+    async def embed_batches(
+        self,
+        documents: List[Dict],
+        batch_size: int = None,
+        concurrency: int = None
+    ) -> AsyncIterator[Tuple[List[Dict], Optional[List[List[float]]]]]:
+        """
+        Gera embeddings em requisições de batch_size textos, até concurrency em paralelo
+        
+        Cada lote tem até 3 tentativas (o cliente não faz retries próprios).
+        
+        Yields:
+            (lote, embeddings) na ordem em que ficam prontos; embeddings é
+            None se todas as tentativas do lote falharam
+        """
+        batch_size = batch_size or settings.RAG_EMBED_BATCH_SIZE
+        semaphore = asyncio.Semaphore(concurrency or settings.RAG_EMBED_CONCURRENCY)
+        batches = [documents[i:i + batch_size] for i in range(0, len(documents), batch_size)]
+        
+        max_retries = 3
+        retry_delay = 2
+        
+        async def embed(batch: List[Dict]) -> Tuple[List[Dict], Optional[List[List[float]]]]:
+            async with semaphore:
+                for attempt in range(max_retries):
+                    try:
+                        return batch, await self.embed_texts([doc['content'] for doc in batch])
+                    except Exception as e:
+                        if attempt == max_retries - 1:
+                            logger.error(f"Erro ao gerar embeddings de {len(batch)} chunks: {e}")
+                            return batch, None
+                        logger.warning(f"⚠️  Falha nos embeddings ({e}). Tentativa {attempt + 1}/{max_retries}")
+                        await asyncio.sleep(retry_delay * (attempt + 1))
+        
+        for done in asyncio.as_completed([embed(batch) for batch in batches]):
+            yield await done
+    
+    async def similarity_search(
+        self,
+        query: str,
+        top_k: int = 4,
+        query_embedding: Optional[List[float]] = None,
+        ef_search: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Busca documentos similares usando embeddings (reusa query_embedding se informado)
+        
+        ef_search: candidatos visitados no índice HNSW (maior = mais recall e
+        mais latência); padrão RAG_HNSW_EF_SEARCH
+        """
         try:
             # Gerar embedding da query
-            query_embedding = self.embed_text(query)
+            if query_embedding is None:
+                query_embedding = await self.embed_query(query)
+            
+            # Índice local (snapshot em memória) quando habilitado e carregado
+            if self.local_index is not None and self.local_index.ready():
+                documents = self.local_index.search(query_embedding, top_k)
+                logger.info(f"🔍 Encontrados {len(documents)} documentos relevantes (índice local)")
+                return documents
             
-            # Buscar documentos similares
-            results = self.db.query(Document).order_by(
-                Document.embedding.l2_distance(query_embedding)
-            ).limit(top_k).all()
+            # Buscar documentos similares (distância de cosseno, mesma do índice)
+            ef_search = max(ef_search or settings.RAG_HNSW_EF_SEARCH, top_k)
+            async with AsyncSessionLocal() as db:
+                # Vale só para esta transação (SET LOCAL)
+                await db.execute(select(func.set_config('hnsw.ef_search', str(ef_search), True)))
+                results = (await db.execute(
+                    select(Document.id, Document.content, Document.meta).order_by(
+                        Document.embedding.cosine_distance(query_embedding)
+                    ).limit(top_k)
+                )).all()
             
             # Formatar resultados
             documents = []
@@ -91,16 +192,18 @@ class VectorStore:
             logger.error(f"Erro na busca semântica: {e}")
             return []
     
-    def clear_all(self):
+    async def clear_all(self):
         """Remove todos os documentos (usar apenas em dev)"""
-        try:
-            self.db.query(Document).delete()
-            self.db.commit()
-            logger.info("🗑️  Todos os documentos removidos")
-        except Exception as e:
-            logger.error(f"Erro ao limpar documentos: {e}")
-            self.db.rollback()
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.execute(delete(Document))
+                await db.commit()
+                logger.info("🗑️  Todos os documentos removidos")
+            except Exception as e:
+                logger.error(f"Erro ao limpar documentos: {e}")
+                await db.rollback()
     
-    def count_documents(self) -> int:
+    async def count_documents(self) -> int:
         """Retorna total de documentos armazenados"""
-        return self.db.query(Document).count()
\ No newline at end of file
+        async with AsyncSessionLocal() as db:
+            return await db.scalar(select(func.count(Document.id)))
\ No newline at end of file
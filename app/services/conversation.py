@@ -1,7 +1,11 @@
-from app.database import SessionLocal
 from app.models.conversation import Conversation, ConversationStatus, ConversationStage
 from app.models.message import Message
 from app.models.lead import Lead
+from app.core.container import container
+from app.core.state_manager import ConversationStateCache
+from sqlalchemy import func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List, Dict
 from loguru import logger
 from datetime import datetime
@@ -10,77 +14,114 @@ from datetime import datetime
 class ConversationManager:
     """Gerencia conversas, mensagens e leads"""
     
-    def __init__(self):
-        self.db = SessionLocal()
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.state_cache = ConversationStateCache()
+        self.history = container.history
+        self._pending_history: List[Message] = []
     
-    def get_or_create_conversation(self, phone: str) -> Conversation:
+    async def commit(self):
+        """Commit da transação e atualização do buffer de histórico"""
+        await self.db.commit()
+        pending, self._pending_history = self._pending_history, []
+        for message in pending:
+            await self.history.append(message.conversation_id, message.role, message.content, message.id)
+    
+    async def get_state(self, phone: str, name: Optional[str] = None) -> Dict:
         """
-        Busca conversa existente ou cria nova
+        Snapshot da conversa ativa (cache Redis, senão upsert no banco)
+        
+        Após o commit da transação, grave o snapshot com save_state().
         
         Args:
             phone: Número do telefone
-            
+            name: Nome do cliente (opcional)
+        
         Returns:
-            Objeto Conversation
+            Dict com conversation_id, phone, status, stage, summary e lead
         """
         
-        # Buscar conversa ativa
-        conversation = self.db.query(Conversation).filter(
-            Conversation.phone == phone,
-            Conversation.status == ConversationStatus.active
-        ).first()
+        state = await self.state_cache.get(phone)
         
-        if conversation:
-            logger.info(f"💬 Conversa existente encontrada: {conversation.id}")
-            return conversation
+        # Sem nome no lead: passa pelo banco para salvar o nome recebido
+        if state and (not name or state["lead"].get("name")):
+            return state
+        
+        conversation = await self.get_or_create_conversation(phone, name)
+        lead = await self.get_lead(conversation.lead_id)
+        
+        return ConversationStateCache.snapshot(conversation, lead)
+    
+    async def save_state(self, state: Dict):
+        """Grava o snapshot no cache (write-through)"""
+        await self.state_cache.set(state)
+    
+    async def get_or_create_conversation(self, phone: str, name: Optional[str] = None) -> Conversation:
+        """
+        Busca conversa ativa ou cria nova (upsert, sem commit)
+        
+        Também atualiza last_message_at da conversa ativa.
         
-        # Buscar ou criar lead
-        lead = self.get_or_create_lead(phone)
+        Args:
+            phone: Número do telefone
+            name: Nome do cliente (opcional)
         
-        # Criar nova conversa
-        conversation = Conversation(
+        Returns:
+            Objeto Conversation
+        """
+        
+        lead = await self.get_or_create_lead(phone, name)
+        
+        # Uma conversa ativa por telefone (índice único parcial)
+        stmt = insert(Conversation).values(
             phone=phone,
             lead_id=lead.id,
             status=ConversationStatus.active,
             current_stage=ConversationStage.novo
         )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Conversation.phone],
+            # Literal: a inferência do índice parcial não aceita parâmetro
+            index_where=text("status = 'active'"),
+            set_={"last_message_at": func.now()}
+        ).returning(Conversation)
         
-        self.db.add(conversation)
-        self.db.commit()
-        self.db.refresh(conversation)
+        conversation = await self.db.scalar(
+            select(Conversation).from_statement(stmt).execution_options(populate_existing=True)
+        )
         
-        logger.info(f"✅ Nova conversa criada: {conversation.id}")
+        logger.info(f"💬 Conversa {conversation.id} ({phone})")
         
         return conversation
     
-    def get_or_create_lead(self, phone: str, name: Optional[str] = None) -> Lead:
-        """Busca ou cria lead"""
+    async def get_or_create_lead(self, phone: str, name: Optional[str] = None) -> Lead:
+        """Busca ou cria lead (upsert, sem commit)"""
         
-        lead = self.db.query(Lead).filter(Lead.phone == phone).first()
+        stmt = insert(Lead).values(phone=phone, name=name, origin="whatsapp")
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Lead.phone],
+            # Atualizar nome apenas se ainda não tiver
+            set_={"name": func.coalesce(Lead.name, stmt.excluded.name)}
+        ).returning(Lead)
         
-        if lead:
-            # Atualizar nome se fornecido
-            if name and not lead.name:
-                lead.name = name
-                self.db.commit()
-            return lead
-        
-        # Criar novo lead
-        lead = Lead(
-            phone=phone,
-            name=name,
-            origin="whatsapp"
+        return await self.db.scalar(
+            select(Lead).from_statement(stmt).execution_options(populate_existing=True)
         )
-        
-        self.db.add(lead)
-        self.db.commit()
-        self.db.refresh(lead)
-        
-        logger.info(f"✅ Novo lead criado: {lead.id}")
-        
-        return lead
     
-    def add_message(self, conversation_id: int, role: str, content: str) -> Message:
+    async def get_lead(self, lead_id: Optional[int]) -> Optional[Lead]:
+        """Busca lead pelo ID"""
+        if lead_id is None:
+            return None
+        return await self.db.get(Lead, lead_id)
+    
+    async def add_message(
+        self,
+        conversation_id: int,
+        role: str,
+        content: str,
+        commit: bool = True,
+        zapi_message_id: Optional[str] = None
+    ) -> Message:
         """
         Adiciona mensagem à conversa
         
@@ -88,7 +129,9 @@ class ConversationManager:
             conversation_id: ID da conversa
             role: 'user' ou 'assistant'
             content: Texto da mensagem
-            
+            commit: Se False, fica na transação do chamador
+            zapi_message_id: messageId do Z-API (mensagens do usuário)
+        
         Returns:
             Objeto Message
         """
@@ -96,67 +139,136 @@ class ConversationManager:
         message = Message(
             conversation_id=conversation_id,
             role=role,
-            content=content
+            content=content,
+            zapi_message_id=zapi_message_id
         )
         
         self.db.add(message)
         
         # Atualizar last_message_at da conversa
-        conversation = self.db.query(Conversation).filter(
-            Conversation.id == conversation_id
-        ).first()
-        
-        if conversation:
-            conversation.last_message_at = datetime.now()
+        await self.db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(last_message_at=datetime.now())
+        )
         
-        self.db.commit()
-        self.db.refresh(message)
+        # O buffer de histórico só recebe a mensagem depois do commit
+        self._pending_history.append(message)
+        if commit:
+            await self.commit()
         
         return message
     
-    def get_history(self, conversation_id: int, limit: int = 12) -> List[Dict]:
+    async def get_saved_messages(self, zapi_message_ids: List[str]) -> Dict[str, int]:
+        """
+        Mensagens do usuário já gravadas (reentrega do stream após falha)
+        
+        Returns:
+            messageId do Z-API -> ID da Message
+        """
+        if not zapi_message_ids:
+            return {}
+        
+        rows = (await self.db.execute(
+            select(Message.zapi_message_id, Message.id).where(Message.zapi_message_id.in_(zapi_message_ids))
+        )).all()
+        return {zapi_message_id: message_id for zapi_message_id, message_id in rows}
+    
+    async def get_history(self, conversation_id: int, limit: int = 12) -> List[Dict]:
         """
         Retorna histórico de mensagens
         
         Args:
             conversation_id: ID da conversa
             limit: Quantidade de mensagens (padrão: 12)
-            
+        
         Returns:
             Lista de mensagens no formato dict
         """
         
-        messages = self.db.query(Message).filter(
-            Message.conversation_id == conversation_id
-        ).order_by(Message.created_at.desc()).limit(limit).all()
-        
-        # Inverter para ordem cronológica
-        messages = list(reversed(messages))
+        return await self.history.get(
+            conversation_id,
+            limit,
+            loader=lambda size: self._load_history(conversation_id, size)
+        )
+    
+    async def _load_history(self, conversation_id: int, limit: int) -> List[Dict]:
+        """Últimas mensagens direto do banco (apenas id/role/content, índice da conversa)"""
         
-        # Converter para formato OpenAI
-        history = []
-        for msg in messages:
-            history.append({
-                "role": msg.role,
-                "content": msg.content
-            })
+        rows = (await self.db.execute(
+            select(Message.id, Message.role, Message.content).where(
+                Message.conversation_id == conversation_id
+            ).order_by(Message.created_at.desc(), Message.id.desc()).limit(limit)
+        )).all()
         
-        return history
+        # Inverter para ordem cronológica (formato OpenAI)
+        return [
+            {"id": message_id, "role": role, "content": content}
+            for message_id, role, content in reversed(rows)
+        ]
     
-    def update_stage(self, conversation_id: int, new_stage: ConversationStage):
-        """Atualiza estágio da conversa"""
+    async def update_stage(self, conversation_id: int, new_stage: ConversationStage, commit: bool = True):
+        """
+        Atualiza estágio da conversa
         
-        conversation = self.db.query(Conversation).filter(
-            Conversation.id == conversation_id
-        ).first()
+        Com commit=False o chamador faz o commit e invalida o estado.
+        """
+        
+        conversation = await self.db.get(Conversation, conversation_id)
         
         if conversation:
             old_stage = conversation.current_stage
             conversation.current_stage = new_stage
-            self.db.commit()
+            if commit:
+                await self.db.commit()
+                await self.state_cache.invalidate(conversation.phone)
             
             logger.info(f"📊 Conversa {conversation_id}: {old_stage.value} → {new_stage.value}")
     
-    def close(self):
+    async def update_lead(self, lead_id: Optional[int], fields: Dict, commit: bool = True) -> Dict:
+        """
+        Grava no lead os dados extraídos da conversa
+        
+        Nome só é preenchido se ainda não existir; interesse, orçamento e
+        urgência vão para o profile.
+        
+        Args:
+            lead_id: ID do lead
+            fields: name, email, interest, budget, urgency (só os informados)
+            commit: Se False, fica na transação do chamador
+        
+        Returns:
+            Campos que mudaram
+        """
+        
+        lead = await self.get_lead(lead_id)
+        if not lead:
+            return {}
+        
+        changes = {}
+        
+        if fields.get("name") and not lead.name:
+            lead.name = changes["name"] = fields["name"][:100]
+        
+        if fields.get("email") and fields["email"] != lead.email:
+            lead.email = changes["email"] = fields["email"][:100]
+        
+        profile = dict(lead.profile or {})
+        for key in ("interest", "budget", "urgency"):
+            if key in fields and profile.get(key) != fields[key]:
+                profile[key] = changes[key] = fields[key]
+        
+        # Novo dict: o JSON só é gravado se o objeto for substituído
+        if profile != (lead.profile or {}):
+            lead.profile = profile
+        
+        if changes:
+            logger.info(f"🧾 Lead {lead_id} atualizado: {list(changes)}")
+            if commit:
+                await self.commit()
+        
+        return changes
+    
+    async def close(self):
         """Fecha conexão com banco"""
-        self.db.close()
\ No newline at end of file
+        await self.db.close()
@@ -4,21 +4,22 @@ Gerencia transferência de conversas para atendimento humano
 """
 
 from datetime import datetime
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
 
 from app.models.conversation import Conversation, ConversationStatus
+from app.core.container import container
+from app.core.state_manager import ConversationStateCache
 from app.core.scheduler import FollowupScheduler
-from app.channels.whatsapp.zapi import ZAPIClient
 from app.crm.sync_service import CRMSyncService
-from app.config import settings
+from app.utils.anti_loop import AntiLoopManager
 
 
 class HandoffService:
     """Gerenciador de handoffs (transferência para humano)"""
     
     @staticmethod
-    def request_handoff(conversation_id: int, reason: str, db: Session):
+    async def request_handoff(conversation_id: int, reason: str, db: AsyncSession, notify_client: bool = True):
         """
         Solicita handoff de uma conversa
         
@@ -26,61 +27,58 @@ class HandoffService:
             conversation_id: ID da conversa
             reason: Motivo do handoff
             db: Sessão do banco de dados
+            notify_client: Se False, o cliente já foi avisado (resposta da IA)
         """
         logger.info(f"🤝 Solicitando handoff para conversa {conversation_id}")
         logger.info(f"   Motivo: {reason}")
         
         try:
             # Busca conversa
-            conversation = db.query(Conversation).filter(
-                Conversation.id == conversation_id
-            ).first()
+            conversation = await db.get(Conversation, conversation_id)
             
             if not conversation:
                 logger.error(f"❌ Conversa {conversation_id} não encontrada")
                 return False
             
             # Atualiza status da conversa
-            conversation.status = ConversationStatus.HANDOFF
+            conversation.status = ConversationStatus.handoff
             conversation.handoff_at = datetime.utcnow()
             
             # Cancela follow-ups pendentes
-            FollowupScheduler.cancel_followups(conversation_id, db)
+            await FollowupScheduler.cancel_followups(conversation_id, db, commit=False)
             
             # Notifica cliente
-            HandoffService._notify_client(conversation, db)
+            if notify_client:
+                await HandoffService._notify_client(conversation, db)
             
             # Notifica atendente
-            HandoffService._notify_attendant(conversation, reason, db)
+            await HandoffService._notify_attendant(conversation, reason, db)
             
             # Sincroniza com CRM
             try:
-                crm = CRMSyncService(db)
-                crm.add_note_to_lead(
+                crm = CRMSyncService(db, container.datacrazy)
+                await crm.add_note_to_lead(
                     conversation.lead_id,
                     f"🤝 HANDOFF SOLICITADO\nMotivo: {reason}\nData: {datetime.utcnow().strftime('%d/%m/%Y %H:%M')}"
                 )
             except Exception as e:
                 logger.warning(f"⚠️  Erro ao sincronizar handoff com CRM: {e}")
             
-            db.commit()
+            await db.commit()
+            await ConversationStateCache().invalidate(conversation.phone)
             logger.info(f"✅ Handoff registrado com sucesso")
             return True
             
         except Exception as e:
             logger.error(f"❌ Erro ao processar handoff: {e}")
-            db.rollback()
+            await db.rollback()
             return False
     
     @staticmethod
-    def _notify_client(conversation: Conversation, db: Session):
+    async def _notify_client(conversation: Conversation, db: AsyncSession):
         """Notifica cliente sobre handoff"""
         try:
-            zapi = ZAPIClient(
-                token=settings.ZAPI_TOKEN,
-                instance=settings.ZAPI_INSTANCE,
-                client_token=settings.ZAPI_CLIENT_TOKEN
-            )
+            zapi = container.zapi
             
             message = """
 Entendo sua situação! 😊
@@ -92,14 +90,15 @@ Vou transferir você para um de nossos consultores especializados que poderá te
 Obrigado pela paciência! 🙏
             """.strip()
             
-            zapi.send_text(conversation.phone, message)
+            await zapi.send_text(conversation.phone, message)
+            await AntiLoopManager().register_sent_message(conversation.phone, message)
             logger.info(f"✅ Cliente notificado sobre handoff")
             
         except Exception as e:
             logger.error(f"❌ Erro ao notificar cliente: {e}")
     
     @staticmethod
-    def _notify_attendant(conversation: Conversation, reason: str, db: Session):
+    async def _notify_attendant(conversation: Conversation, reason: str, db: AsyncSession):
         """Notifica atendente sobre novo handoff"""
         try:
             # Implementação de notificação para atendente
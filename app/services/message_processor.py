@@ -3,35 +3,41 @@ Processador de Mensagens
 Orquestra todo o fluxo de processamento de mensagens
 """
 
-from datetime import datetime
-from sqlalchemy.orm import Session
+import time
+from typing import Dict, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
 
-from app.models.conversation import Conversation, ConversationStatus, ConversationStage
-from app.models.message import Message
-from app.models.lead import Lead
-from app.rag.query import build_context
-from app.llm.response_generator import generate_response
-from app.channels.whatsapp.zapi import ZAPIClient
+from app.config import settings
+from app.channels.whatsapp.zapi import ZAPISendError
+from app.models.conversation import Conversation, ConversationStage, ConversationStatus
+from app.core import deadline
+from app.core.classifier import OPT_OUT
 from app.crm.sync_service import CRMSyncService
+from app.core.container import container
 from app.core.scheduler import FollowupScheduler
+from app.services.conversation import ConversationManager
 from app.services.handoff import HandoffService
-from app.config import settings
+from app.services.summary import ConversationSummarizer
+from app.utils.anti_loop import AntiLoopManager
+from app.utils.dedup import DedupManager
 
 
 class MessageProcessor:
     """Processa mensagens do WhatsApp e orquestra respostas da IA"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
-        self.zapi = ZAPIClient(
-            token=settings.ZAPI_TOKEN,
-            instance=settings.ZAPI_INSTANCE,
-            client_token=settings.ZAPI_CLIENT_TOKEN
-        )
-        self.crm = CRMSyncService(db)
+        self.conversations = ConversationManager(db)
+        self.generator = container.generator
+        self.zapi = container.zapi
+        self.crm = CRMSyncService(db, container.datacrazy)
+        self.anti_loop = AntiLoopManager()
+        self.dedup = DedupManager()
+        self.summarizer = ConversationSummarizer()
+        self.classifier = container.classifier
     
-    async def process_message(self, phone: str, text: str, name: str = None):
+    async def process_message(self, phone: str, text: str, name: str = None, message_id: Optional[str] = None):
         """
         Processa uma mensagem recebida
         
@@ -39,176 +45,249 @@ class MessageProcessor:
             phone: Telefone do cliente
             text: Texto da mensagem
             name: Nome do cliente (opcional)
+            message_id: messageId do Z-API (opcional)
+        """
+        await self.process_messages(phone, [text], name, [message_id])
+    
+    async def process_messages(
+        self,
+        phone: str,
+        texts: List[str],
+        name: str = None,
+        message_ids: Optional[List[Optional[str]]] = None
+    ):
         """
-        logger.info(f"📱 Processando mensagem de {phone}")
+        Processa uma rajada de mensagens como um único turno
+        
+        Cada fragmento é salvo como uma Message; a IA recebe os
+        fragmentos unidos e responde uma única vez.
+        
+        Reprocessar o mesmo turno (reentrega do stream após uma falha) é
+        idempotente pelos messageIds: fragmentos já respondidos são
+        ignorados e os já gravados não são gravados de novo.
+        
+        Args:
+            phone: Telefone do cliente
+            texts: Textos das mensagens, em ordem de chegada
+            name: Nome do cliente (opcional)
+            message_ids: messageId do Z-API de cada texto (opcional)
+        """
+        fragments = list(zip(texts, message_ids or [None] * len(texts)))
+        logger.info(f"📱 Processando {len(texts)} mensagem(ns) de {phone}")
         
         try:
-            # 1. Get/Create Conversation
-            conversation = self._get_or_create_conversation(phone, name)
+            # Transação 1 (antes da IA): lead, conversa, histórico e mensagens do usuário
+            # 1. Estado da conversa (cache Redis ou upsert de lead e conversa)
+            state = await self.conversations.get_state(phone, name)
+            conversation_id = state["conversation_id"]
+            lead_data = state["lead"]
             
             # 2. Verifica se está em handoff
-            if conversation.status == ConversationStatus.HANDOFF:
-                logger.info(f"⚠️  Conversa {conversation.id} está em handoff - ignorando")
+            if state["status"] == ConversationStatus.handoff.value:
+                logger.info(f"⚠️  Conversa {conversation_id} está em handoff - ignorando")
+                await self.conversations.commit()
                 return
             
-            # 3. Salva mensagem do usuário
-            user_message = Message(
-                conversation_id=conversation.id,
-                role="user",
-                content=text
-            )
-            self.db.add(user_message)
-            self.db.commit()
-            
-            # 4. Atualiza timestamp da conversa
-            conversation.last_message_at = datetime.utcnow()
-            self.db.commit()
-            
-            # 5. Busca contexto RAG
-            context = build_context(text, top_k=4)
-            logger.info(f"📚 Contexto RAG obtido: {len(context)} caracteres")
-            
-            # 6. Busca histórico da conversa
-            history = self._get_conversation_history(conversation.id, limit=10)
-            
-            # 7. Gera resposta da IA
-            response, needs_handoff = generate_response(
-                user_message=text,
-                history=history,
-                stage=conversation.current_stage,
-                lead_data=conversation.lead.to_dict() if conversation.lead else {},
-                context=context
-            )
+            # 3. Reentrega: fragmentos já respondidos saem do turno
+            answered = await self.dedup.get_answered([message_id for _, message_id in fragments if message_id])
+            if answered:
+                fragments = [(fragment, message_id) for fragment, message_id in fragments if message_id not in answered]
+                if not fragments:
+                    logger.info(f"⏭️  Mensagens de {phone} já respondidas - reentrega ignorada")
+                    await self.conversations.commit()
+                    return
+            
+            text = "\n".join(fragment for fragment, _ in fragments)
+            turn_ids = [message_id for _, message_id in fragments if message_id]
+            
+            # 4. Busca histórico da conversa (sem as mensagens do turno já gravadas numa tentativa anterior)
+            history = await self.conversations.get_history(conversation_id, limit=settings.HISTORY_BUFFER_SIZE)
+            saved = await self.conversations.get_saved_messages(turn_ids)
+            if saved:
+                logger.info(f"♻️  {len(saved)} mensagem(ns) de {phone} já gravada(s) - reprocessando sem duplicar")
+                saved_ids = set(saved.values())
+                history = [m for m in history if m.get("id") not in saved_ids]
+            is_first_message = not history
+            
+            # Mensagens já incorporadas ao resumo não vão literalmente ao prompt
+            summary_id = state.get("summary_message_id")
+            if summary_id:
+                history = [m for m in history if not m.get("id") or m["id"] > summary_id]
+            
+            # 5. Salva mensagens do usuário
+            for fragment, message_id in fragments:
+                if message_id not in saved:
+                    await self.conversations.add_message(
+                        conversation_id, "user", fragment, commit=False, zapi_message_id=message_id
+                    )
+            
+            await self.conversations.commit()
+            await self.conversations.save_state(state)
+            
+            # 6. Intenção da mensagem (local, escolhe o prompt de objeções/fechamento)
+            intent = self.classifier.classify(text)
+            logger.info(f"🧭 Intenção detectada: {intent}")
+            
+            # 7. Gera resposta da IA (RAG + prompt + OpenAI)
+            sent = []
+            started = time.monotonic()
+            
+            async def send_bubble(bubble: str):
+                if not await self.zapi.send_text(phone, bubble):
+                    # Sem envio o turno não conta como respondido: a entrada fica pendente
+                    raise ZAPISendError(f"Falha ao enviar mensagem para {phone}")
+                await self.anti_loop.register_sent_message(phone, bubble)
+                if not sent:
+                    # Daqui em diante uma reentrega não responde de novo
+                    await self.dedup.mark_answered(turn_ids)
+                    logger.info(f"⚡ Primeira mensagem para {phone} em {time.monotonic() - started:.2f}s")
+                sent.append(bubble)
+            
+            # Opt-out: encerra a conversa sem chamar a IA
+            if intent == OPT_OUT:
+                await self._opt_out(phone, conversation_id, send_bubble)
+                return
+            
+            if settings.STREAM_RESPONSES:
+                # Cada frase/parágrafo é enviado assim que fica pronto
+                turn = await self.generator.stream_response(
+                    user_message=text,
+                    conversation_history=history,
+                    stage=state["stage"],
+                    on_chunk=send_bubble,
+                    lead_data=lead_data,
+                    intent=intent,
+                    summary=state.get("summary")
+                )
+            else:
+                turn = await self.generator.generate_response(
+                    user_message=text,
+                    conversation_history=history,
+                    stage=state["stage"],
+                    lead_data=lead_data,
+                    intent=intent,
+                    summary=state.get("summary")
+                )
+            
+            response = turn["reply"]
+            if not response:
+                logger.error(f"❌ Nenhuma resposta gerada para {phone}")
+                await self.conversations.commit()
+                return
             
             logger.info(f"🤖 Resposta gerada: {response[:100]}...")
-            logger.info(f"🤝 Necessita handoff: {needs_handoff}")
+            logger.info(f"🤝 Necessita handoff: {turn['handoff']}")
             
-            # 8. Verifica se precisa de handoff
-            if needs_handoff:
-                HandoffService.request_handoff(
-                    conversation_id=conversation.id,
+            # Transação 2 (depois da IA): resposta, follow-ups ou handoff
+            # 8. Handoff decidido pelo modelo: a resposta já avisa o cliente (faz o commit)
+            if turn["handoff"]:
+                if not sent:
+                    await send_bubble(response)
+                await self.conversations.add_message(conversation_id, "assistant", "\n\n".join(sent), commit=False)
+                await self.conversations.update_lead(lead_data.get("id"), turn["lead"], commit=False)
+                if lead_data and not lead_data.get("datacrazy_id") and not deadline.expired():
+                    # A nota do handoff no CRM precisa do lead criado lá
+                    await self.crm.sync_lead_create(lead_data["id"], commit=False)
+                await HandoffService.request_handoff(
+                    conversation_id=conversation_id,
                     reason="IA solicitou transferência para humano",
-                    db=self.db
+                    db=self.db,
+                    notify_client=False
                 )
+                await self.conversations.commit()
                 return
             
-            # 9. Salva resposta da IA
-            assistant_message = Message(
-                conversation_id=conversation.id,
-                role="assistant",
-                content=response
-            )
-            self.db.add(assistant_message)
-            self.db.commit()
+            # 9. Envia resposta via WhatsApp (no streaming já foi enviada em balões)
+            # Antes da transação 2: sem envio confirmado nada é gravado e a reentrega não duplica a resposta
+            if not sent:
+                await send_bubble(response)
             
-            # 10. Envia resposta via WhatsApp
-            self.zapi.send_text(phone, response)
-            logger.info(f"✅ Resposta enviada para {phone}")
+            # 10. Salva resposta da IA, estágio, dados do lead e follow-ups (apenas na primeira mensagem)
+            await self.conversations.add_message(conversation_id, "assistant", response, commit=False)
             
-            # 11. Sincroniza com CRM (async)
-            try:
-                # Adiciona nota da interação
-                if conversation.lead:
-                    self.crm.add_note_to_lead(
-                        conversation.lead_id,
-                        f"💬 CONVERSA\n\nCliente: {text}\n\nIA: {response}"
-                    )
-            except Exception as e:
-                logger.warning(f"⚠️  Erro ao sincronizar com CRM: {e}")
+            next_stage = turn["next_stage"]
+            stage_changed = next_stage not in (None, state["stage"], ConversationStage.novo.value)
+            if stage_changed:
+                await self.conversations.update_stage(conversation_id, ConversationStage(next_stage), commit=False)
             
-            # 12. Agenda follow-ups (apenas na primeira mensagem)
-            if conversation.status == ConversationStatus.NEW:
-                conversation.status = ConversationStatus.ACTIVE
-                self.db.commit()
-                
-                # Agenda follow-ups automáticos
-                FollowupScheduler.schedule_followups(conversation.id, self.db)
-                logger.info(f"📅 Follow-ups agendados para conversa {conversation.id}")
+            lead_changes = await self.conversations.update_lead(lead_data.get("id"), turn["lead"], commit=False)
             
-            logger.info(f"✅ Mensagem processada com sucesso")
+            if is_first_message:
+                await FollowupScheduler.schedule_followups(conversation_id, self.db, commit=False)
+                logger.info(f"📅 Follow-ups agendados para conversa {conversation_id}")
+            
+            await self.conversations.commit()
+            
+            if stage_changed or lead_changes:
+                # Estágio/lead mudaram: o próximo turno relê do banco
+                await self.conversations.state_cache.invalidate(phone)
             
+            # Resumo incremental a cada K turnos (worker Celery)
+            await self.summarizer.record_turn(conversation_id)
+            
+            logger.info(f"✅ Resposta enviada para {phone} ({len(sent)} mensagem(ns))")
+            
+            # 11. Sincroniza com CRM (depois do envio; pulado se o prazo do turno acabou)
+            if deadline.expired():
+                logger.warning("⏰ Prazo do turno esgotado - sincronização com CRM pulada")
+            else:
+                try:
+                    if lead_data and not lead_data.get("datacrazy_id"):
+                        # Primeira mensagem (ou criação pulada antes): cria o lead e grava o datacrazy_id
+                        await self.crm.sync_lead_create(lead_data["id"])
+                        await self.conversations.state_cache.invalidate(phone)
+                    
+                    # Adiciona nota da interação
+                    if lead_data:
+                        await self.crm.add_note_to_lead(
+                            lead_data["id"],
+                            f"💬 CONVERSA\n\nCliente: {text}\n\nIA: {response}"
+                        )
+                    
+                    if lead_changes:
+                        await self.crm.sync_lead_update(lead_data["id"], self._crm_lead_updates(lead_changes))
+                    
+                    if stage_changed:
+                        await self.crm.sync_stage_change(conversation_id)
+                except Exception as e:
+                    logger.warning(f"⚠️  Erro ao sincronizar com CRM: {e}")
+            
+            logger.info(f"✅ Mensagem processada com sucesso")
+        
         except Exception as e:
             logger.error(f"❌ Erro ao processar mensagem: {e}")
             raise
     
-    def _get_or_create_conversation(self, phone: str, name: str = None):
-        """Busca ou cria uma conversa"""
-        # Busca conversa ativa
-        conversation = self.db.query(Conversation).filter(
-            Conversation.phone == phone,
-            Conversation.status.in_([
-                ConversationStatus.NEW,
-                ConversationStatus.ACTIVE,
-                ConversationStatus.QUALIFIED
-            ])
-        ).first()
+    async def _opt_out(self, phone: str, conversation_id: int, send_bubble):
+        """
+        Lead pediu para não receber mais mensagens
         
+        Encerra a conversa e cancela os follow-ups pendentes antes de
+        enviar a confirmação (OPT_OUT_REPLY). Uma nova mensagem do lead
+        abre outra conversa.
+        """
+        conversation = await self.db.get(Conversation, conversation_id)
         if conversation:
-            logger.info(f"📖 Conversa existente encontrada: {conversation.id}")
-            return conversation
-        
-        # Cria nova conversa
-        logger.info(f"🆕 Criando nova conversa para {phone}")
-        
-        # Get/Create Lead
-        lead = self._get_or_create_lead(phone, name)
-        
-        conversation = Conversation(
-            phone=phone,
-            lead_id=lead.id,
-            status=ConversationStatus.NEW,
-            current_stage=ConversationStage.INITIAL_CONTACT,
-            last_message_at=datetime.utcnow()
-        )
-        
-        self.db.add(conversation)
-        self.db.commit()
+            conversation.status = ConversationStatus.closed
+        await FollowupScheduler.cancel_followups(conversation_id, self.db, commit=False)
+        if settings.OPT_OUT_REPLY:
+            await self.conversations.add_message(conversation_id, "assistant", settings.OPT_OUT_REPLY, commit=False)
+        await self.conversations.commit()
+        await self.conversations.state_cache.invalidate(phone)
+        logger.info(f"🚫 Opt-out de {phone}: conversa {conversation_id} encerrada e follow-ups cancelados")
         
-        logger.info(f"✅ Conversa criada: {conversation.id}")
-        
-        # Sincroniza lead com CRM
-        try:
-            self.crm.sync_lead(lead.id)
-        except Exception as e:
-            logger.warning(f"⚠️  Erro ao sincronizar lead com CRM: {e}")
-        
-        return conversation
-    
-    def _get_or_create_lead(self, phone: str, name: str = None):
-        """Busca ou cria um lead"""
-        lead = self.db.query(Lead).filter(Lead.phone == phone).first()
-        
-        if lead:
-            logger.info(f"📖 Lead existente: {lead.id}")
-            return lead
-        
-        # Cria novo lead
-        lead = Lead(
-            phone=phone,
-            name=name or "Cliente",
-            origin="whatsapp"
-        )
-        
-        self.db.add(lead)
-        self.db.commit()
-        
-        logger.info(f"✅ Lead criado: {lead.id}")
-        return lead
+        if settings.OPT_OUT_REPLY:
+            try:
+                await send_bubble(settings.OPT_OUT_REPLY)
+            except Exception as e:
+                # A recusa já está gravada: sem confirmação, mas sem reprocessar
+                logger.warning(f"⚠️  Erro ao confirmar opt-out para {phone}: {e}")
     
-    def _get_conversation_history(self, conversation_id: int, limit: int = 10):
-        """Busca histórico de mensagens"""
-        messages = self.db.query(Message).filter(
-            Message.conversation_id == conversation_id
-        ).order_by(Message.created_at.desc()).limit(limit).all()
-        
-        # Inverte ordem (mais antigas primeiro)
-        messages.reverse()
-        
-        history = []
-        for msg in messages:
-            history.append({
-                "role": msg.role,
-                "content": msg.content
-            })
-        
-        return history
\ No newline at end of file
+    @staticmethod
+    def _crm_lead_updates(changes: Dict) -> Dict:
+        """Converte os campos alterados do lead no formato do DataCrazy"""
+        updates = {key: changes[key] for key in ("name", "email") if key in changes}
+        custom_fields = {key: value for key, value in changes.items() if key not in updates}
+        if custom_fields:
+            updates["custom_fields"] = custom_fields
+        return updates
@@ -0,0 +1,133 @@
+"""
+Resumo de Conversas
+Resumo incremental das mensagens antigas de cada conversa
+
+O resumo é atualizado fora do caminho da resposta (worker Celery) a cada
+SUMMARY_EVERY_TURNS turnos. O prompt do turno leva o resumo mais as
+mensagens posteriores a ele, então o tamanho do prompt não cresce com
+a conversa.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Dict, List
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from loguru import logger
+
+from app.config import settings
+from app.core.container import container
+from app.core.state_manager import ConversationStateCache
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.utils.redis_client import get_redis
+
+
+class ConversationSummarizer:
+    """Conta turnos por conversa e atualiza o resumo incremental"""
+    
+    def __init__(self):
+        self.redis = get_redis()
+    
+    def _key(self, conversation_id: int) -> str:
+        return f"summary:turns:{conversation_id}"
+    
+    async def record_turn(self, conversation_id: int):
+        """
+        Registra um turno respondido e agenda o resumo a cada K turnos
+        
+        Chamado depois do commit da resposta; nunca bloqueia o turno.
+        """
+        if settings.SUMMARY_EVERY_TURNS <= 0:
+            return
+        
+        try:
+            key = self._key(conversation_id)
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.incr(key)
+                pipe.expire(key, settings.HISTORY_TTL)
+                turns, _ = await pipe.execute()
+            
+            if turns % settings.SUMMARY_EVERY_TURNS == 0:
+                from app.workers.summary_worker import summarize_conversation
+                
+                # delay() publica no broker de forma síncrona
+                await asyncio.to_thread(summarize_conversation.delay, conversation_id)
+                logger.info(f"📝 Resumo da conversa {conversation_id} agendado ({turns} turnos)")
+        except Exception as e:
+            logger.warning(f"⚠️  Erro ao agendar resumo da conversa {conversation_id}: {e}")
+    
+    async def summarize(self, conversation_id: int, db: AsyncSession) -> bool:
+        """
+        Incorpora ao resumo as mensagens novas, exceto as mais recentes
+        
+        As últimas SUMMARY_KEEP_MESSAGES mensagens continuam indo ao
+        prompt literalmente e ficam para o próximo resumo.
+        
+        Returns:
+            True se o resumo foi atualizado
+        """
+        conversation = await db.get(Conversation, conversation_id)
+        if not conversation:
+            logger.warning(f"⚠️  Conversa {conversation_id} não encontrada para resumo")
+            return False
+        
+        previous_id = conversation.summary_message_id
+        rows = (await db.execute(
+            select(Message.id, Message.role, Message.content).where(
+                Message.conversation_id == conversation_id,
+                Message.id > (previous_id or 0)
+            ).order_by(Message.id)
+        )).all()
+        
+        pending = rows[:-settings.SUMMARY_KEEP_MESSAGES] if settings.SUMMARY_KEEP_MESSAGES else rows
+        if not pending:
+            return False
+        
+        summary = await container.openai.chat_completion(
+            messages=self._build_messages(conversation.summary, pending),
+            temperature=0.2,
+            max_tokens=settings.SUMMARY_MAX_TOKENS
+        )
+        
+        if not summary:
+            logger.error(f"❌ Resumo vazio para a conversa {conversation_id}")
+            return False
+        
+        # Só grava se nenhum outro resumo avançou a conversa nesse meio tempo
+        result = await db.execute(
+            update(Conversation)
+            .where(
+                Conversation.id == conversation_id,
+                Conversation.summary_message_id.is_not_distinct_from(previous_id)
+            )
+            .values(
+                summary=summary.strip(),
+                summary_message_id=pending[-1].id,
+                summary_updated_at=datetime.now()
+            )
+        )
+        await db.commit()
+        
+        if not result.rowcount:
+            return False
+        
+        await ConversationStateCache().invalidate(conversation.phone)
+        logger.info(f"📝 Resumo da conversa {conversation_id} atualizado ({len(pending)} mensagens novas)")
+        
+        return True
+    
+    def _build_messages(self, previous: str, rows: List) -> List[Dict]:
+        """Resumo anterior + mensagens novas no formato OpenAI"""
+        transcript = "\n".join(
+            f"{'Lead' if role == 'user' else 'Consultor'}: {content}"
+            for _, role, content in rows
+        )
+        
+        return [
+            {"role": "system", "content": container.generator.prompt_builder.router.get_summary_prompt()},
+            {"role": "user", "content": (
+                f"## Resumo anterior:\n{previous or 'Nenhum'}\n\n"
+                f"## Mensagens novas:\n{transcript}"
+            )}
+        ]
@@ -8,10 +8,13 @@ class AntiLoopManager:
     def __init__(self):
         self.dedup = DedupManager()
     
-    def is_loop(self, phone: str, received_text: str) -> bool:
+    async def is_loop(self, phone: str, received_text: str) -> bool:
         """
         Detecta se a mensagem recebida é um eco da nossa resposta
         
+        No webhook prefira DedupManager.check_inbound, que faz esta
+        verificação junto com a de duplicata em uma única chamada.
+        
         Args:
             phone: Número do telefone
             received_text: Texto recebido do usuário
@@ -21,7 +24,7 @@ class AntiLoopManager:
         """
         
         # Buscar última mensagem que enviamos para este número
-        last_sent = self.dedup.get_last_sent(phone)
+        last_sent = await self.dedup.get_last_sent(phone)
         
         if not last_sent:
             return False
@@ -33,6 +36,6 @@ class AntiLoopManager:
         
         return False
     
-    def register_sent_message(self, phone: str, text: str):
+    async def register_sent_message(self, phone: str, text: str):
         """Registra mensagem enviada para detecção futura de loops"""
-        self.dedup.set_last_sent(phone, text)
\ No newline at end of file
+        await self.dedup.set_last_sent(phone, text)
@@ -1,68 +1,147 @@
-import redis
 from app.config import settings
+from app.utils.redis_client import get_redis
 from loguru import logger
 import hashlib
-from typing import Optional
+from typing import List, Optional, Set
 
 
 class DedupManager:
     """Gerencia detecção de mensagens duplicadas usando Redis"""
     
+    # Marca a mensagem (SET NX) e compara com a última enviada em uma
+    # única ida ao Redis. Retorna 1 = duplicata, 2 = eco (loop), 0 = nova
+    CHECK_SCRIPT = """
+    if not redis.call('set', KEYS[1], '1', 'NX', 'EX', ARGV[1]) then
+        return 1
+    end
+    local last_sent = redis.call('get', KEYS[2])
+    if last_sent and last_sent == ARGV[2] then
+        return 2
+    end
+    return 0
+    """
+    
+    DUPLICATE = "duplicate"
+    LOOP = "loop"
+    
     def __init__(self):
-        self.redis_client = redis.from_url(settings.REDIS_URL)
-        self.ttl = 12  # 12 segundos
+        self.redis_client = get_redis()
+        self.ttl = settings.DEDUP_TTL
+        self.id_ttl = settings.DEDUP_ID_TTL
+        self._check = self.redis_client.register_script(self.CHECK_SCRIPT)
     
     def _generate_hash(self, phone: str, text: str) -> str:
         """Gera hash único para phone + text"""
         content = f"{phone}:{text}"
         return hashlib.md5(content.encode()).hexdigest()
     
-    def is_duplicate(self, phone: str, text: str) -> bool:
+    def _dedup_key(self, phone: str, text: str, message_id: Optional[str]) -> str:
+        """Chave por messageId do Z-API; sem ele, hash de phone + text"""
+        if message_id:
+            return f"dedup:id:{message_id}"
+        return f"dedup:{self._generate_hash(phone, text)}"
+    
+    async def check_inbound(self, phone: str, text: str, message_id: Optional[str] = None) -> Optional[str]:
         """
-        Verifica se a mensagem é duplicata
+        Verifica duplicata e eco da nossa resposta em uma única chamada
         
         Args:
             phone: Número do telefone
             text: Texto da mensagem
+            message_id: ID da mensagem no Z-API (opcional)
             
         Returns:
-            True se for duplicata
+            DUPLICATE, LOOP ou None se a mensagem deve ser processada
         """
         
-        msg_hash = self._generate_hash(phone, text)
-        key = f"dedup:{msg_hash}"
-        
         try:
-            # Verifica se já existe
-            exists = self.redis_client.exists(key)
-            
-            if exists:
-                logger.warning(f"⚠️  Mensagem duplicada detectada: {phone} - {text[:30]}...")
-                return True
-            
-            # Marca como processada
-            self.redis_client.setex(key, self.ttl, "1")
-            return False
-            
+            result = await self._check(
+                keys=[self._dedup_key(phone, text, message_id), f"last_sent:{phone}"],
+                args=[self.id_ttl if message_id else self.ttl, text.strip()]
+            )
         except Exception as e:
             logger.error(f"❌ Erro ao verificar duplicata: {e}")
             # Em caso de erro, deixa passar (não bloqueia)
-            return False
+            return None
+        
+        if result == 1:
+            logger.warning(f"⚠️  Mensagem duplicada detectada: {phone} - {text[:30]}...")
+            return self.DUPLICATE
+        
+        if result == 2:
+            logger.warning(f"🔄 Loop detectado para {phone}: mensagem idêntica")
+            return self.LOOP
+        
+        return None
+    
+    async def release(self, phone: str, text: str, message_id: Optional[str] = None):
+        """
+        Desfaz a marcação de check_inbound (ex: mensagem não foi enfileirada)
+        
+        Sem isso o reenvio do Z-API cairia na chave e seria descartado
+        como duplicata.
+        """
+        try:
+            await self.redis_client.delete(self._dedup_key(phone, text, message_id))
+        except Exception as e:
+            logger.error(f"❌ Erro ao liberar chave de duplicata: {e}")
+    
+    async def is_duplicate(self, phone: str, text: str, message_id: Optional[str] = None) -> bool:
+        """
+        Verifica se a mensagem é duplicata
+        
+        Args:
+            phone: Número do telefone
+            text: Texto da mensagem
+            message_id: ID da mensagem no Z-API (opcional)
+            
+        Returns:
+            True se for duplicata
+        """
+        return await self.check_inbound(phone, text, message_id) == self.DUPLICATE
+    
+    async def mark_answered(self, message_ids: List[str]):
+        """
+        Marca as mensagens do turno como respondidas (primeiro balão entregue)
+        
+        Se o turno falhar depois do envio, a reentrega do stream não
+        responde de novo ao lead.
+        """
+        if not message_ids:
+            return
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for message_id in message_ids:
+                    pipe.set(f"answered:{message_id}", "1", ex=self.id_ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"❌ Erro ao marcar mensagens respondidas: {e}")
+    
+    async def get_answered(self, message_ids: List[str]) -> Set[str]:
+        """messageIds do Z-API que já foram respondidos"""
+        if not message_ids:
+            return set()
+        try:
+            values = await self.redis_client.mget([f"answered:{message_id}" for message_id in message_ids])
+        except Exception as e:
+            logger.error(f"❌ Erro ao consultar mensagens respondidas: {e}")
+            return set()
+        return {message_id for message_id, value in zip(message_ids, values) if value}
     
-    def get_last_sent(self, phone: str) -> Optional[str]:
+    async def get_last_sent(self, phone: str) -> Optional[str]:
         """Retorna última mensagem enviada para este número"""
         key = f"last_sent:{phone}"
         try:
-            value = self.redis_client.get(key)
+            value = await self.redis_client.get(key)
             return value.decode() if value else None
         except Exception as e:
             logger.error(f"❌ Erro ao buscar última mensagem enviada: {e}")
             return None
     
-    def set_last_sent(self, phone: str, text: str):
+    async def set_last_sent(self, phone: str, text: str):
         """Armazena última mensagem enviada para detecção de loop"""
         key = f"last_sent:{phone}"
         try:
-            self.redis_client.setex(key, self.ttl, text)
+            await self.redis_client.setex(key, self.ttl, text.strip())
         except Exception as e:
-            logger.error(f"❌ Erro ao armazenar última mensagem enviada: {e}")
\ No newline at end of file
+            logger.error(f"❌ Erro ao armazenar última mensagem enviada: {e}")
@@ -0,0 +1,50 @@
+import re
+from typing import List
+
+
+class SentenceChunker:
+    """
+    Divide texto em streaming em balões de WhatsApp
+    
+    Um balão fecha em quebra de parágrafo ou em fim de frase (. ! ? …)
+    seguido de espaço, desde que já tenha min_chars caracteres - assim
+    "Oi!" não vira um balão sozinho.
+    """
+    
+    PARAGRAPH = re.compile(r"\n\s*\n")
+    SENTENCE_END = re.compile(r"[.!?…]+[\"')\]]*\s+")
+    
+    def __init__(self, min_chars: int = 40):
+        self.min_chars = min_chars
+        self.buffer = ""
+    
+    def feed(self, text: str) -> List[str]:
+        """Adiciona texto recebido e retorna os balões completos"""
+        self.buffer += text
+        chunks = []
+        
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                break
+            chunk, self.buffer = self.buffer[:cut].strip(), self.buffer[cut:].lstrip()
+            if chunk:
+                chunks.append(chunk)
+        
+        return chunks
+    
+    def flush(self) -> str:
+        """Retorna o restante do texto (fim do stream)"""
+        chunk, self.buffer = self.buffer.strip(), ""
+        return chunk
+    
+    def _find_cut(self):
+        paragraph = self.PARAGRAPH.search(self.buffer)
+        if paragraph and paragraph.start() > 0:
+            return paragraph.end()
+        
+        for match in self.SENTENCE_END.finditer(self.buffer):
+            if match.end() >= self.min_chars:
+                return match.end()
+        
+        return None
@@ -0,0 +1,33 @@
+import redis.asyncio as redis
+from app.config import settings
+from typing import Optional
+
+
+_client: Optional[redis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    """
+    Retorna o cliente Redis assíncrono compartilhado pelo processo
+    
+    Todas as chamadas usam o mesmo pool de conexões, evitando abrir
+    uma conexão nova por mensagem.
+    """
+    global _client
+    
+    if _client is None:
+        _client = redis.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS
+        )
+    
+    return _client
+
+
+async def close_redis():
+    """Fecha o pool de conexões Redis do processo"""
+    global _client
+    
+    if _client is not None:
+        await _client.close()
+        _client = None
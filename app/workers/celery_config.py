@@ -3,7 +3,9 @@ Configuração do Celery para tarefas assíncronas
 """
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init, worker_process_shutdown
 from app.config import settings
+from app.core.container import container
 
 # Inicializa Celery
 celery_app = Celery(
@@ -39,5 +41,16 @@ celery_app.conf.beat_schedule = {
     },
 }
 
+# Serviços do processo: criados uma vez por processo filho do Celery
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    container.start_loop()
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    container.stop_loop()
+
+
 # IMPORTANTE: Importar os workers para registrar as tasks
-from app.workers import followup_worker, metrics_worker
\ No newline at end of file
+from app.workers import followup_worker, metrics_worker, summary_worker
\ No newline at end of file
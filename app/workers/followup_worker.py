@@ -10,8 +10,7 @@ from app.workers.celery_config import celery_app
 from app.database import get_db
 from app.models.followup import Followup, FollowupStatus, FollowupType
 from app.models.conversation import Conversation, ConversationStatus
-from app.channels.whatsapp.zapi import ZAPIClient
-from app.config import settings
+from app.core.container import container
 
 
 @celery_app.task(name='app.workers.followup_worker.send_followup')
@@ -67,13 +66,7 @@ def send_followup(followup_id: int):
         message = get_followup_message(followup.type, conversation)
         
         # Envia via WhatsApp
-        zapi = ZAPIClient(
-            token=settings.ZAPI_TOKEN,
-            instance=settings.ZAPI_INSTANCE,
-            client_token=settings.ZAPI_CLIENT_TOKEN
-        )
-        
-        result = zapi.send_text(conversation.phone, message)
+        result = container.run(container.zapi.send_text(conversation.phone, message))
         
         if result:
             logger.info(f"✅ Follow-up {followup_id} enviado com sucesso")
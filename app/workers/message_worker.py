@@ -0,0 +1,180 @@
+"""
+Worker de processamento de mensagens
+Consome o stream de ingestão (Redis Streams) e executa o MessageProcessor
+
+Cada worker assume um subconjunto das lanes do stream (lease no Redis) e
+processa as mensagens de um mesmo telefone em ordem, com telefones
+diferentes em paralelo. Rajadas de um mesmo telefone são agrupadas em
+um único turno (janela de coalescência).
+
+Uso:
+    python -m app.workers.message_worker
+"""
+
+import asyncio
+import os
+import signal
+import socket
+import time
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+from loguru import logger
+
+from app.config import settings
+from app.core import deadline
+from app.core.coalescer import MessageCoalescer
+from app.core.container import container
+from app.core.lanes import LaneLeases, PhoneScheduler, lane_for
+from app.core.queue import MessageQueue
+from app.services.message_processor import MessageProcessor
+
+
+class MessageConsumer:
+    """Consumidor das lanes do stream com ordem garantida por telefone"""
+    
+    def __init__(self, name: str = None, concurrency: int = None):
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.concurrency = concurrency or settings.INGEST_CONCURRENCY
+        self.queue = MessageQueue()
+        self.leases = LaneLeases(self.name)
+        self.scheduler = PhoneScheduler(self.concurrency)
+        self.coalescer = MessageCoalescer(self._submit_turn)
+        self.in_flight: Dict[int, int] = defaultdict(int)
+        self.draining: Set[int] = set()
+        self.last_rebalance = 0.0
+        self.last_reclaim = 0.0
+        self.stopping = asyncio.Event()
+    
+    async def run(self):
+        """Loop principal: rebalanceia lanes, reivindica pendências e lê mensagens"""
+        logger.info(f"🚀 Consumidor {self.name} iniciado ({self.concurrency} em paralelo)")
+        
+        while not self.stopping.is_set():
+            try:
+                await self._maintain_leases()
+                
+                readable = self.leases.owned - self.draining
+                free_slots = self.concurrency - sum(self.in_flight.values())
+                
+                if not readable or free_slots <= 0:
+                    await asyncio.sleep(0.5)
+                    continue
+                
+                entries = []
+                
+                # Reivindica pendências de donos anteriores das lanes periodicamente
+                if time.monotonic() - self.last_reclaim >= settings.INGEST_CLAIM_INTERVAL:
+                    self.last_reclaim = time.monotonic()
+                    for lane in readable:
+                        entries.extend(await self.queue.reclaim(
+                            self.name,
+                            lane,
+                            min_idle_ms=settings.INGEST_CLAIM_IDLE_MS,
+                            count=free_slots
+                        ))
+                
+                if not entries:
+                    entries = await self.queue.read(
+                        self.name,
+                        readable,
+                        count=free_slots,
+                        block_ms=min(settings.INGEST_BLOCK_MS, settings.INGEST_REBALANCE_INTERVAL * 1000)
+                    )
+                
+                for stream, entry_id, payload in entries:
+                    self._receive(stream, entry_id, payload)
+            
+            except Exception as e:
+                logger.error(f"❌ Erro no loop do consumidor: {e}")
+                await asyncio.sleep(1)
+        
+        # Fecha janelas abertas e aguarda mensagens em andamento antes de sair
+        self.coalescer.flush_all()
+        if self.scheduler.size:
+            logger.info(f"⏳ Aguardando {self.scheduler.size} turnos em andamento...")
+        await self.scheduler.join()
+        await self.leases.release_all()
+        
+        logger.info(f"👋 Consumidor {self.name} finalizado")
+    
+    def stop(self):
+        """Para de ler novas mensagens (as em andamento terminam)"""
+        self.stopping.set()
+    
+    async def _maintain_leases(self):
+        """Renova/adquire lanes e libera excedentes depois de drenadas"""
+        if time.monotonic() - self.last_rebalance >= settings.INGEST_REBALANCE_INTERVAL:
+            self.last_rebalance = time.monotonic()
+            acquired, lost, surplus = await self.leases.rebalance()
+            
+            for lane in acquired:
+                await self.queue.ensure_group(lane)
+            
+            # Conversas dessas lanes podem ter avançado em outro worker
+            if acquired:
+                container.history.forget_local()
+            
+            self.draining |= surplus
+            self.draining -= lost
+        
+        # Só libera a lane quando não há mensagens dela em andamento,
+        # senão o próximo dono poderia inverter a ordem de um telefone
+        for lane in list(self.draining):
+            if not self.in_flight[lane]:
+                await self.leases.release(lane)
+                self.draining.discard(lane)
+    
+    def _receive(self, stream: str, entry_id: str, payload: Dict):
+        """Conta a entrada como em andamento e a coloca na janela do telefone"""
+        self.in_flight[lane_for(payload["phone"], self.queue.lanes)] += 1
+        self.coalescer.add(payload["phone"], (stream, entry_id, payload))
+    
+    def _submit_turn(self, phone: str, entries: List[Tuple[str, str, Dict]]):
+        """Agenda o turno (rajada agrupada) na fila serial do telefone"""
+        lane = lane_for(phone, self.queue.lanes)
+        
+        async def job():
+            try:
+                await self._handle(phone, entries)
+            finally:
+                self.in_flight[lane] -= len(entries)
+        
+        self.scheduler.submit(phone, job)
+    
+    async def _handle(self, phone: str, entries: List[Tuple[str, str, Dict]]):
+        """Processa um turno e confirma (XACK) as entradas somente em caso de sucesso"""
+        try:
+            # Prazo do turno: RAG, OpenAI, CRM e Z-API consultam o tempo restante
+            with deadline.scope(settings.MESSAGE_DEADLINE):
+                async with container.session() as db:
+                    await MessageProcessor(db).process_messages(
+                        phone,
+                        [payload["text"] for _, _, payload in entries],
+                        entries[-1][2].get("name"),
+                        [payload.get("message_id") for _, _, payload in entries]
+                    )
+            
+            for stream, entry_id, _ in entries:
+                await self.queue.ack(stream, entry_id)
+        
+        except Exception as e:
+            # Sem ACK: as entradas ficam pendentes e serão reivindicadas depois
+            logger.error(f"❌ Falha ao processar turno de {phone} ({len(entries)} entradas): {e}")
+
+
+async def main():
+    consumer = MessageConsumer()
+    
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, consumer.stop)
+    
+    await container.startup()
+    try:
+        await consumer.run()
+    finally:
+        await container.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,29 @@
+"""
+Worker de resumo incremental das conversas
+"""
+
+from loguru import logger
+
+from app.workers.celery_config import celery_app
+from app.core.container import container
+
+
+@celery_app.task(name='app.workers.summary_worker.summarize_conversation')
+def summarize_conversation(conversation_id: int):
+    """
+    Atualiza o resumo de uma conversa
+    
+    Args:
+        conversation_id: ID da conversa
+    """
+    from app.services.summary import ConversationSummarizer
+    
+    async def run():
+        async with container.session() as db:
+            return await ConversationSummarizer().summarize(conversation_id, db)
+    
+    try:
+        return container.run(run())
+    except Exception as e:
+        logger.error(f"❌ Erro ao resumir conversa {conversation_id}: {e}")
+        return False
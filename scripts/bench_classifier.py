@@ -0,0 +1,69 @@
+"""
+Benchmark do classificador de intenção local
+
+Uso:
+    python -m scripts.bench_classifier
+"""
+
+import time
+from collections import Counter
+from app.core.classifier import IntentClassifier
+
+
+MESSAGES = [
+    "Oi, tudo bem?",
+    "boa noite!",
+    "Quanto custa a mensalidade de Pedagogia?",
+    "me fala mais sobre o curso de enfermagem",
+    "O diploma EAD é reconhecido pelo MEC?",
+    "achei meio caro",
+    "vou ver com minha esposa e te falo",
+    "trabalho o dia inteiro, acho que não dou conta",
+    "em outra faculdade é mais barato",
+    "Quero me matricular",
+    "beleza, me manda o boleto",
+    "quais documentos preciso?",
+    "não quero mais receber mensagens",
+    "me tira da lista por favor",
+    "legal",
+    "sim",
+]
+
+
+def bench_classifier(rounds: int = 2000):
+    """Mede o tempo por mensagem e mostra a intenção de cada exemplo"""
+    
+    print("\n" + "="*70)
+    print("🧭 BENCHMARK DO CLASSIFICADOR DE INTENÇÃO")
+    print("="*70 + "\n")
+    
+    started = time.perf_counter()
+    classifier = IntentClassifier()
+    print(f"⚙️  Construção (regex + centróides): {(time.perf_counter() - started) * 1000:.2f} ms\n")
+    
+    for message in MESSAGES:
+        intent, score = classifier.predict(message)
+        print(f"{message[:45]:<47} → {str(intent):<11} ({score:.2f})")
+    
+    timings = []
+    for _ in range(rounds):
+        for message in MESSAGES:
+            started = time.perf_counter()
+            classifier.classify(message)
+            timings.append(time.perf_counter() - started)
+    
+    timings.sort()
+    total = len(timings)
+    print("\n" + "-"*70)
+    print(f"📊 {total} classificações")
+    print(f"   média: {sum(timings) / total * 1e6:.1f} µs")
+    print(f"   p50:   {timings[total // 2] * 1e6:.1f} µs")
+    print(f"   p99:   {timings[int(total * 0.99)] * 1e6:.1f} µs")
+    print(f"   máx:   {timings[-1] * 1e6:.1f} µs")
+    
+    print(f"\n🏷️  Distribuição: {dict(Counter(classifier.classify(m) for m in MESSAGES))}")
+    print("="*70 + "\n")
+
+
+if __name__ == "__main__":
+    bench_classifier()
@@ -0,0 +1,106 @@
+"""
+Benchmark de recall e latência da busca vetorial (índice HNSW)
+
+Consultas sintéticas: embeddings de documentos da base com ruído
+gaussiano (perguntas "parecidas" com um trecho). O top-k exato é
+calculado em memória (NumPy, cosseno) e comparado com o resultado da
+busca no índice para cada ef_search.
+
+Uso:
+    python -m scripts.bench_vector_search
+    python -m scripts.bench_vector_search --ef 10,20,40,80,160 --queries 200 --top-k 4
+"""
+
+import argparse
+import asyncio
+import time
+import numpy as np
+from loguru import logger
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.rag.vectorstore import Document, VectorStore
+
+
+async def load_embeddings():
+    """IDs e matriz normalizada de todos os embeddings da base"""
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(Document.id, Document.embedding).where(Document.embedding.isnot(None))
+        )).all()
+    
+    ids = np.array([row.id for row in rows])
+    matrix = np.array([row.embedding for row in rows], dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return ids, matrix
+
+
+async def bench_vector_search(ef_values, queries: int, top_k: int, noise: float, seed: int = 42):
+    """Mede recall@k e latência (p50/p95) da busca para cada ef_search"""
+    
+    print("\n" + "="*70)
+    print("🔍 BENCHMARK DA BUSCA VETORIAL (HNSW, cosseno)")
+    print("="*70 + "\n")
+    
+    ids, matrix = await load_embeddings()
+    if len(ids) < top_k:
+        print(f"❌ Base com {len(ids)} documentos - carregue o RAG antes (scripts/load_rag.py)")
+        return
+    
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(ids), size=min(queries, len(ids)), replace=False)
+    vectors = matrix[sample] + rng.normal(0, noise, size=(len(sample), matrix.shape[1])).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    
+    # Top-k exato (força bruta)
+    exact = [set(ids[np.argsort(-(matrix @ vector))[:top_k]]) for vector in vectors]
+    
+    print(f"📚 Documentos: {len(ids)} | consultas: {len(vectors)} | top-k: {top_k} | ruído: {noise}")
+    print(f"⚙️  ef_search atual (RAG_HNSW_EF_SEARCH): {settings.RAG_HNSW_EF_SEARCH}\n")
+    print(f"{'ef_search':>10} {'recall@k':>10} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+    print("-"*44)
+    
+    # Sem o log de cada busca no meio da tabela
+    logger.disable("app.rag.vectorstore")
+    
+    vectorstore = VectorStore()
+    for ef in ef_values:
+        # Aquecimento (conexão do pool e páginas do índice)
+        await vectorstore.similarity_search("", top_k, query_embedding=vectors[0].tolist(), ef_search=ef)
+        
+        hits = 0
+        timings = []
+        for vector, expected in zip(vectors, exact):
+            started = time.perf_counter()
+            documents = await vectorstore.similarity_search("", top_k, query_embedding=vector.tolist(), ef_search=ef)
+            timings.append(time.perf_counter() - started)
+            hits += len(expected & {doc['id'] for doc in documents})
+        
+        timings.sort()
+        recall = hits / (len(vectors) * top_k)
+        print(
+            f"{ef:>10} {recall:>10.3f} "
+            f"{timings[len(timings) // 2] * 1000:>10.2f} {timings[int(len(timings) * 0.95)] * 1000:>10.2f}"
+        )
+    
+    print("\n💡 Escolha o menor ef_search com recall aceitável e ajuste RAG_HNSW_EF_SEARCH")
+    print("="*70 + "\n")
+    
+    await vectorstore.client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall e latência da busca vetorial por ef_search")
+    parser.add_argument("--ef", default="10,20,40,80,160", help="Valores de ef_search separados por vírgula")
+    parser.add_argument("--queries", type=int, default=100, help="Consultas sintéticas")
+    parser.add_argument("--top-k", type=int, default=settings.RAG_TOP_K, help="Documentos por busca")
+    parser.add_argument("--noise", type=float, default=0.02, help="Desvio do ruído por dimensão")
+    args = parser.parse_args()
+    
+    asyncio.run(bench_vector_search(
+        [int(value) for value in args.ef.split(",")],
+        args.queries,
+        args.top_k,
+        args.noise
+    ))
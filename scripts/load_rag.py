@@ -1,74 +1,73 @@
+from app.rag.indexer import RAGIndexer
+from app.rag.local_index import export_snapshot
 from app.rag.loader import RAGLoader
 from app.rag.splitter import RAGSplitter
 from app.rag.vectorstore import VectorStore
+from app.llm.semantic_cache import SemanticResponseCache
+from app.utils.redis_client import close_redis
 from loguru import logger
+import asyncio
 import sys
+import time
 
 
-def load_rag_data():
-    """Carrega arquivos RAG, divide em chunks e armazena embeddings"""
+async def load_rag_data():
+    """Carrega arquivos RAG e sincroniza a base vetorial (só o que mudou gera embeddings)"""
     
     try:
         logger.info("🚀 Iniciando carregamento da base de conhecimento RAG...")
         
         # 1. Carregar arquivos
-        logger.info("📂 Passo 1/4: Carregando arquivos...")
+        logger.info("📂 Passo 1/2: Carregando arquivos...")
         loader = RAGLoader()
         documents = loader.load_all_files()
         
         if not documents:
+            # Base vazia por engano apagaria todos os documentos
             logger.error("❌ Nenhum arquivo encontrado!")
             return False
         
         logger.info(f"✅ {len(documents)} arquivos carregados")
         
-        # 2. Dividir em chunks
-        logger.info("✂️  Passo 2/4: Dividindo em chunks...")
-        splitter = RAGSplitter(chunk_size=500, overlap=50)
-        chunks = splitter.split_documents(documents)
-        
-        logger.info(f"✅ {len(chunks)} chunks gerados")
-        
-        # 3. Limpar base anterior (opcional - comentar em produção)
-        logger.info("🗑️  Passo 3/4: Limpando base anterior...")
+        # 2. Sincronizar: chunks novos/alterados ganham embedding, órfãos são
+        #    apagados, tudo numa transação (a busca nunca vê a base vazia)
+        logger.info("🔄 Passo 2/2: Sincronizando base vetorial...")
         vectorstore = VectorStore()
-        vectorstore.clear_all()
+        indexer = RAGIndexer(vectorstore, RAGSplitter(chunk_size=500, overlap=50))
         
-        # 4. Gerar embeddings e armazenar
-        logger.info("🔮 Passo 4/4: Gerando embeddings e armazenando...")
+        started = time.monotonic()
+        stats = await indexer.sync(documents)
+        elapsed = time.monotonic() - started
         
-        success_count = 0
-        error_count = 0
+        if not stats:
+            return False
         
-        for i, chunk in enumerate(chunks, 1):
-            try:
-                vectorstore.store_document(
-                    content=chunk['content'],
-                    metadata=chunk['metadata']
-                )
-                success_count += 1
-                
-                # Log de progresso
-                if i % 5 == 0:
-                    logger.info(f"   Progresso: {i}/{len(chunks)} chunks processados")
-                    
-            except Exception as e:
-                logger.error(f"   Erro no chunk {i}: {e}")
-                error_count += 1
+        # Snapshot para o índice vetorial local (RAG_LOCAL_INDEX)
+        snapshot_version = await export_snapshot()
         
         # Resumo final
-        total_docs = vectorstore.count_documents()
+        total_docs = await vectorstore.count_documents()
         logger.info(f"\n{'='*50}")
         logger.info(f"✅ CARREGAMENTO CONCLUÍDO!")
         logger.info(f"{'='*50}")
         logger.info(f"📊 Resumo:")
         logger.info(f"   • Arquivos lidos: {len(documents)}")
-        logger.info(f"   • Chunks gerados: {len(chunks)}")
-        logger.info(f"   • Embeddings criados: {success_count}")
-        logger.info(f"   • Erros: {error_count}")
+        logger.info(f"   • Arquivos inalterados: {stats.get('sources_unchanged', 0)}")
+        logger.info(f"   • Arquivos atualizados: {stats.get('sources_updated', 0)}")
+        logger.info(f"   • Arquivos removidos: {stats.get('sources_removed', 0)}")
+        logger.info(f"   • Chunks mantidos: {stats.get('chunks_kept', 0)}")
+        logger.info(f"   • Embeddings criados: {stats.get('chunks_embedded', 0)}")
+        logger.info(f"   • Chunks apagados: {stats.get('chunks_deleted', 0)}")
+        logger.info(f"   • Tempo de sincronização: {elapsed:.1f}s")
         logger.info(f"   • Total no banco: {total_docs}")
+        logger.info(f"   • Snapshot do índice local: {snapshot_version}")
         logger.info(f"{'='*50}\n")
         
+        # Respostas em cache foram geradas com a base anterior
+        if stats.get('chunks_embedded') or stats.get('chunks_deleted'):
+            await SemanticResponseCache(version="").invalidate()
+        await close_redis()
+        
         return True
         
     except Exception as e:
@@ -77,5 +76,5 @@ def load_rag_data():
 
 
 if __name__ == "__main__":
-    success = load_rag_data()
+    success = asyncio.run(load_rag_data())
     sys.exit(0 if success else 1)
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+Casos do classificador de intenção (regressões de rótulo)
+
+Uso:
+    python -m scripts.test_classifier
+    pytest scripts/test_classifier.py
+"""
+
+from app.core.classifier import DUVIDA, FECHAMENTO, OBJECAO, OPT_OUT, SAUDACAO, IntentClassifier
+
+
+# (mensagem, intenção esperada)
+CASES = [
+    # Opt-out só com recusa explícita
+    ("não quero mais receber mensagens", OPT_OUT),
+    ("não quero mais", OPT_OUT),
+    ("me tira da lista por favor", OPT_OUT),
+    ("pare de me mandar mensagem", OPT_OUT),
+    ("não tenho interesse, obrigado", OPT_OUT),
+    ("por favor não me mande mais mensagens", OPT_OUT),
+    ("quero me descadastrar", OPT_OUT),
+    ("não quero mais esperar, quero me matricular", FECHAMENTO),
+    ("hoje não dá", OBJECAO),
+    # "caro" só como preço
+    ("Caro atendente, gostaria de saber sobre pedagogia", DUVIDA),
+    ("achei meio caro", OBJECAO),
+    ("é caro demais pra mim", OBJECAO),
+    # Pergunta sobre desconto é dúvida
+    ("tem desconto?", DUVIDA),
+    ("em outra faculdade é mais barato", OBJECAO),
+    # Negação do fechamento
+    ("Quero me matricular", FECHAMENTO),
+    ("não quero me matricular", OBJECAO),
+    ("Oi, tudo bem?", SAUDACAO),
+    ("Quanto custa a mensalidade de Pedagogia?", DUVIDA),
+]
+
+# Recusa dentro de outra frase: qualquer intenção, menos opt-out (que encerra a conversa)
+NOT_OPT_OUT = [
+    "não quero mais saber de boleto, quero pagar no cartão",
+    "não quero mais nada além do curso de pedagogia",
+    "não quero mais contato com a outra faculdade",
+    "vocês podem me tirar da lista de espera e me matricular?",
+    "quero sair da lista de espera? como faço",
+    "para de me chamar de senhora kkk",
+]
+
+
+def test_classifier_cases():
+    """Confere o rótulo de cada caso (falha listando os divergentes)"""
+    
+    print("\n" + "="*70)
+    print("🧭 TESTANDO CLASSIFICADOR DE INTENÇÃO")
+    print("="*70 + "\n")
+    
+    classifier = IntentClassifier()
+    wrong = []
+    
+    for message, expected in CASES:
+        intent, score = classifier.predict(message)
+        status = "✅" if intent == expected else "❌"
+        print(f"{status} {message[:45]:<47} → {str(intent):<11} ({score:.2f}) esperado: {expected}")
+        if intent != expected:
+            wrong.append((message, intent, expected))
+    
+    for message in NOT_OPT_OUT:
+        intent, score = classifier.predict(message)
+        status = "✅" if intent != OPT_OUT else "❌"
+        print(f"{status} {message[:45]:<47} → {str(intent):<11} ({score:.2f}) esperado: não {OPT_OUT}")
+        if intent == OPT_OUT:
+            wrong.append((message, intent, f"não {OPT_OUT}"))
+    
+    print("\n" + "="*70 + "\n")
+    assert not wrong, f"Rótulos divergentes: {wrong}"
+
+
+if __name__ == "__main__":
+    test_classifier_cases()
@@ -3,6 +3,7 @@ Script de teste para DataCrazy API - VERSÃO MELHORADA
 Usa dados únicos para evitar duplicatas
 """
 
+import asyncio
 import sys
 import os
 from datetime import datetime
@@ -15,7 +16,7 @@ from app.config import settings
 from loguru import logger
 
 
-def test_datacrazy():
+async def test_datacrazy():
     """Testa conexão com DataCrazy"""
     
     print("\n" + "="*60)
@@ -30,7 +31,7 @@ def test_datacrazy():
     try:
         # Teste 1: Health check
         print("\n1️⃣ Testando conexão...")
-        if client.health_check():
+        if await client.health_check():
             print("✅ Conexão OK")
         else:
             print("❌ Falha na conexão")
@@ -47,7 +48,7 @@ def test_datacrazy():
             "company": "Teste Company"
         }
         
-        lead = client.create_lead(lead_data)
+        lead = await client.create_lead(lead_data)
         print(f"✅ Lead criado: ID {lead.get('id')}")
         print(f"   Nome: {lead.get('name')}")
         print(f"   Phone: {lead.get('phone')}")
@@ -59,19 +60,19 @@ def test_datacrazy():
             # Teste 3: Adicionar nota
             print(f"\n3️⃣ Adicionando nota ao lead {lead_id}...")
             note_text = f"Nota de teste criada via API em {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}"
-            note = client.add_note(lead_id, note_text)
+            note = await client.add_note(lead_id, note_text)
             print(f"✅ Nota adicionada com sucesso!")
             
             # Teste 4: Atualizar lead
             print(f"\n4️⃣ Atualizando lead {lead_id}...")
-            update = client.update_lead(lead_id, {
+            update = await client.update_lead(lead_id, {
                 "company": "Teste Company ATUALIZADA via API"
             })
             print(f"✅ Lead atualizado com sucesso!")
             
             # Teste 5: Buscar lead
             print(f"\n5️⃣ Buscando lead {lead_id}...")
-            fetched = client.get_lead(lead_id)
+            fetched = await client.get_lead(lead_id)
             print(f"✅ Lead encontrado: {fetched.get('name')}")
             print(f"   Company: {fetched.get('company')}")
         
@@ -94,6 +95,9 @@ def test_datacrazy():
         print("   - Token da API está correto no .env")
         print("   - URL base: https://api.g1.datacrazy.io/api/v1")
         print("   - Sua conta DataCrazy está ativa")
+    
+    finally:
+        await client.close()
         
     print("\n" + "="*60)
     print("✅ TESTE CONCLUÍDO")
@@ -101,4 +105,4 @@ def test_datacrazy():
 
 
 if __name__ == "__main__":
-    test_datacrazy()
\ No newline at end of file
+    asyncio.run(test_datacrazy())
\ No newline at end of file
@@ -1,8 +1,9 @@
+import asyncio
 from app.llm.response_generator import ResponseGenerator
 from loguru import logger
 
 
-def test_llm_responses():
+async def test_llm_responses():
     """Testa geração de respostas em diferentes estágios"""
     
     generator = ResponseGenerator()
@@ -15,7 +16,7 @@ def test_llm_responses():
     print("\n📌 CENÁRIO 1: PRIMEIRO CONTATO (Atendimento)")
     print("-" * 70)
     
-    response, handoff = generator.generate_response(
+    turn = await generator.generate_response(
         user_message="Olá, gostaria de saber sobre os cursos",
         conversation_history=[],
         stage="atendimento",
@@ -23,8 +24,8 @@ def test_llm_responses():
     )
     
     print(f"👤 User: Olá, gostaria de saber sobre os cursos")
-    print(f"🤖 Bot: {response}")
-    print(f"🔄 Handoff: {handoff}")
+    print(f"🤖 Bot: {turn['reply']}")
+    print(f"🔄 Handoff: {turn['handoff']} | Estágio: {turn['next_stage']} | Lead: {turn['lead']}")
     
     # Cenário 2: Interesse em curso específico
     print("\n📌 CENÁRIO 2: QUALIFICAÇÃO")
@@ -32,10 +33,10 @@ def test_llm_responses():
     
     history = [
         {"role": "user", "content": "Olá, gostaria de saber sobre os cursos"},
-        {"role": "assistant", "content": response}
+        {"role": "assistant", "content": turn["reply"]}
     ]
     
-    response2, handoff2 = generator.generate_response(
+    turn2 = await generator.generate_response(
         user_message="Tenho interesse em Administração",
         conversation_history=history,
         stage="qualificacao",
@@ -43,8 +44,8 @@ def test_llm_responses():
     )
     
     print(f"👤 User: Tenho interesse em Administração")
-    print(f"🤖 Bot: {response2}")
-    print(f"🔄 Handoff: {handoff2}")
+    print(f"🤖 Bot: {turn2['reply']}")
+    print(f"🔄 Handoff: {turn2['handoff']} | Estágio: {turn2['next_stage']} | Lead: {turn2['lead']}")
     
     # Cenário 3: Objeção de preço
     print("\n📌 CENÁRIO 3: OBJEÇÃO DE PREÇO")
@@ -52,10 +53,10 @@ def test_llm_responses():
     
     history.extend([
         {"role": "user", "content": "Tenho interesse em Administração"},
-        {"role": "assistant", "content": response2}
+        {"role": "assistant", "content": turn2["reply"]}
     ])
     
-    response3, handoff3 = generator.generate_response(
+    turn3 = await generator.generate_response(
         user_message="Parece caro, não sei se consigo pagar",
         conversation_history=history,
         stage="qualificacao",
@@ -63,8 +64,8 @@ def test_llm_responses():
     )
     
     print(f"👤 User: Parece caro, não sei se consigo pagar")
-    print(f"🤖 Bot: {response3}")
-    print(f"🔄 Handoff: {handoff3}")
+    print(f"🤖 Bot: {turn3['reply']}")
+    print(f"🔄 Handoff: {turn3['handoff']} | Estágio: {turn3['next_stage']} | Lead: {turn3['lead']}")
     
     print("\n" + "="*70)
     print("✅ TESTE CONCLUÍDO")
@@ -72,4 +73,4 @@ def test_llm_responses():
 
 
 if __name__ == "__main__":
-    test_llm_responses()
\ No newline at end of file
+    asyncio.run(test_llm_responses())
\ No newline at end of file
@@ -1,7 +1,8 @@
+import asyncio
 from app.rag.query import RAGQuery
 from loguru import logger
 
-def test_rag_search():
+async def test_rag_search():
     """Testa busca semântica no RAG"""
     
     rag = RAGQuery()
@@ -20,11 +21,11 @@ def test_rag_search():
         print(f"\n📝 Query: {query}")
         print("-" * 60)
         
-        context = rag.build_context(query, top_k=2)
+        context = await rag.build_context(query, top_k=2)
         
         print(f"📄 Contexto encontrado:\n")
         print(context[:500] + "..." if len(context) > 500 else context)
         print("\n" + "="*60)
 
 if __name__ == "__main__":
-    test_rag_search()
\ No newline at end of file
+    asyncio.run(test_rag_search())
\ No newline at end of file
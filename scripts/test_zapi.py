@@ -1,8 +1,9 @@
+import asyncio
 from app.channels.whatsapp.zapi import ZAPIClient
 from loguru import logger
 
 
-def test_zapi_connection():
+async def test_zapi_connection():
     """Testa conexão com Z-API"""
     
     print("\n" + "="*60)
@@ -13,7 +14,7 @@ def test_zapi_connection():
     
     # 1. Verificar status da instância
     print("1️⃣ Verificando status da instância...")
-    status = client.get_instance_status()
+    status = await client.get_instance_status()
     
     if status:
         print(f"✅ Status obtido com sucesso")
@@ -21,6 +22,7 @@ def test_zapi_connection():
         print(f"   Telefone: {status.get('phone', 'N/A')}")
     else:
         print("❌ Falha ao obter status")
+        await client.close()
         return False
     
     # 2. Se conectado, testar envio (para você mesmo)
@@ -30,7 +32,7 @@ def test_zapi_connection():
         
         if phone:
             print(f"\n3️⃣ Enviando mensagem de teste para {phone}...")
-            success = client.send_text(phone, "🤖 Teste de conexão WhatsApp AI Agent - Funcionando!")
+            success = await client.send_text(phone, "🤖 Teste de conexão WhatsApp AI Agent - Funcionando!")
             
             if success:
                 print("✅ Mensagem enviada! Verifique seu WhatsApp")
@@ -39,10 +41,12 @@ def test_zapi_connection():
     else:
         print("\n⚠️  Instância NÃO conectada. Escaneie o QR Code no painel Z-API")
     
+    await client.close()
+    
     print("\n" + "="*60)
     print("✅ TESTE CONCLUÍDO")
     print("="*60 + "\n")
 
 
 if __name__ == "__main__":
-    test_zapi_connection()
\ No newline at end of file
+    asyncio.run(test_zapi_connection())
\ No newline at end of file